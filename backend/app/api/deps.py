@@ -1,12 +1,13 @@
-from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+from typing import AsyncGenerator, Generator, Optional
+from fastapi import Depends, HTTPException, Query, WebSocketException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
-from ..core import security
+from ..core import auth_cache, security
 from ..core.config import settings
-from ..core.database import SessionLocal
+from ..core.database import AsyncSessionLocal, SessionLocal
 from ..crud import crud_user
 from ..models import User
 from ..schemas import TokenData
@@ -20,8 +21,12 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
     credentials_exception = HTTPException(
@@ -29,23 +34,87 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
+    username = _token_subject(token)
+    if username is None:
         raise credentials_exception
     
-    user = crud_user.get_by_username(db, username=token_data.username)
+    user = await _load_principal(db, username)
     if user is None:
         raise credentials_exception
     return user
 
+async def get_websocket_user(
+    token: str = Query(..., description="アクセストークン（ブラウザのWebSocketはヘッダーを付けられないため）"),
+) -> User:
+    """
+    WebSocket接続のユーザーを取得
+    接続中ずっとDB接続を持たないよう、セッションはユーザーの読み込みにだけ使う
+    """
+    username = _token_subject(token)
+    user = None
+    if username is not None:
+        async with AsyncSessionLocal() as db:
+            user = await _load_principal(db, username)
+    if user is None or not user.is_active:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION)
+    return user
+
+def _token_subject(token: str) -> Optional[str]:
+    """
+    トークンを検証してユーザー名を返す（無効な場合はNone）
+    """
+    username = auth_cache.get_token_subject(token)
+    if username is not None:
+        return username
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+    token_data = TokenData(username=username)
+    auth_cache.set_token_subject(token, token_data.username, payload.get("exp"))
+    return token_data.username
+
+async def _load_principal(db: AsyncSession, username: str) -> Optional[User]:
+    """
+    認証済みユーザーをキャッシュから復元する（キャッシュにない場合のみDBを参照）
+    """
+    columns = auth_cache.get_principal(username)
+    if columns is not None:
+        # リクエストごとに別のインスタンスを作り、セッションに追加すれば更新もできるようにする
+        user = User(**columns)
+        make_transient_to_detached(user)
+        return user
+    
+    loaded_version = auth_cache.version(username)
+    user = await crud_user.aget_by_username(db, username=username)
+    if user is not None:
+        auth_cache.set_principal(
+            username,
+            {
+                column.key: getattr(user, column.key)
+                for column in User.__table__.columns
+                if column.key != "hashed_password"
+            },
+            loaded_version,
+        )
+    return user
+
 def get_current_active_user(
     current_user: User = Depends(get_current_user),
 ) -> User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
+
+def get_metrics_user(
+    current_user: User = Depends(get_current_active_user),
+) -> User:
+    """
+    内部メトリクスは他のユーザーの分も含むプロセス全体の情報のため、設定で許可したユーザーに限る
+    """
+    if current_user.username not in settings.METRICS_ALLOWED_USERS:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
     return current_user
\ No newline at end of file
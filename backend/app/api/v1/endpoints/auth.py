@@ -2,7 +2,7 @@ from datetime import timedelta
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ....api import deps
 from ....core import security
@@ -13,14 +13,14 @@ from ....schemas import Token, UserCreate, User
 router = APIRouter()
 
 @router.post("/login", response_model=Token)
-def login(
-    db: Session = Depends(deps.get_db),
+async def login(
+    db: AsyncSession = Depends(deps.get_async_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
     ユーザーログイン
     """
-    user = crud_user.authenticate(
+    user = await crud_user.aauthenticate(
         db, username=form_data.username, password=form_data.password
     )
     if not user:
@@ -39,25 +39,25 @@ def login(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=User)
-def register(
+async def register(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     user_in: UserCreate,
 ) -> Any:
     """
     新規ユーザー登録
     """
-    user = crud_user.get_by_email(db, email=user_in.email)
+    user = await crud_user.aget_by_email(db, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
-    user = crud_user.get_by_username(db, username=user_in.username)
+    user = await crud_user.aget_by_username(db, username=user_in.username)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this username already exists in the system.",
         )
-    user = crud_user.create(db, obj_in=user_in)
+    user = await crud_user.acreate(db, obj_in=user_in)
     return user
\ No newline at end of file
@@ -1,73 +1,222 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Any, List, Optional, Union
+from fastapi import (
+    APIRouter, Depends, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+)
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ....api import deps
+from ....core import etag as etags, response_cache, serialization
 from ....models import User
-from ....schemas import HomeItem, HomeItemCreate, HomeItemUpdate
-from ....crud import crud_home
+from ....schemas import (
+    HomeItem, HomeItemCreate, HomeItemUpdate, HomeItemBatch, HomeBoardChanges, HomeBoardMessage
+)
+from ....crud import crud_home, crud_home_spatial
+from ....services import board_sync
 
 router = APIRouter()
 
-@router.get("/items", response_model=List[HomeItem])
-def read_home_items(
-    db: Session = Depends(deps.get_db),
+@router.get("/items", response_model=Union[List[HomeItem], HomeBoardChanges])
+async def read_home_items(
+    db: AsyncSession = Depends(deps.get_async_db),
+    since: Optional[int] = Query(
+        None, ge=0, description="前回受け取ったボードのバージョン（指定した場合は差分のみ返す）"
+    ),
+    viewport: Optional[str] = Query(
+        None, description="表示範囲 x0,y0,x1,y1（指定した場合は範囲に重なるアイテムのみ返す）"
+    ),
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     ユーザーのホームアイテム一覧を取得
+    ボードのバージョンはX-Board-Versionヘッダーで返す
+    ETagはボードのバージョンから作り、If-None-Matchと一致する場合はアイテムを読まずに304を返す
+    sinceを指定した場合は、それ以降に変更・削除されたアイテムのみ返す
+    （sinceが現在のバージョンより新しい場合は差分を作れないため、全件を返す）
+    viewportを指定した場合は、表示範囲に重なるアイテムのみ返す
     """
-    items = crud_home.get_multi_by_owner(db=db, owner_id=current_user.id)
-    return items
+    if viewport is not None:
+        if since is not None:
+            raise HTTPException(status_code=400, detail="since and viewport cannot be combined")
+        try:
+            bounds = crud_home_spatial.parse_viewport(viewport)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    key, cached = await response_cache.lookup(
+        current_user.id, "home.items", {"since": since, "viewport": viewport}, if_none_match
+    )
+    if cached is not None:
+        return cached
+    # アイテムより先にバージョンを読む（読み込み中の変更は次回の差分にも含まれる）
+    version = await crud_home.aget_version(db=db, owner_id=current_user.id)
+    etag = etags.make_etag("board", current_user.id, version, since, viewport)
+    if etags.matches(if_none_match, etag):
+        return etags.not_modified(etag)
+    headers = {"X-Board-Version": str(version)}
+    # 一覧はエンティティ・レスポンスモデルを経由せず、行の値から直接JSONを作る
+    if viewport is not None:
+        body = await crud_home_spatial.aget_rows_in_viewport(
+            db=db, owner_id=current_user.id, viewport=bounds, columns=crud_home.ITEM_COLUMNS
+        )
+    elif since is None:
+        body = await crud_home.aget_rows_by_owner(db=db, owner_id=current_user.id)
+    elif since == 0 or since > version:
+        items = await crud_home.aget_rows_by_owner(db=db, owner_id=current_user.id)
+        body = {"version": version, "items": items, "deleted": []}
+    else:
+        items, deleted = await crud_home.aget_changed_rows_since(
+            db=db, owner_id=current_user.id, since=since
+        )
+        body = {"version": version, "items": items, "deleted": deleted}
+    return await response_cache.store_body(
+        key, serialization.dumps(body), headers, etag=etag, if_none_match=if_none_match
+    )
+
+@router.patch("/items", response_model=HomeBoardChanges)
+async def patch_home_items(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    batch_in: HomeItemBatch,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    ホームアイテムの作成・更新・削除をまとめて適用
+    itemsには作成したアイテム（指定順）と更新したアイテムを返す
+    """
+    ids = [item.id for item in batch_in.update] + batch_in.delete
+    owners = await crud_home.aget_owners(db=db, ids=ids)
+    if any(id not in owners for id in ids):
+        raise HTTPException(status_code=404, detail="Item not found")
+    if any(owner_id != current_user.id for owner_id in owners.values()):
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    version, items, deleted = await crud_home.aapply_batch(
+        db=db, obj_in=batch_in, owner_id=current_user.id
+    )
+    return HomeBoardChanges(version=version, items=items, deleted=deleted)
 
 @router.post("/items", response_model=HomeItem)
-def create_home_item(
+async def create_home_item(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     item_in: HomeItemCreate,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     新しいホームアイテムを作成
     """
-    item = crud_home.create_with_owner(
+    item = await crud_home.acreate_with_owner(
         db=db, obj_in=item_in, owner_id=current_user.id
     )
     return item
 
+def _item_etag(item_id: int, version: int) -> str:
+    return etags.make_etag("home_item", item_id, version)
+
+@router.get("/items/{item_id}", response_model=HomeItem)
+async def read_home_item(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    response: Response,
+    item_id: int,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    ホームアイテムを取得
+    ETagはアイテムを最後に変更したボードのバージョンから作る
+    """
+    # 削除済みのアイテムにも変更履歴のバージョンが残るため、存在と所有者を先に確認する
+    owner_id = (await crud_home.aget_owners(db=db, ids=[item_id])).get(item_id)
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    if owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    version = await crud_home.aget_item_version(db=db, owner_id=current_user.id, item_id=item_id)
+    etag = _item_etag(item_id, version)
+    if etags.matches(if_none_match, etag):
+        return etags.not_modified(etag)
+    item = await crud_home.aget(db=db, id=item_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    response.headers["ETag"] = etag
+    return item
+
 @router.put("/items/{item_id}", response_model=HomeItem)
-def update_home_item(
+async def update_home_item(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
+    response: Response,
     item_id: int,
     item_in: HomeItemUpdate,
+    if_match: Optional[str] = Header(None),
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     ホームアイテムを更新
+    If-Matchを指定した場合は、ETagが一致する（取得後に他で変更されていない）場合のみ更新する
     """
-    item = crud_home.get(db=db, id=item_id)
+    item = await crud_home.aget(db=db, id=item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if item.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    item = crud_home.update(db=db, db_obj=item, obj_in=item_in)
+    if if_match is not None:
+        version = await crud_home.aget_item_version(
+            db=db, owner_id=current_user.id, item_id=item_id
+        )
+        if not etags.matches(if_match, _item_etag(item_id, version), weak=False):
+            raise HTTPException(status_code=412, detail="Item has been modified")
+    item = await crud_home.aupdate(db=db, db_obj=item, obj_in=item_in)
+    version = await crud_home.aget_item_version(db=db, owner_id=current_user.id, item_id=item_id)
+    response.headers["ETag"] = _item_etag(item_id, version)
     return item
 
 @router.delete("/items/{item_id}")
-def delete_home_item(
+async def delete_home_item(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     item_id: int,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     ホームアイテムを削除
     """
-    item = crud_home.get(db=db, id=item_id)
+    item = await crud_home.aget(db=db, id=item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if item.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    crud_home.remove(db=db, id=item_id)
-    return {"detail": "Item deleted successfully"}
\ No newline at end of file
+    await crud_home.aremove(db=db, id=item_id)
+    return {"detail": "Item deleted successfully"}
+
+@router.websocket("/ws")
+async def home_board_socket(
+    websocket: WebSocket,
+    current_user: User = Depends(deps.get_websocket_user),
+) -> None:
+    """
+    ホームボードのリアルタイム同期
+    受信: {"type": "move", "items": [{"id", "position_x", "position_y", "width", "height"}]}
+          {"type": "flush"}
+    送信: {"type": "move", "items": [...]}（他のタブでの変更）
+          {"type": "saved", "version": ボードのバージョン}（変更を書き込んだとき）
+          {"type": "error", "detail": ..., "items": [id]}（書き込めずに捨てた変更のアイテム）
+    """
+    hub = board_sync.hub
+    await hub.connect(current_user.id, websocket)
+    try:
+        while True:
+            try:
+                message = HomeBoardMessage.model_validate_json(await websocket.receive_text())
+            except ValidationError:
+                await websocket.send_json({"type": "error", "detail": "Invalid message"})
+                continue
+            if message.type == "move":
+                await hub.move(current_user.id, websocket, message.items)
+            else:
+                await hub.flush(current_user.id)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await hub.disconnect(current_user.id, websocket)
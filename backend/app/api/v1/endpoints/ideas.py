@@ -1,94 +1,330 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
 from ....api import deps
-from ....crud import crud_idea
+from ....core import etag as etags, response_cache, serialization
+from ....core.config import settings
+from ....crud import crud_idea, crud_search
 from ....models import User
-from ....schemas import Idea, IdeaCreate, IdeaUpdate
+from ....schemas import (
+    Idea, IdeaBatch, IdeaBatchResult, IdeaCreate, IdeaCreated, IdeaImportResult, IdeaSearchResult,
+    IdeaSort, IdeaSummary, IdeaUpdate, IdeaWithDetails, SimilarIdea,
+)
+from ....services import idea_transfer, similarity
 
 router = APIRouter()
 
-@router.get("/", response_model=List[Idea])
-def read_ideas(
-    db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+# レスポンスキャッシュに保存するJSONのシリアライズ用
+_IDEA = TypeAdapter(Idea)
+
+async def _similar_ideas(
+    db: AsyncSession, owner_id: int, matches: List[Tuple[int, float]]
+) -> List[SimilarIdea]:
+    titles = await crud_idea.aget_titles(db, owner_id=owner_id, ids=[id for id, _ in matches])
+    return [
+        SimilarIdea(id=id, title=titles[id], score=score)
+        for id, score in matches if id in titles
+    ]
+
+@router.get("/", response_model=Union[List[Idea], List[IdeaSummary]])
+async def read_ideas(
+    db: AsyncSession = Depends(deps.get_async_db),
+    skip: int = Query(0, ge=0, description="（非推奨）cursorを使わない場合の読み飛ばし件数"),
+    limit: int = Query(100, ge=1),
+    sort: IdeaSort = "created_desc",
+    cursor: Optional[str] = Query(None, description="前のページのX-Next-Cursorヘッダーの値"),
+    view: Literal["full", "summary"] = Query("full", description="summaryの場合は本文の代わりに先頭部分のみ返す"),
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     ユーザーのアイデア一覧を取得
+    次のページがある場合はX-Next-Cursorヘッダーにカーソルを返す
     """
-    ideas = crud_idea.get_multi_by_owner(
-        db=db, owner_id=current_user.id, skip=skip, limit=limit
+    key, cached = await response_cache.lookup(
+        current_user.id, "ideas.list",
+        {"skip": skip, "limit": limit, "sort": sort, "cursor": cursor, "view": view},
+        if_none_match,
+    )
+    if cached is not None:
+        return cached
+    # 一覧はエンティティ・レスポンスモデルを経由せず、行の値から直接JSONを作る
+    try:
+        if view == "summary":
+            rows, next_cursor = await crud_idea.aget_summary_page_by_owner(
+                db=db, owner_id=current_user.id, skip=skip, limit=limit, sort=sort,
+                cursor=cursor, snippet_length=settings.IDEA_SNIPPET_LENGTH
+            )
+        else:
+            rows, next_cursor = await crud_idea.aget_rows_page_by_owner(
+                db=db, owner_id=current_user.id, skip=skip, limit=limit, sort=sort, cursor=cursor
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor is not None else {}
+    return await response_cache.store_body(
+        key, serialization.dumps(rows), headers, if_none_match=if_none_match
     )
-    return ideas
 
-@router.post("/", response_model=Idea)
-def create_idea(
+@router.post("/", response_model=IdeaCreated)
+async def create_idea(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     idea_in: IdeaCreate,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     新しいアイデアを作成
+    内容がよく似た既存のアイデアがあればsimilar_ideasで知らせる
     """
-    idea = crud_idea.create_with_owner(
+    idea = await crud_idea.acreate_with_owner(
         db=db, obj_in=idea_in, owner_id=current_user.id
     )
-    return idea
+    await similarity.aensure_index(db, current_user.id)
+    matches = await similarity.afind_similar(
+        current_user.id, idea.title, idea.content,
+        limit=settings.SIMILARITY_WARNING_LIMIT, exclude_id=idea.id
+    )
+    await similarity.aupsert_idea(current_user.id, idea.id, idea.title, idea.content)
+
+    created = IdeaCreated.model_validate(idea)
+    created.similar_ideas = await _similar_ideas(
+        db, current_user.id,
+        [(id, score) for id, score in matches if score >= settings.SIMILARITY_WARNING_THRESHOLD]
+    )
+    return created
+
+def _idea_text(result: Dict[str, Any]) -> Tuple[int, str, str]:
+    return result["id"], result["idea"]["title"], result["idea"]["content"]
+
+# /{idea_id}より先に登録する
+@router.post("/batch", response_model=IdeaBatchResult)
+async def batch_ideas(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    batch_in: IdeaBatch,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    アイデアの作成・更新・削除をまとめて1つのトランザクションで適用
+    resultsに変更ごとの結果を返す（存在しないか他のユーザーのアイデアへの更新・削除はnot_found）
+    """
+    size = len(batch_in.create) + len(batch_in.update) + len(batch_in.delete)
+    if size > settings.IDEA_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many operations (max {settings.IDEA_BATCH_MAX_ITEMS})",
+        )
+    results = await crud_idea.aapply_batch(db=db, obj_in=batch_in, owner_id=current_user.id)
+
+    # 類似アイデア検索のインデックスに反映する
+    text_changed = [patch.title is not None or patch.content is not None for patch in batch_in.update]
+    await similarity.aappend_ideas(current_user.id, [
+        _idea_text(result) for result in results if result["status"] == "created"
+    ])
+    await similarity.aupsert_ideas(current_user.id, [
+        _idea_text(result) for result in results
+        if result["status"] == "updated" and text_changed[result["index"]]
+    ])
+    await similarity.aremove_ideas(
+        current_user.id, [result["id"] for result in results if result["status"] == "deleted"]
+    )
+    return {"results": results}
+
+@router.get("/export")
+async def export_ideas(
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    アイデアと要件定義書をNDJSON（1行に1アイデア）で出力（DBから少しずつ読みながら送る）
+    """
+    return StreamingResponse(
+        idea_transfer.export_ndjson(current_user.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="ideas.ndjson"'},
+    )
+
+@router.post("/import", response_model=IdeaImportResult)
+async def import_ideas(
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    NDJSON（exportと同じ形式）のアイデアと要件定義書をまとめて登録
+    本文は受信しながら読み、IDEA_TRANSFER_BATCH_SIZE件ずつコミットする
+    不正な行があった場合は400を返す（その行より前のバッチは登録済み、件数はimported）
+    """
+    try:
+        return await idea_transfer.import_ndjson(
+            db, owner_id=current_user.id, chunks=request.stream()
+        )
+    except idea_transfer.IdeaImportError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"line": e.line, "errors": e.errors, "imported": e.imported},
+        )
+
+@router.get("/search", response_model=List[IdeaSearchResult])
+async def search_ideas(
+    db: AsyncSession = Depends(deps.get_async_db),
+    q: str = Query(..., min_length=1, description="検索語（空白区切りで全ての語を含むものを検索）"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    アイデアと生成された要件定義書を全文検索（関連度順）
+    """
+    return await crud_search.asearch(db, owner_id=current_user.id, q=q, limit=limit)
+
+def _idea_etag(idea_id: int, version: int) -> str:
+    return etags.make_etag("idea", idea_id, version)
 
 @router.get("/{idea_id}", response_model=Idea)
-def read_idea(
+async def read_idea(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     idea_id: int,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     特定のアイデアを取得
+    If-None-MatchがETag（行のバージョン）と一致する場合は本文を読まずに304を返す
     """
-    idea = crud_idea.get(db=db, id=idea_id)
+    key, cached = await response_cache.lookup(
+        current_user.id, "ideas.read", {"id": idea_id}, if_none_match
+    )
+    if cached is not None:
+        return cached
+    if if_none_match is not None:
+        row = await crud_idea.aget_owner_and_version(db=db, id=idea_id)
+        if row is not None and row[0] == current_user.id:
+            etag = _idea_etag(idea_id, row[1])
+            if etags.matches(if_none_match, etag):
+                return etags.not_modified(etag)
+    idea = await crud_idea.aget(db=db, id=idea_id)
     if not idea:
         raise HTTPException(status_code=404, detail="Idea not found")
     if idea.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
+    return await response_cache.store(
+        key, _IDEA, idea, etag=_idea_etag(idea.id, idea.version), if_none_match=if_none_match
+    )
+
+@router.get("/{idea_id}/details", response_model=IdeaWithDetails)
+async def read_idea_details(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    idea_id: int,
+    limit: int = Query(20, ge=1, le=100, description="各一覧の最大件数"),
+    requirements_offset: int = Query(0, ge=0),
+    comments_offset: int = Query(0, ge=0),
+    bookmarks_offset: int = Query(0, ge=0),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    アイデアと要件定義書・コメント・ブックマークの一覧を取得（各一覧は新しい順）
+    """
+    idea = await crud_idea.aget_with_details(
+        db=db, id=idea_id, limit=limit,
+        offsets={
+            "requirements": requirements_offset,
+            "comments": comments_offset,
+            "bookmarks": bookmarks_offset,
+        },
+    )
+    if not idea:
+        raise HTTPException(status_code=404, detail="Idea not found")
+    if idea["owner_id"] != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
     return idea
 
 @router.put("/{idea_id}", response_model=Idea)
-def update_idea(
+async def update_idea(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
+    response: Response,
     idea_id: int,
     idea_in: IdeaUpdate,
+    if_match: Optional[str] = Header(None),
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     アイデアを更新
+    If-Matchを指定した場合は、ETagが一致する（取得後に他で更新されていない）場合のみ更新する
     """
-    idea = crud_idea.get(db=db, id=idea_id)
+    idea = await crud_idea.aget(db=db, id=idea_id)
     if not idea:
         raise HTTPException(status_code=404, detail="Idea not found")
     if idea.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    idea = crud_idea.update(db=db, db_obj=idea, obj_in=idea_in)
+    if if_match is not None and not etags.matches(
+        if_match, _idea_etag(idea.id, idea.version), weak=False
+    ):
+        raise HTTPException(status_code=412, detail="Idea has been modified")
+    try:
+        idea = await crud_idea.aupdate(db=db, db_obj=idea, obj_in=idea_in)
+    except StaleDataError:
+        # 読み込んでから更新するまでの間に他のリクエストが更新した
+        await db.rollback()
+        if if_match is not None:
+            raise HTTPException(status_code=412, detail="Idea has been modified")
+        # 条件なしの更新は最新の値を読み直して1回だけやり直す（再び競合した場合は409）
+        idea = await crud_idea.aget(db=db, id=idea_id)
+        if not idea:
+            raise HTTPException(status_code=404, detail="Idea not found")
+        try:
+            idea = await crud_idea.aupdate(db=db, db_obj=idea, obj_in=idea_in)
+        except StaleDataError:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Idea was modified concurrently")
+    if idea_in.title is not None or idea_in.content is not None:
+        await similarity.aupsert_idea(current_user.id, idea.id, idea.title, idea.content)
+    response.headers["ETag"] = _idea_etag(idea.id, idea.version)
     return idea
 
+@router.get("/{idea_id}/similar", response_model=List[SimilarIdea])
+async def read_similar_ideas(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    idea_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    内容が似ているアイデアを類似度順に取得
+    """
+    idea = await crud_idea.aget(db=db, id=idea_id)
+    if not idea:
+        raise HTTPException(status_code=404, detail="Idea not found")
+    if idea.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    await similarity.aensure_index(db, current_user.id)
+    matches = await similarity.afind_similar(
+        current_user.id, idea.title, idea.content, limit=limit, exclude_id=idea.id
+    )
+    return await _similar_ideas(db, current_user.id, matches)
+
 @router.delete("/{idea_id}")
-def delete_idea(
+async def delete_idea(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     idea_id: int,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     アイデアを削除
     """
-    idea = crud_idea.get(db=db, id=idea_id)
+    idea = await crud_idea.aget(db=db, id=idea_id)
     if not idea:
         raise HTTPException(status_code=404, detail="Idea not found")
     if idea.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    crud_idea.remove(db=db, id=idea_id)
+    await crud_idea.aremove(db=db, id=idea_id)
+    await similarity.aremove_idea(current_user.id, idea_id)
     return {"detail": "Idea deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,30 @@
+from typing import Any
+from fastapi import APIRouter, Depends
+
+from ....api import deps
+from ....core import auth_cache, database, response_cache
+from ....models import User
+from ....services import (
+    board_sync, job_queue, llm_hedging, llm_scheduler, requirement_cache, requirement_generation,
+)
+
+router = APIRouter()
+
+@router.get("/")
+def read_metrics(
+    current_user: User = Depends(deps.get_metrics_user),
+) -> Any:
+    """
+    キャッシュ等の内部メトリクスを取得（METRICS_ALLOWED_USERSのユーザーのみ）
+    """
+    return {
+        "requirement_cache": requirement_cache.stats(),
+        "requirement_generation": requirement_generation.stats(),
+        "requirement_jobs": job_queue.stats(),
+        "llm_providers": llm_scheduler.stats(),
+        "llm_latency": llm_hedging.tracker.stats(),
+        "db_pool": database.pool_stats(),
+        "auth_cache": auth_cache.stats(),
+        "home_board_sync": board_sync.stats(),
+        "response_cache": response_cache.stats(),
+    }
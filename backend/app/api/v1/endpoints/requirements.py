@@ -1,19 +1,30 @@
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+import json
+from contextlib import aclosing
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ....api import deps
 from ....models import User
-from ....schemas import Requirement, RequirementGenerate
-from ....services import llm_service
-from ....crud import crud_idea, crud_requirement
+from ....core import etag as etags
+from ....core.config import settings
+from ....schemas import Requirement, RequirementGenerate, RequirementJob
+from ....services import job_queue, llm_providers, llm_service, requirement_generation
+from ....services.llm_providers import ProviderNotConfiguredError
+from ....services.llm_scheduler import ProviderRateLimitError
+from ....crud import crud_idea, crud_job, crud_requirement
 
 router = APIRouter()
 
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @router.post("/generate", response_model=Requirement)
 async def generate_requirement(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     requirement_in: RequirementGenerate,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
@@ -21,28 +32,181 @@ async def generate_requirement(
     アイデアから要件定義書を生成
     """
     # アイデアの存在確認と権限チェック
-    idea = crud_idea.get(db=db, id=requirement_in.idea_id)
+    idea = await crud_idea.aget(db=db, id=requirement_in.idea_id)
     if not idea:
         raise HTTPException(status_code=404, detail="Idea not found")
     if idea.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    # LLMを使って要件定義書を生成
+    # LLMを使って要件定義書を生成・保存（同一リクエストの同時実行はまとめる）
     try:
-        requirement_content = await llm_service.generate_requirement(
-            idea_content=idea.content,
+        requirement_id = await requirement_generation.generate(
+            idea_id=requirement_in.idea_id,
             idea_title=idea.title,
-            llm_model=requirement_in.llm_model
+            idea_content=idea.content,
+            llm_model=requirement_in.llm_model,
+            force_refresh=requirement_in.force_refresh
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="LLM provider timed out")
+    except ProviderNotConfiguredError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ProviderRateLimitError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after or settings.LLM_BACKOFF_MAX_SECONDS))},
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate requirement: {str(e)}")
     
-    # 要件定義書を保存
-    requirement = crud_requirement.create(
+    return await crud_requirement.aget(db=db, id=requirement_id)
+
+@router.post("/generate/stream")
+async def stream_requirement(
+    *,
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
+    requirement_in: RequirementGenerate,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    アイデアから要件定義書を生成し、Server-Sent Eventsで逐次返す
+    生成完了時に要件定義書を保存し、クライアントが切断した場合は上流の生成も中断する
+    "auto"の場合は現在最も速いと推定されるプロバイダーを使う
+    """
+    idea = await crud_idea.aget(db=db, id=requirement_in.idea_id)
+    if not idea:
+        raise HTTPException(status_code=404, detail="Idea not found")
+    if idea.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    idea_title, idea_content = idea.title, idea.content
+    # ストリームを開始する前に、非ストリーム版と同じくプロバイダーが使えない場合は503を返す
+    try:
+        llm_model = llm_service.resolve_model(requirement_in.llm_model)
+        if not llm_providers.get_provider(llm_model).is_configured():
+            raise ProviderNotConfiguredError(f"{llm_model} API key is not configured")
+    except ProviderNotConfiguredError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def event_stream():
+        chunks = []
+        try:
+            async with aclosing(llm_service.stream_requirement(
+                idea_content=idea_content,
+                idea_title=idea_title,
+                llm_model=llm_model,
+                force_refresh=requirement_in.force_refresh
+            )) as stream:
+                async for chunk in stream:
+                    if await request.is_disconnected():
+                        return
+                    chunks.append(chunk)
+                    yield _sse("token", {"text": chunk})
+        except asyncio.TimeoutError:
+            yield _sse("error", {"detail": "LLM provider timed out"})
+            return
+        except ProviderRateLimitError as e:
+            yield _sse("error", {"detail": str(e), "retry_after": e.retry_after})
+            return
+        except Exception as e:
+            yield _sse("error", {"detail": f"Failed to generate requirement: {str(e)}"})
+            return
+
+        requirement = await crud_requirement.acreate(
+            db=db,
+            idea_id=requirement_in.idea_id,
+            content="".join(chunks),
+            llm_model=llm_model
+        )
+        yield _sse("done", Requirement.model_validate(requirement).model_dump(mode="json"))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/jobs", response_model=RequirementJob, status_code=202)
+async def create_requirement_job(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    requirement_in: RequirementGenerate,
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    要件定義書の生成ジョブを登録し、すぐにジョブ情報を返す
+    """
+    idea = await crud_idea.aget(db=db, id=requirement_in.idea_id)
+    if not idea:
+        raise HTTPException(status_code=404, detail="Idea not found")
+    if idea.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    job = await crud_job.acreate(
         db=db,
+        user_id=current_user.id,
         idea_id=requirement_in.idea_id,
-        content=requirement_content,
-        llm_model=requirement_in.llm_model
+        llm_model=requirement_in.llm_model,
+        force_refresh=requirement_in.force_refresh
     )
+    job_queue.job_queue.submit(job.id)
+    return job
+
+@router.get("/jobs/{job_id}", response_model=RequirementJob)
+async def read_requirement_job(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    job_id: int,
+    wait: float = Query(0, ge=0, description="完了または状態変化まで待つ最大秒数（ロングポーリング）"),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    要件定義書の生成ジョブの状態と結果を取得
+    """
+    job = await crud_job.aget(db=db, id=job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    return requirement
\ No newline at end of file
+    if wait > 0 and job.status not in job_queue.FINISHED_STATUSES:
+        # 読み込んでから登録するまでに状態が変わった場合に備え、登録後に読み直してから待つ
+        event = job_queue.job_queue.watch(job_id)
+        status = job.status
+        job = await crud_job.aget(db=db, id=job_id)
+        if job.status == status:
+            await job_queue.job_queue.wait(
+                event, timeout=min(wait, settings.REQUIREMENT_JOB_MAX_WAIT_SECONDS)
+            )
+            job = await crud_job.aget(db=db, id=job_id)
+    return job
+
+def _requirement_etag(content_hash: str) -> str:
+    return etags.make_etag("requirement", content_hash)
+
+@router.get("/{requirement_id}", response_model=Requirement)
+async def read_requirement(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    response: Response,
+    requirement_id: int,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    要件定義書を取得
+    ETagは本文のハッシュで、If-None-Matchと一致する場合は本文を読まずに304を返す
+    """
+    row = await crud_requirement.aget_owner_and_hash(db=db, id=requirement_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Requirement not found")
+    owner_id, content_hash = row
+    if owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if content_hash is not None and etags.matches(if_none_match, _requirement_etag(content_hash)):
+        return etags.not_modified(_requirement_etag(content_hash))
+    requirement = await crud_requirement.aget(db=db, id=requirement_id)
+    content_hash = await crud_requirement.aensure_content_hash(db=db, db_obj=requirement)
+    response.headers["ETag"] = _requirement_etag(content_hash)
+    return requirement
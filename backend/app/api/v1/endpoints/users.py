@@ -1,6 +1,6 @@
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ....api import deps
 from ....crud import crud_user
@@ -19,14 +19,14 @@ def read_user_me(
     return current_user
 
 @router.put("/me", response_model=UserSchema)
-def update_user_me(
+async def update_user_me(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     user_in: UserUpdate,
     current_user: User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     現在のユーザー情報を更新
     """
-    user = crud_user.update(db, db_obj=current_user, obj_in=user_in)
+    user = await crud_user.aupdate(db, db_obj=current_user, obj_in=user_in)
     return user
\ No newline at end of file
@@ -0,0 +1,67 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+from .cache import MemoryCache
+from .config import settings
+
+# 検証済みトークン -> ユーザー名（トークンの有効期限まで保持）
+_tokens = MemoryCache(max_entries=settings.AUTH_TOKEN_CACHE_MAX_ENTRIES)
+# ユーザー名 -> (バージョン, usersテーブルの列の値)
+_principals = MemoryCache(
+    max_entries=settings.AUTH_PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS,
+)
+# ユーザーが更新・無効化されるたびに進めるバージョン
+_versions: Dict[str, int] = {}
+_versions_lock = threading.Lock()
+
+def version(username: str) -> int:
+    return _versions.get(username, 0)
+
+def invalidate(username: str) -> None:
+    """
+    ユーザーのキャッシュを破棄し、読み込み中の古い値が保存されないようバージョンを進める
+    """
+    with _versions_lock:
+        _versions[username] = _versions.get(username, 0) + 1
+    _principals.delete(username)
+
+def get_token_subject(token: str) -> Optional[str]:
+    if not settings.AUTH_CACHE_ENABLED:
+        return None
+    return _tokens.get(token)
+
+def set_token_subject(token: str, subject: str, expires_at: Optional[float]) -> None:
+    if not settings.AUTH_CACHE_ENABLED or expires_at is None:
+        return
+    ttl = expires_at - time.time()
+    if ttl > 0:
+        _tokens.set(token, subject, ttl_seconds=ttl)
+
+def get_principal(username: str) -> Optional[Dict[str, Any]]:
+    if not settings.AUTH_CACHE_ENABLED:
+        return None
+    entry = _principals.get(username)
+    if entry is None:
+        return None
+    cached_version, columns = entry
+    if cached_version != version(username):
+        return None
+    return columns
+
+def set_principal(username: str, columns: Dict[str, Any], loaded_version: int) -> None:
+    """
+    loaded_versionは読み込み開始前に取得したバージョン（途中で更新された場合は保存しない）
+    """
+    if not settings.AUTH_CACHE_ENABLED:
+        return
+    with _versions_lock:
+        if loaded_version != version(username):
+            return
+        _principals.set(username, (loaded_version, columns))
+
+def stats() -> Dict[str, Any]:
+    return {
+        "tokens": {"entries": len(_tokens), **_tokens.stats.as_dict()},
+        "principals": {"entries": len(_principals), **_principals.stats.as_dict()},
+    }
@@ -0,0 +1,207 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+class CacheStats:
+    """
+    キャッシュのヒット/ミス/追い出し回数
+    asyncio.to_threadのワーカー等の複数スレッドから更新されるため、ロックを取って加算する
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def evict(self, count: int = 1) -> None:
+        with self._lock:
+            self.evictions += count
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+            "hit_ratio": hits / total if total else 0.0,
+        }
+
+class MemoryCache:
+    """
+    プロセス内のLRUキャッシュ（TTLと件数上限による追い出し）
+    max_bytesを指定した場合はsize_ofで求めた値の大きさの合計も上限にする
+    """
+    def __init__(
+        self, max_entries: int, ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None, size_of: Callable[[Any], int] = len
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.stats = CacheStats()
+        self.bytes = 0
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats.miss()
+                return None
+            value, expires_at, size = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._pop(key)
+                self.stats.miss()
+                return None
+            self._data.move_to_end(key)
+            self.stats.hit()
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl else None
+        size = self.size_of(value) if self.max_bytes is not None else 0
+        with self._lock:
+            self._pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (value, expires_at, size)
+            self.bytes += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self.bytes > self.max_bytes
+            ):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self.bytes -= evicted_size
+                self.stats.evict()
+
+    def _pop(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class SQLiteCache:
+    """
+    SQLiteファイルに保存するキャッシュ（複数ワーカー間で共有できる）
+    値は文字列で保存し、TTLと件数上限（最終アクセスが古い順）で追い出す
+    """
+    def __init__(
+        self, path: str, max_entries: int, ttl_seconds: Optional[float] = None,
+        table: str = "cache_entries"
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.table = table
+        self.stats = CacheStats()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.table}_accessed_at "
+                f"ON {self.table} (accessed_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.miss()
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.stats.miss()
+                return None
+            conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.stats.hit()
+            return value
+        finally:
+            conn.close()
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[float] = None) -> None:
+        now = time.time()
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = now + ttl if ttl else None
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (now,),
+            )
+            overflow = conn.execute(
+                f"SELECT COUNT(*) FROM {self.table}"
+            ).fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+                self.stats.evict(overflow)
+        finally:
+            conn.close()
+
+    def delete(self, key: str) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        finally:
+            conn.close()
+
+    def clear(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(f"DELETE FROM {self.table}")
+        finally:
+            conn.close()
+
+    def __len__(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        finally:
+            conn.close()
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Dict
 from pydantic_settings import BaseSettings
 from pydantic import AnyHttpUrl
 import os
@@ -13,9 +13,39 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7日間
+    # 認証済みユーザーのキャッシュ（ユーザー更新・無効化時はプロセス内で即時に破棄される）
+    AUTH_CACHE_ENABLED: bool = True
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    AUTH_PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    # 内部メトリクス（GET /metrics）を参照できるユーザー名（空の場合は誰も参照できない）
+    METRICS_ALLOWED_USERS: List[str] = []
+    # bcryptのコスト（変更するとログイン時に既存のハッシュを自動で再ハッシュする）
+    BCRYPT_ROUNDS: int = 12
+    # パスワードハッシュ計算用のプロセス数（0の場合はスレッドで実行）
+    PASSWORD_HASH_WORKERS: int = 2
+    # ハッシュ計算プロセスの優先度を下げ、他のリクエストの処理を優先させる（nice値）
+    PASSWORD_HASH_WORKER_NICE: int = 10
     
     # データベース設定
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./idea_management.db")
+    # 非同期ドライバー用のURL（未設定の場合はDATABASE_URLから自動変換）
+    ASYNC_DATABASE_URL: Optional[str] = os.getenv("ASYNC_DATABASE_URL")
+    # コネクションプールの設定（エンジンごと）
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # PostgreSQLのステートメントタイムアウト（ミリ秒、未設定の場合はサーバーの設定に従う）
+    DB_STATEMENT_TIMEOUT_MS: Optional[int] = None
+    # SQLiteの接続時に設定するPRAGMA
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    # 負の値はKiB単位（-20000で約20MB）
+    SQLITE_CACHE_SIZE: int = -20000
     
     # CORS設定
     BACKEND_CORS_ORIGINS: List[str] = [
@@ -34,6 +64,88 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
     GOOGLE_API_KEY: Optional[str] = os.getenv("GOOGLE_API_KEY")
     CLAUDE_API_KEY: Optional[str] = os.getenv("CLAUDE_API_KEY")
+    # 接続先の上書き（ローカルのスタブサーバー等）
+    OPENAI_BASE_URL: Optional[str] = os.getenv("OPENAI_BASE_URL")
+    CLAUDE_BASE_URL: Optional[str] = os.getenv("CLAUDE_BASE_URL")
+    # プロバイダーごとのタイムアウト（秒）
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+    GOOGLE_TIMEOUT_SECONDS: float = 60.0
+    CLAUDE_TIMEOUT_SECONDS: float = 60.0
+    # プロバイダーごとの同時実行数・1分あたりのリクエスト数/トークン数の上限
+    LLM_MAX_CONCURRENCY: Dict[str, int] = {"openai": 4, "google": 4, "claude": 4}
+    LLM_REQUESTS_PER_MINUTE: Dict[str, int] = {"openai": 60, "google": 60, "claude": 50}
+    LLM_TOKENS_PER_MINUTE: Dict[str, int] = {"openai": 80000, "google": 120000, "claude": 40000}
+    # 429を受けた場合のリトライ設定
+    LLM_MAX_RETRIES: int = 4
+    LLM_BACKOFF_BASE_SECONDS: float = 1.0
+    LLM_BACKOFF_MAX_SECONDS: float = 30.0
+    # llm_model="auto"の対象プロバイダーと、次のプロバイダーを並行して呼ぶまでの待ち時間
+    LLM_AUTO_PROVIDERS: List[str] = ["openai", "claude", "google"]
+    LLM_HEDGE_DELAY_SECONDS: float = 5.0
+    # 長文アイデアの分割生成（このトークン数を超えたらチャンクごとに要約してから生成）
+    LLM_LONG_INPUT_THRESHOLD_TOKENS: int = 6000
+    LLM_CHUNK_TOKENS: int = 3000
+    LLM_CHUNK_CONCURRENCY: int = 4
+    LLM_CHUNK_SUMMARY_TOKENS: int = 800
+    # 要約の連結がコンテキストに収まらない場合は要約をさらに要約する（1チャンクの要約の下限 / 最大段数）
+    LLM_CHUNK_SUMMARY_MIN_TOKENS: int = 200
+    LLM_REDUCE_MAX_ROUNDS: int = 4
+    # プロバイダーごとのモデルのコンテキスト長（トークン、生成のプロンプトと出力の合計の上限）
+    LLM_CONTEXT_TOKENS: Dict[str, int] = {"openai": 8192, "google": 30720, "claude": 200000}
+
+    # アイデア一覧（view=summary）で返す本文の先頭の文字数
+    IDEA_SNIPPET_LENGTH: int = 200
+
+    # アイデアの一括変更（POST /ideas/batch）の1回あたりの変更数の上限
+    IDEA_BATCH_MAX_ITEMS: int = 500
+
+    # アイデアのNDJSONエクスポート・インポート（1回に読み込む件数 / 1トランザクションで登録する件数）
+    IDEA_TRANSFER_BATCH_SIZE: int = 1000
+    # インポートの1行（1アイデア）の最大サイズ（バイト）
+    IDEA_IMPORT_MAX_LINE_BYTES: int = 10 * 1024 * 1024
+
+    # 類似アイデア検索（文字n-gramのTF-IDFベクトル、ユーザーごとにファイルへ保存）
+    SIMILARITY_INDEX_DIR: str = "./similarity_index"
+    SIMILARITY_DIMENSIONS: int = 2048
+    SIMILARITY_BATCH_ROWS: int = 4096
+    # 作成時にこの類似度以上のアイデアがあれば警告として返す
+    SIMILARITY_WARNING_THRESHOLD: float = 0.4
+    SIMILARITY_WARNING_LIMIT: int = 5
+
+    # ホームボードのWebSocket同期（位置・サイズの変更をこの間隔でまとめて書き込む）
+    HOME_BOARD_FLUSH_SECONDS: float = 1.0
+    # 書き込みに続けて失敗した場合に再試行する回数（超えた場合は未保存の変更を捨てる）
+    HOME_BOARD_FLUSH_MAX_RETRIES: int = 3
+
+    # 読み取りAPIのレスポンスキャッシュ（memory / sqlite / none）
+    # ユーザーのデータのバージョンをキーに含め、アイデア・ホームアイテムの更新時にバージョンを進める。
+    # memoryはワーカーごとのため、複数ワーカーで動かす場合はsqlite（ファイルを共有）を使う
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    RESPONSE_CACHE_PATH: str = "./response_cache.db"
+    RESPONSE_CACHE_TTL_SECONDS: int = 60 * 10
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10000
+    # memoryの場合の保存するレスポンスの合計サイズの上限（バイト）
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # 要件定義書キャッシュ設定（memory / sqlite / none）
+    REQUIREMENT_CACHE_BACKEND: str = "memory"
+    REQUIREMENT_CACHE_PATH: str = "./requirement_cache.db"
+    REQUIREMENT_CACHE_TTL_SECONDS: int = 60 * 60 * 24
+    REQUIREMENT_CACHE_MAX_ENTRIES: int = 1000
+
+    # 同一生成リクエストのワーカー間での重複排除（DBのロックテーブルを使用）
+    GENERATION_LOCK_ENABLED: bool = False
+    GENERATION_LOCK_TTL_SECONDS: float = 300.0
+    GENERATION_LOCK_RESULT_TTL_SECONDS: float = 5.0
+    GENERATION_LOCK_POLL_SECONDS: float = 0.5
+
+    # 要件定義書生成ジョブ設定
+    REQUIREMENT_JOB_WORKERS: int = 4
+    REQUIREMENT_JOB_PROVIDER_CONCURRENCY: Dict[str, int] = {
+        "openai": 2, "google": 2, "claude": 2, "auto": 2
+    }
+    REQUIREMENT_JOB_STALE_SECONDS: float = 600.0
+    REQUIREMENT_JOB_MAX_WAIT_SECONDS: float = 30.0
     
     class Config:
         case_sensitive = True
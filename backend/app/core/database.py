@@ -1,21 +1,142 @@
-from sqlalchemy import create_engine
+from typing import Any, Dict
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.schema import CreateColumn, CreateIndex
 from .config import settings
+from .pool_metrics import PoolMetrics, instrument, timed_pool_class
+from .pool_metrics import pool_stats as _pool_stats
 
-# SQLiteの場合は特別な設定が必要
-if settings.DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        settings.DATABASE_URL,
-        connect_args={"check_same_thread": False}
-    )
-else:
-    engine = create_engine(settings.DATABASE_URL)
+def _async_url(url: str) -> str:
+    """
+    同期用のURLを非同期ドライバー（aiosqlite / asyncpg）のURLに変換する
+    """
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    if url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url[len("postgres://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    return url
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _is_sqlite_memory(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or "mode=memory" in url
+
+def _engine_options(url: str, pool_class) -> Dict[str, Any]:
+    """
+    URLに応じたcreate_engineの引数を組み立てる
+    """
+    connect_args: Dict[str, Any] = {}
+    if _is_sqlite(url):
+        connect_args["check_same_thread"] = False
+        if _is_sqlite_memory(url):
+            # インメモリDBは接続ごとに別のDBになるため、方言の既定のプールを使う
+            return {"connect_args": connect_args}
+    elif settings.DB_STATEMENT_TIMEOUT_MS:
+        if "+asyncpg" in url:
+            connect_args["server_settings"] = {
+                "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)
+            }
+        else:
+            connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+    return {
+        "connect_args": connect_args,
+        "poolclass": pool_class,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    SQLiteの接続時にWALモード・同期レベル・ロック待ち時間・キャッシュを設定する
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+    finally:
+        cursor.close()
+
+def _configure(engine: Engine, url: str, metrics: PoolMetrics) -> None:
+    if _is_sqlite(url):
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    instrument(engine, metrics)
+
+engine_metrics = PoolMetrics()
+engine = create_engine(
+    settings.DATABASE_URL,
+    **_engine_options(settings.DATABASE_URL, timed_pool_class(QueuePool, engine_metrics))
+)
+_configure(engine, settings.DATABASE_URL, engine_metrics)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 非同期エンジン（リクエストハンドラーでイベントループをブロックしないために使用）
+_async_database_url = settings.ASYNC_DATABASE_URL or _async_url(settings.DATABASE_URL)
+async_engine_metrics = PoolMetrics()
+async_engine = create_async_engine(
+    _async_database_url,
+    **_engine_options(
+        _async_database_url, timed_pool_class(AsyncAdaptedQueuePool, async_engine_metrics)
+    )
+)
+_configure(async_engine.sync_engine, _async_database_url, async_engine_metrics)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+def pool_stats() -> Dict[str, Any]:
+    return {
+        "sync": _pool_stats(engine, engine_metrics),
+        "async": _pool_stats(async_engine.sync_engine, async_engine_metrics),
+    }
+
 Base = declarative_base()
 
+def add_missing_columns(bind: Engine) -> None:
+    """
+    モデルに後から追加した列を既存のテーブルに追加する（NULL可またはserver_defaultのある列のみ）
+    """
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    raise RuntimeError(
+                        f"Cannot add NOT NULL column {table.name}.{column.name} without a server default"
+                    )
+                definition = CreateColumn(column).compile(dialect=bind.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {definition}"))
+
+def create_indexes(bind: Engine) -> None:
+    """
+    モデルに後から追加した索引を既存のテーブルに作成する（create_allは既存のテーブルには索引を追加しない）
+    """
+    # 式インデックスはinspectorで取得できない場合があるため、IF NOT EXISTSで作成する
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
 # Dependency
 def get_db():
     db = SessionLocal()
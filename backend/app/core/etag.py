@@ -0,0 +1,38 @@
+import hashlib
+from typing import Any, Optional
+from starlette.responses import Response
+
+# ETag（強いETag）と条件付きリクエスト（If-None-Match / If-Match）の判定
+
+def make_etag(*parts: Any) -> str:
+    """
+    リソースの種類・ID・バージョン等からETagを作る
+    """
+    return hash_etag("|".join(str(part) for part in parts).encode("utf-8"))
+
+def hash_etag(data: bytes) -> str:
+    """
+    レスポンスの本文などの内容からETagを作る
+    """
+    return '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+def matches(header: Optional[str], etag: str, *, weak: bool = True) -> bool:
+    """
+    If-None-Match（weak=True、弱い比較）/ If-Match（weak=False、強い比較）の値にetagが含まれるか
+    """
+    if header is None:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,84 @@
+import threading
+import time
+from typing import Any, Dict, Type
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+class PoolMetrics:
+    """
+    コネクションプールのチェックアウト待ち時間と使用中の接続数を記録する
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            self.total_wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def checked_out(self) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def checked_in(self) -> None:
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = self.checkouts + self.timeouts
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "in_use": self.in_use,
+            "max_in_use": self.max_in_use,
+            "avg_wait_seconds": self.total_wait_seconds / waits if waits else 0.0,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+def timed_pool_class(base: Type[Pool], metrics: PoolMetrics) -> Type[Pool]:
+    """
+    接続の取得にかかった時間をmetricsに記録するプールクラスを作る
+    （プールの再生成時もクラスごと引き継がれる）
+    """
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = base._do_get(self)
+        except exc.TimeoutError:
+            metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+    return type(f"Timed{base.__name__}", (base,), {"_do_get": _do_get})
+
+def instrument(engine: Engine, metrics: PoolMetrics) -> None:
+    """
+    エンジンのプールイベントから使用中の接続数を記録する
+    """
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checked_out()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.checked_in()
+
+def pool_stats(engine: Engine, metrics: PoolMetrics) -> Dict[str, Any]:
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__, **metrics.stats()}
+    if hasattr(pool, "size") and hasattr(pool, "overflow"):
+        stats["size"] = pool.size()
+        stats["overflow"] = pool.overflow()
+    return stats
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
+from pydantic import TypeAdapter
+from starlette.responses import Response
+from . import etag as etags
+from .cache import MemoryCache, SQLiteCache
+from .config import settings
+
+# 読み取りAPIのレスポンス（シリアライズ済みのJSON）のキャッシュ
+# キーは（ユーザー, ルート, パラメーター, ユーザーのデータのバージョン）。
+# アイデア・ホームアイテムの作成・更新・削除でコミット後にバージョンを進めるため、古いレスポンスは参照されなくなる。
+# バージョンはDBを読む前に取得する（読み込み中に更新された場合は古いバージョンのキーで保存される）。
+
+class _MemoryVersions:
+    def __init__(self):
+        self._versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    def bump(self, user_id: int) -> None:
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+class _SQLiteVersions:
+    """
+    キャッシュと同じSQLiteファイルに保存するバージョン（ワーカー間で共有する）
+    """
+    def __init__(self, path: str, table: str = "response_cache_versions"):
+        self.path = path
+        self.table = table
+        with self._connect() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "user_id INTEGER PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+
+    def get(self, user_id: int) -> int:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                f"SELECT version FROM {self.table} WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def bump(self, user_id: int) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"INSERT INTO {self.table} (user_id, version) VALUES (?, 1) "
+                "ON CONFLICT (user_id) DO UPDATE SET version = version + 1",
+                (user_id,),
+            )
+        finally:
+            conn.close()
+
+_backend: Optional[Union[MemoryCache, SQLiteCache]] = None
+_versions: Optional[Union[_MemoryVersions, _SQLiteVersions]] = None
+_backend_lock = threading.Lock()
+
+def _get_backend() -> Tuple[Optional[Union[MemoryCache, SQLiteCache]], Any]:
+    global _backend, _versions
+    with _backend_lock:
+        if _backend is None:
+            if settings.RESPONSE_CACHE_BACKEND == "memory":
+                _backend = MemoryCache(
+                    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+                    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+                    size_of=lambda value: len(value[1]),
+                )
+                _versions = _MemoryVersions()
+            elif settings.RESPONSE_CACHE_BACKEND == "sqlite":
+                _backend = SQLiteCache(
+                    settings.RESPONSE_CACHE_PATH,
+                    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+                    table="response_cache",
+                )
+                _versions = _SQLiteVersions(settings.RESPONSE_CACHE_PATH)
+    return _backend, _versions
+
+def _make_key(user_id: int, version: int, route: str, params: Mapping[str, Any]) -> str:
+    return json.dumps(
+        [user_id, version, route, sorted((k, str(v)) for k, v in params.items())],
+        ensure_ascii=False, separators=(",", ":"),
+    )
+
+def _lookup(
+    user_id: int, route: str, params: Mapping[str, Any]
+) -> Tuple[Optional[str], Optional[Tuple[Dict[str, str], bytes]]]:
+    backend, versions = _get_backend()
+    if backend is None:
+        return None, None
+    key = _make_key(user_id, versions.get(user_id), route, params)
+    value = backend.get(key)
+    if value is None or isinstance(value, tuple):
+        return key, value
+    # SQLiteには「ヘッダーのJSON + 改行 + 本文」の文字列で保存する
+    headers, body = value.split("\n", 1)
+    return key, (json.loads(headers), body.encode("utf-8"))
+
+def _store(key: str, headers: Dict[str, str], body: bytes) -> None:
+    backend, _ = _get_backend()
+    if isinstance(backend, MemoryCache):
+        backend.set(key, (headers, body))
+    elif backend is not None:
+        backend.set(key, json.dumps(headers) + "\n" + body.decode("utf-8"))
+
+def _json_response(headers: Dict[str, str], body: bytes) -> Response:
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def lookup(
+    user_id: int, route: str, params: Mapping[str, Any], if_none_match: Optional[str] = None
+) -> Tuple[Optional[str], Optional[Response]]:
+    """
+    キャッシュキー（キャッシュが無効の場合はNone）と、キャッシュされたレスポンスを返す
+    If-None-MatchがキャッシュされたレスポンスのETagと一致する場合は304を返す
+    """
+    if settings.RESPONSE_CACHE_BACKEND == "sqlite":
+        key, entry = await asyncio.to_thread(_lookup, user_id, route, params)
+    else:
+        key, entry = _lookup(user_id, route, params)
+    if entry is None:
+        return key, None
+    headers, body = entry
+    if "ETag" in headers and etags.matches(if_none_match, headers["ETag"]):
+        return key, etags.not_modified(headers["ETag"])
+    return key, _json_response(headers, body)
+
+async def store(
+    key: Optional[str], adapter: TypeAdapter, value: Any, headers: Optional[Dict[str, str]] = None,
+    *, etag: Optional[str] = None, if_none_match: Optional[str] = None
+) -> Response:
+    """
+    レスポンスモデルでシリアライズしたJSONを保存し、そのレスポンスを返す
+    valueはORMのオブジェクトでもよい（レスポンスモデルに変換してからシリアライズする）
+    etagを指定しない場合は本文のハッシュをETagにする
+    """
+    body = adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+    return await store_body(key, body, headers, etag=etag, if_none_match=if_none_match)
+
+async def store_body(
+    key: Optional[str], body: bytes, headers: Optional[Dict[str, str]] = None,
+    *, etag: Optional[str] = None, if_none_match: Optional[str] = None
+) -> Response:
+    """
+    シリアライズ済みのJSONを保存し、そのレスポンスを返す（行から直接作った一覧用）
+    """
+    headers = {**(headers or {}), "ETag": etag or etags.hash_etag(body)}
+    if key is not None:
+        if settings.RESPONSE_CACHE_BACKEND == "sqlite":
+            await asyncio.to_thread(_store, key, headers, body)
+        else:
+            _store(key, headers, body)
+    if etags.matches(if_none_match, headers["ETag"]):
+        return etags.not_modified(headers["ETag"])
+    return _json_response(headers, body)
+
+def bump(user_id: int) -> None:
+    """
+    ユーザーのデータが変更されたことを記録する（コミット後に呼ぶ）
+    """
+    _, versions = _get_backend()
+    if versions is not None:
+        versions.bump(user_id)
+
+async def abump(user_id: int) -> None:
+    if settings.RESPONSE_CACHE_BACKEND == "sqlite":
+        await asyncio.to_thread(bump, user_id)
+    else:
+        bump(user_id)
+
+def stats() -> Dict[str, Any]:
+    backend, _ = _get_backend()
+    if backend is None:
+        return {"backend": "none"}
+    result = {
+        "backend": settings.RESPONSE_CACHE_BACKEND,
+        "entries": len(backend),
+        **backend.stats.as_dict(),
+    }
+    if isinstance(backend, MemoryCache):
+        result["bytes"] = backend.bytes
+    return result
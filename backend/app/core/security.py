@@ -1,13 +1,22 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from .config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
 
 ALGORITHM = "HS256"
 
+# bcryptはCPUを長時間使うため、イベントループとは別のプロセスで実行する
+_password_pool: Optional[ProcessPoolExecutor] = None
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -21,5 +30,65 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    パスワードを検証し、コストが現在の設定と異なる場合は新しいハッシュも返す
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context.hash(password)
+
+def _init_password_worker() -> None:
+    if settings.PASSWORD_HASH_WORKER_NICE and hasattr(os, "nice"):
+        os.nice(settings.PASSWORD_HASH_WORKER_NICE)
+
+def _get_password_pool() -> Optional[ProcessPoolExecutor]:
+    global _password_pool
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return None
+    if _password_pool is None:
+        # forkはイベントループやDB接続を持つプロセスの複製になるためspawnを使う
+        _password_pool = ProcessPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_password_worker,
+        )
+    return _password_pool
+
+async def _run_in_password_pool(fn, *args):
+    pool = _get_password_pool()
+    if pool is None:
+        return await asyncio.to_thread(fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+async def ahash_password(password: str) -> str:
+    return await _run_in_password_pool(get_password_hash, password)
+
+async def averify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return await _run_in_password_pool(
+        verify_and_update_password, plain_password, hashed_password
+    )
+
+def _warm_up() -> None:
+    # 最初のハッシュ計算でbcryptのバックエンドが読み込まれるため、起動時に済ませておく
+    get_password_hash("warm-up")
+
+def start_password_pool() -> None:
+    """
+    ワーカープロセスを先に起動してbcryptを読み込ませ、最初のログインでの起動待ちをなくす
+    """
+    pool = _get_password_pool()
+    if pool is not None:
+        for _ in range(settings.PASSWORD_HASH_WORKERS):
+            pool.submit(_warm_up)
+
+def shutdown_password_pool() -> None:
+    global _password_pool
+    if _password_pool is not None:
+        _password_pool.shutdown(wait=False, cancel_futures=True)
+        _password_pool = None
@@ -0,0 +1,9 @@
+from typing import Any
+import orjson
+
+# 一覧APIのJSONを、ORMのエンティティ・レスポンスモデルを経由せずに行の値から直接作る
+# 出力はpydanticのdump_jsonと同じ形式にする（UTCのdatetimeは"Z"、dictのキーは文字列に変換）
+_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value, option=_OPTIONS)
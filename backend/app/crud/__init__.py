@@ -1,3 +1,9 @@
-from . import crud_user, crud_idea, crud_requirement, crud_home
+from . import (
+    crud_user, crud_idea, crud_requirement, crud_home, crud_generation_lock, crud_job,
+    crud_search, crud_home_spatial,
+)
 
-__all__ = ["crud_user", "crud_idea", "crud_requirement", "crud_home"]
\ No newline at end of file
+__all__ = [
+    "crud_user", "crud_idea", "crud_requirement", "crud_home",
+    "crud_generation_lock", "crud_job", "crud_search", "crud_home_spatial",
+]
\ No newline at end of file
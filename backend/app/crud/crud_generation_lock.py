@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..models import GenerationLock
+
+def acquire(db: Session, *, key: str, ttl_seconds: float) -> bool:
+    """
+    ロックを取得する（期限切れのロックは取り除いてから取得を試みる）
+    """
+    now = datetime.utcnow()
+    db.query(GenerationLock).filter(
+        GenerationLock.key == key, GenerationLock.expires_at <= now
+    ).delete(synchronize_session=False)
+    db.add(GenerationLock(key=key, expires_at=now + timedelta(seconds=ttl_seconds)))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
+def get(db: Session, *, key: str) -> Optional[GenerationLock]:
+    return db.query(GenerationLock).filter(
+        GenerationLock.key == key, GenerationLock.expires_at > datetime.utcnow()
+    ).first()
+
+def complete(db: Session, *, key: str, requirement_id: int, ttl_seconds: float) -> None:
+    """
+    生成結果を記録し、待機中のワーカーが結果を読み取れるよう短時間だけロックを残す
+    """
+    db.query(GenerationLock).filter(GenerationLock.key == key).update(
+        {
+            GenerationLock.requirement_id: requirement_id,
+            GenerationLock.expires_at: datetime.utcnow() + timedelta(seconds=ttl_seconds),
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+
+def release(db: Session, *, key: str) -> None:
+    db.query(GenerationLock).filter(GenerationLock.key == key).delete(
+        synchronize_session=False
+    )
+    db.commit()
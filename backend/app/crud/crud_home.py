@@ -1,7 +1,107 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import select
+from sqlalchemy import delete as sql_delete, insert as sql_insert, update as sql_update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from ..models import HomeItem
-from ..schemas import HomeItemCreate, HomeItemUpdate
+from ..models import HomeItem, HomeBoard, HomeItemChange
+from ..schemas import HomeItemCreate, HomeItemUpdate, HomeItemBatch
+from . import crud_home_spatial
+from ..core import response_cache
+
+# ボードのバージョン
+# アイテムを変更するたびにユーザーのボードのバージョンを1つ進め、変更したアイテムに記録する。
+# クライアントは前回受け取ったバージョンを渡すと、それ以降に変更・削除されたアイテムだけを受け取れる。
+
+# ON CONFLICTに対応したINSERT（SQLite / PostgreSQL）
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+def _bump_version_statement(dialect: str, owner_id: int):
+    """
+    ボードの行がなければバージョン1で作り、あれば1つ進める
+    1文で行うため、同じユーザーの最初の書き込みが同時に来ても一意制約違反にならない
+    """
+    return (
+        _UPSERT_INSERTS[dialect](HomeBoard)
+        .values(user_id=owner_id, version=1)
+        .on_conflict_do_update(
+            index_elements=[HomeBoard.user_id], set_={"version": HomeBoard.version + 1}
+        )
+        .returning(HomeBoard.version)
+    )
+
+def _record_changes_statements(
+    owner_id: int, version: int, item_ids: Sequence[int], deleted: bool
+) -> List[Tuple[Any, Any]]:
+    """
+    アイテムごとの最終変更バージョンを置き換える（各アイテム1行のみ残す）
+    """
+    if not item_ids:
+        return []
+    return [
+        (
+            sql_delete(HomeItemChange).where(
+                HomeItemChange.user_id == owner_id, HomeItemChange.item_id.in_(item_ids)
+            ),
+            None,
+        ),
+        (
+            sql_insert(HomeItemChange),
+            [
+                {"user_id": owner_id, "item_id": id, "version": version, "deleted": deleted}
+                for id in item_ids
+            ],
+        ),
+    ]
+
+# 一覧のJSONを行から直接作る場合の列（schemas.HomeItemのフィールドと同じ順）
+ITEM_COLUMNS = (
+    HomeItem.title, HomeItem.content, HomeItem.link,
+    HomeItem.position_x, HomeItem.position_y, HomeItem.width, HomeItem.height,
+    HomeItem.color, HomeItem.style, HomeItem.id, HomeItem.user_id,
+)
+
+def _changed_items_query(owner_id: int, since: int, columns=(HomeItem,)):
+    return (
+        select(*columns)
+        .join(
+            HomeItemChange,
+            (HomeItemChange.user_id == HomeItem.user_id) & (HomeItemChange.item_id == HomeItem.id),
+        )
+        .where(HomeItemChange.user_id == owner_id, HomeItemChange.version > since)
+        .order_by(HomeItem.id)
+    )
+
+def _deleted_ids_query(owner_id: int, since: int):
+    return (
+        select(HomeItemChange.item_id)
+        .where(
+            HomeItemChange.user_id == owner_id,
+            HomeItemChange.version > since,
+            HomeItemChange.deleted.is_(True),
+        )
+        .order_by(HomeItemChange.item_id)
+    )
+
+def _item_version_query(owner_id: int, item_id: int):
+    return select(HomeItemChange.version).where(
+        HomeItemChange.user_id == owner_id, HomeItemChange.item_id == item_id
+    )
+
+def _update_rows(obj_in: HomeItemBatch) -> List[Dict[str, Any]]:
+    rows = [patch.model_dump(exclude_unset=True) for patch in obj_in.update]
+    return [row for row in rows if len(row) > 1]
+
+def bump_version(db: Session, *, owner_id: int) -> int:
+    return db.scalar(_bump_version_statement(db.get_bind().dialect.name, owner_id))
+
+def record_changes(
+    db: Session, *, owner_id: int, item_ids: Sequence[int], deleted: bool = False
+) -> int:
+    version = bump_version(db, owner_id=owner_id)
+    for statement, params in _record_changes_statements(owner_id, version, item_ids, deleted):
+        db.execute(statement, params)
+    return version
 
 def get(db: Session, id: int) -> Optional[HomeItem]:
     return db.query(HomeItem).filter(HomeItem.id == id).first()
@@ -9,31 +109,181 @@ def get(db: Session, id: int) -> Optional[HomeItem]:
 def get_multi_by_owner(db: Session, *, owner_id: int) -> List[HomeItem]:
     return db.query(HomeItem).filter(HomeItem.user_id == owner_id).all()
 
+def get_version(db: Session, *, owner_id: int) -> int:
+    return db.scalar(select(HomeBoard.version).where(HomeBoard.user_id == owner_id)) or 0
+
+def get_item_version(db: Session, *, owner_id: int, item_id: int) -> int:
+    """
+    アイテムを最後に変更したボードのバージョン（変更履歴がない場合は0、ETag用）
+    """
+    return db.scalar(_item_version_query(owner_id, item_id)) or 0
+
 def create_with_owner(
     db: Session, *, obj_in: HomeItemCreate, owner_id: int
 ) -> HomeItem:
     db_obj = HomeItem(
-        **obj_in.dict(),
+        **obj_in.model_dump(),
         user_id=owner_id
     )
     db.add(db_obj)
+    db.flush()
+    crud_home_spatial.index_items(db, [db_obj.id])
+    record_changes(db, owner_id=owner_id, item_ids=[db_obj.id])
     db.commit()
     db.refresh(db_obj)
+    response_cache.bump(owner_id)
     return db_obj
 
 def update(
     db: Session, *, db_obj: HomeItem, obj_in: HomeItemUpdate
 ) -> HomeItem:
-    update_data = obj_in.dict(exclude_unset=True)
+    update_data = obj_in.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_obj, field, value)
     db.add(db_obj)
+    db.flush()
+    crud_home_spatial.index_items(db, [db_obj.id])
+    record_changes(db, owner_id=db_obj.user_id, item_ids=[db_obj.id])
     db.commit()
     db.refresh(db_obj)
+    response_cache.bump(db_obj.user_id)
     return db_obj
 
 def remove(db: Session, *, id: int) -> HomeItem:
     obj = db.query(HomeItem).filter(HomeItem.id == id).first()
     db.delete(obj)
+    crud_home_spatial.remove_items(db, [obj.id])
+    record_changes(db, owner_id=obj.user_id, item_ids=[obj.id], deleted=True)
+    owner_id = obj.user_id
     db.commit()
-    return obj
\ No newline at end of file
+    response_cache.bump(owner_id)
+    return obj
+
+# 非同期版
+
+async def abump_version(db: AsyncSession, *, owner_id: int) -> int:
+    return await db.scalar(_bump_version_statement(db.get_bind().dialect.name, owner_id))
+
+async def arecord_changes(
+    db: AsyncSession, *, owner_id: int, item_ids: Sequence[int], deleted: bool = False
+) -> int:
+    version = await abump_version(db, owner_id=owner_id)
+    for statement, params in _record_changes_statements(owner_id, version, item_ids, deleted):
+        await db.execute(statement, params)
+    return version
+
+async def aget(db: AsyncSession, id: int) -> Optional[HomeItem]:
+    return await db.scalar(select(HomeItem).where(HomeItem.id == id))
+
+async def aget_multi_by_owner(db: AsyncSession, *, owner_id: int) -> List[HomeItem]:
+    result = await db.scalars(select(HomeItem).where(HomeItem.user_id == owner_id))
+    return list(result)
+
+async def aget_rows_by_owner(db: AsyncSession, *, owner_id: int) -> List[Dict[str, Any]]:
+    """
+    aget_multi_by_ownerと同じ一覧を、ORMのエンティティを作らずに行の辞書で返す
+    （ITEM_COLUMNSの順のため、そのままJSONにすればschemas.HomeItemと同じ形式になる）
+    """
+    result = await db.execute(select(*ITEM_COLUMNS).where(HomeItem.user_id == owner_id))
+    return [dict(row._mapping) for row in result]
+
+async def aget_version(db: AsyncSession, *, owner_id: int) -> int:
+    return await db.scalar(select(HomeBoard.version).where(HomeBoard.user_id == owner_id)) or 0
+
+async def aget_changes_since(
+    db: AsyncSession, *, owner_id: int, since: int
+) -> Tuple[List[HomeItem], List[int]]:
+    items = list(await db.scalars(_changed_items_query(owner_id, since)))
+    deleted = list(await db.scalars(_deleted_ids_query(owner_id, since)))
+    return items, deleted
+
+async def aget_changed_rows_since(
+    db: AsyncSession, *, owner_id: int, since: int
+) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    aget_changes_sinceのアイテムを行の辞書で返す
+    """
+    result = await db.execute(_changed_items_query(owner_id, since, ITEM_COLUMNS))
+    items = [dict(row._mapping) for row in result]
+    deleted = list(await db.scalars(_deleted_ids_query(owner_id, since)))
+    return items, deleted
+
+async def aget_item_version(db: AsyncSession, *, owner_id: int, item_id: int) -> int:
+    return await db.scalar(_item_version_query(owner_id, item_id)) or 0
+
+async def aget_owners(db: AsyncSession, *, ids: Sequence[int]) -> Dict[int, int]:
+    if not ids:
+        return {}
+    result = await db.execute(select(HomeItem.id, HomeItem.user_id).where(HomeItem.id.in_(ids)))
+    return dict(result.all())
+
+async def acreate_with_owner(
+    db: AsyncSession, *, obj_in: HomeItemCreate, owner_id: int
+) -> HomeItem:
+    db_obj = HomeItem(
+        **obj_in.model_dump(),
+        user_id=owner_id
+    )
+    db.add(db_obj)
+    await db.flush()
+    await crud_home_spatial.aindex_items(db, [db_obj.id])
+    await arecord_changes(db, owner_id=owner_id, item_ids=[db_obj.id])
+    await db.commit()
+    await db.refresh(db_obj)
+    await response_cache.abump(owner_id)
+    return db_obj
+
+async def aupdate(
+    db: AsyncSession, *, db_obj: HomeItem, obj_in: HomeItemUpdate
+) -> HomeItem:
+    update_data = obj_in.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(db_obj, field, value)
+    db.add(db_obj)
+    await db.flush()
+    await crud_home_spatial.aindex_items(db, [db_obj.id])
+    await arecord_changes(db, owner_id=db_obj.user_id, item_ids=[db_obj.id])
+    await db.commit()
+    await db.refresh(db_obj)
+    await response_cache.abump(db_obj.user_id)
+    return db_obj
+
+async def aremove(db: AsyncSession, *, id: int) -> HomeItem:
+    obj = await db.scalar(select(HomeItem).where(HomeItem.id == id))
+    await db.delete(obj)
+    await crud_home_spatial.aremove_items(db, [obj.id])
+    await arecord_changes(db, owner_id=obj.user_id, item_ids=[obj.id], deleted=True)
+    await db.commit()
+    await response_cache.abump(obj.user_id)
+    return obj
+
+async def aapply_batch(
+    db: AsyncSession, *, obj_in: HomeItemBatch, owner_id: int
+) -> Tuple[int, List[HomeItem], List[int]]:
+    created: List[HomeItem] = []
+    if obj_in.create:
+        created = list(await db.scalars(
+            sql_insert(HomeItem).returning(HomeItem, sort_by_parameter_order=True),
+            [{**item.model_dump(), "user_id": owner_id} for item in obj_in.create],
+        ))
+    rows = _update_rows(obj_in)
+    if rows:
+        await db.execute(sql_update(HomeItem), rows)
+    if obj_in.delete:
+        await db.execute(sql_delete(HomeItem).where(HomeItem.id.in_(obj_in.delete)))
+
+    deleted_ids = list(dict.fromkeys(obj_in.delete))
+    updated_ids = [id for id in dict.fromkeys(row["id"] for row in rows) if id not in deleted_ids]
+    changed_ids = [item.id for item in created] + updated_ids
+    await crud_home_spatial.aindex_items(db, changed_ids)
+    await crud_home_spatial.aremove_items(db, deleted_ids)
+    version = await arecord_changes(db, owner_id=owner_id, item_ids=changed_ids)
+    for statement, params in _record_changes_statements(owner_id, version, deleted_ids, True):
+        await db.execute(statement, params)
+    updated = list(await db.scalars(
+        select(HomeItem).where(HomeItem.id.in_(updated_ids)).order_by(HomeItem.id)
+        .execution_options(populate_existing=True)
+    )) if updated_ids else []
+    await db.commit()
+    await response_cache.abump(owner_id)
+    return version, created + updated, deleted_ids
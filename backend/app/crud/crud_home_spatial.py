@@ -0,0 +1,181 @@
+import logging
+import math
+from typing import Any, Dict, List, Sequence, Tuple
+from sqlalchemy import bindparam, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..models import HomeItem
+
+logger = logging.getLogger(__name__)
+
+# ホームボードのアイテムの空間インデックス（表示範囲に重なるアイテムだけを取得する）
+# SQLite: R*Treeの仮想テーブル。ユーザーIDも1つの次元にして、他のユーザーのアイテムを索引の段階で除外する。
+# R*Treeは32bit浮動小数点で範囲を広めに丸めて保存するため、取得後に元の列の値で絞り込む。
+# R*Treeが使えない場合（PostgreSQLなど）: home_itemsの(user_id, position_x, position_y)の索引で範囲を検索する。
+# どちらも幅・高さが0以上（position_xが左端）であることを前提にする（スキーマで負のサイズは受け付けない）。
+# サイズを検証する前に登録された負のサイズのアイテムはR*Treeに登録しない（migrate_home_item_sizes.pyで直す）。
+TABLE = "home_item_rtree"
+
+_SQLITE_DDL = f"""
+CREATE VIRTUAL TABLE {TABLE} USING rtree(
+    id, min_user, max_user, min_x, max_x, min_y, max_y
+)
+"""
+
+# R*Treeは最小値が最大値を超える範囲を登録できないため、幅・高さが0以上のアイテムだけを選ぶ
+_VALID_SIZE = "width >= 0 AND height >= 0"
+
+_INDEX_SELECT = (
+    "SELECT id, user_id, user_id, position_x, position_x + width, position_y, position_y + height "
+    f"FROM home_items WHERE {_VALID_SIZE}"
+)
+
+_rtree = False
+
+def create_index(engine: Engine) -> None:
+    """
+    空間インデックスがなければ作成し、既存のアイテムを登録する（起動時に呼ぶ）
+    アイテムのデータは変更しない（負のサイズのアイテムは登録せずに件数を記録する）
+    """
+    global _rtree
+    if engine.dialect.name != "sqlite":
+        return
+    if inspect(engine).has_table(TABLE):
+        _rtree = True
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(_SQLITE_DDL))
+            conn.execute(text(f"INSERT INTO {TABLE} {_INDEX_SELECT}"))
+            skipped = conn.scalar(text(f"SELECT count(*) FROM home_items WHERE NOT ({_VALID_SIZE})"))
+    except OperationalError:
+        logger.warning("SQLite R*Tree is not available; viewport queries use the home_items index")
+        return
+    if skipped:
+        logger.warning(
+            "%d home items with a negative size were not added to the spatial index; "
+            "run migrate_home_item_sizes.py to fix them", skipped
+        )
+    _rtree = True
+
+def normalize_sizes(engine: Engine) -> int:
+    """
+    負の幅・高さで登録されたアイテム（サイズを検証する前のデータ）を、同じ範囲を表す正のサイズに直し、
+    空間インデックスに登録する（migrate_home_item_sizes.pyから明示的に実行する）
+    戻り値: 直したアイテムの件数
+    """
+    items = HomeItem.__table__
+    invalid = (items.c.width < 0) | (items.c.height < 0)
+    with engine.begin() as conn:
+        ids = list(conn.scalars(select(items.c.id).where(invalid)))
+        if not ids:
+            return 0
+        conn.execute(
+            update(items).where(items.c.width < 0)
+            .values(position_x=items.c.position_x + items.c.width, width=-items.c.width)
+        )
+        conn.execute(
+            update(items).where(items.c.height < 0)
+            .values(position_y=items.c.position_y + items.c.height, height=-items.c.height)
+        )
+        if engine.dialect.name == "sqlite" and inspect(conn).has_table(TABLE):
+            for statement, params in _index_statements(ids):
+                conn.execute(statement, params)
+    return len(ids)
+
+# インデックスの更新（アイテムのCRUDと同じトランザクションで実行する）
+
+Statement = Tuple[Any, Dict[str, Any]]
+
+def _index_statements(item_ids: Sequence[int]) -> List[Statement]:
+    return [(
+        text(f"INSERT OR REPLACE INTO {TABLE} {_INDEX_SELECT} AND id IN :ids")
+        .bindparams(bindparam("ids", expanding=True)),
+        {"ids": list(item_ids)},
+    )]
+
+def _index_items(item_ids: Sequence[int]) -> List[Statement]:
+    if not _rtree or not item_ids:
+        return []
+    return _index_statements(item_ids)
+
+def _remove_items(item_ids: Sequence[int]) -> List[Statement]:
+    if not _rtree or not item_ids:
+        return []
+    return [(
+        text(f"DELETE FROM {TABLE} WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+        {"ids": list(item_ids)},
+    )]
+
+def index_items(db: Session, item_ids: Sequence[int]) -> None:
+    for statement, params in _index_items(item_ids):
+        db.execute(statement, params)
+
+def remove_items(db: Session, item_ids: Sequence[int]) -> None:
+    for statement, params in _remove_items(item_ids):
+        db.execute(statement, params)
+
+# 表示範囲の検索
+
+Viewport = Tuple[float, float, float, float]
+
+def parse_viewport(value: str) -> Viewport:
+    """
+    "x0,y0,x1,y1"を解析する（不正な場合はValueError）
+    """
+    parts = value.split(",")
+    if len(parts) != 4:
+        raise ValueError("viewport must be x0,y0,x1,y1")
+    x0, y0, x1, y1 = (float(part) for part in parts)
+    if not all(math.isfinite(v) for v in (x0, y0, x1, y1)):
+        raise ValueError("viewport must be finite numbers")
+    if x0 > x1 or y0 > y1:
+        raise ValueError("viewport must satisfy x0 <= x1 and y0 <= y1")
+    return x0, y0, x1, y1
+
+def _viewport_query(owner_id: int, viewport: Viewport, columns=(HomeItem,)):
+    x0, y0, x1, y1 = viewport
+    user_id, position_x = HomeItem.user_id, HomeItem.position_x
+    if _rtree:
+        # home_itemsの索引を使わせず（+0）、R*Treeの候補から主キーでアイテムを引かせる
+        user_id, position_x = HomeItem.user_id + 0, HomeItem.position_x + 0
+    query = select(*columns).where(
+        user_id == owner_id,
+        position_x <= x1,
+        HomeItem.position_x + HomeItem.width >= x0,
+        HomeItem.position_y <= y1,
+        HomeItem.position_y + HomeItem.height >= y0,
+    )
+    if _rtree:
+        candidates = text(
+            f"SELECT id FROM {TABLE} WHERE min_user <= :owner_id AND max_user >= :owner_id "
+            "AND min_x <= :x1 AND max_x >= :x0 AND min_y <= :y1 AND max_y >= :y0"
+        ).bindparams(owner_id=owner_id, x0=x0, y0=y0, x1=x1, y1=y1).columns(id=HomeItem.id.type)
+        query = query.where(HomeItem.id.in_(select(candidates.subquery().c.id)))
+    return query.order_by(HomeItem.id)
+
+# 非同期版
+
+async def aindex_items(db: AsyncSession, item_ids: Sequence[int]) -> None:
+    for statement, params in _index_items(item_ids):
+        await db.execute(statement, params)
+
+async def aremove_items(db: AsyncSession, item_ids: Sequence[int]) -> None:
+    for statement, params in _remove_items(item_ids):
+        await db.execute(statement, params)
+
+async def aget_in_viewport(
+    db: AsyncSession, *, owner_id: int, viewport: Viewport
+) -> List[HomeItem]:
+    return list(await db.scalars(_viewport_query(owner_id, viewport)))
+
+async def aget_rows_in_viewport(
+    db: AsyncSession, *, owner_id: int, viewport: Viewport, columns: Sequence[Any]
+) -> List[Dict[str, Any]]:
+    """
+    aget_in_viewportのアイテムを、columnsの列の値の辞書で返す（ORMのエンティティは作らない）
+    """
+    result = await db.execute(_viewport_query(owner_id, viewport, columns))
+    return [dict(row._mapping) for row in result]
@@ -1,7 +1,92 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from ..models import Idea
-from ..schemas import IdeaCreate, IdeaUpdate
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import DateTime, bindparam, func, insert, or_, select
+from sqlalchemy import delete as sql_delete, update as sql_update
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from ..models import Idea, Requirement, Comment, Bookmark, Share
+from . import crud_search
+from .crud_requirement import content_hash
+from ..core import response_cache
+from ..schemas import IdeaBatch, IdeaCreate, IdeaSort, IdeaTransfer, IdeaUpdate
+
+# SQLiteではfunc.now()（CURRENT_TIMESTAMP）が秒単位の文字列で保存されるため、
+# カーソルの値も同じ形式で比較する
+_CURSOR_DATETIME = DateTime().with_variant(
+    sqlite.DATETIME(
+        storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+    ),
+    "sqlite",
+)
+
+def _sort_key(sort: IdeaSort):
+    if sort.startswith("updated"):
+        return func.coalesce(Idea.updated_at, Idea.created_at)
+    return Idea.created_at
+
+def _order_by(sort: IdeaSort):
+    key = _sort_key(sort)
+    if sort.endswith("desc"):
+        return key.desc(), Idea.id.desc()
+    return key.asc(), Idea.id.asc()
+
+def encode_cursor(sort: IdeaSort, idea: Any) -> str:
+    """
+    ideaはcreated_at / updated_at / idを持つもの（エンティティまたは行）
+    """
+    value = idea.created_at
+    if sort.startswith("updated") and idea.updated_at is not None:
+        value = idea.updated_at
+    payload = json.dumps({"s": sort, "v": value.isoformat(), "id": idea.id})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(sort: IdeaSort, cursor: str) -> Tuple[datetime, int]:
+    """
+    カーソルを（並び順のキーの値, id）に戻す（不正な値や並び順の不一致はValueError）
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value, id = datetime.fromisoformat(payload["v"]), int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if payload.get("s") != sort:
+        raise ValueError("Cursor does not match the sort order")
+    return value, id
+
+# 詳細（関連する一覧を新しい順にlimit件まで）
+# 関連はselectinloadで一覧ごとに1回のクエリで読み込むため、件数によらずクエリ数は一定（アイデア + 3）
+DETAIL_COLLECTIONS = (
+    ("requirements", Idea.requirements, Requirement),
+    ("comments", Idea.comments, Comment),
+    ("bookmarks", Idea.bookmarks, Bookmark),
+)
+
+def _details_query(id: int, *, limit: int, offsets: Dict[str, int]):
+    options = []
+    for name, relationship, model in DETAIL_COLLECTIONS:
+        # 続きがあるか判定するため1件多く読む
+        page = (
+            select(model.id)
+            .where(model.idea_id == id)
+            .order_by(model.created_at.desc(), model.id.desc())
+            .offset(offsets.get(name, 0))
+            .limit(limit + 1)
+        )
+        options.append(selectinload(relationship.and_(model.id.in_(page))))
+    return select(Idea).where(Idea.id == id).options(*options)
+
+def _details(idea: Idea, *, limit: int) -> Dict[str, Any]:
+    details = {column.key: getattr(idea, column.key) for column in Idea.__table__.columns}
+    for name, _, _ in DETAIL_COLLECTIONS:
+        # 読み込んだ関連のコレクションは変更しない（delete-orphanで削除されるため）
+        items = sorted(getattr(idea, name), key=lambda item: (item.created_at, item.id), reverse=True)
+        details[name] = items[:limit]
+        details[f"{name}_has_more"] = len(items) > limit
+    return details
 
 def get(db: Session, id: int) -> Optional[Idea]:
     return db.query(Idea).filter(Idea.id == id).first()
@@ -12,6 +97,7 @@ def get_multi_by_owner(
     return (
         db.query(Idea)
         .filter(Idea.owner_id == owner_id)
+        .order_by(*_order_by("created_desc"))
         .offset(skip)
         .limit(limit)
         .all()
@@ -21,27 +107,429 @@ def create_with_owner(
     db: Session, *, obj_in: IdeaCreate, owner_id: int
 ) -> Idea:
     db_obj = Idea(
-        **obj_in.dict(),
+        **obj_in.model_dump(),
         owner_id=owner_id
     )
     db.add(db_obj)
+    db.flush()
+    crud_search.index_idea(db, db_obj)
     db.commit()
     db.refresh(db_obj)
+    response_cache.bump(owner_id)
     return db_obj
 
 def update(
     db: Session, *, db_obj: Idea, obj_in: IdeaUpdate
 ) -> Idea:
-    update_data = obj_in.dict(exclude_unset=True)
+    update_data = obj_in.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_obj, field, value)
     db.add(db_obj)
+    if "title" in update_data or "content" in update_data:
+        crud_search.index_idea(db, db_obj)
     db.commit()
     db.refresh(db_obj)
+    response_cache.bump(db_obj.owner_id)
     return db_obj
 
 def remove(db: Session, *, id: int) -> Idea:
     obj = db.query(Idea).filter(Idea.id == id).first()
+    requirement_ids = [
+        requirement_id for (requirement_id,) in
+        db.query(Requirement.id).filter(Requirement.idea_id == id)
+    ]
+    crud_search.remove_idea(db, idea_id=id, requirement_ids=requirement_ids)
+    owner_id = obj.owner_id
     db.delete(obj)
     db.commit()
-    return obj
\ No newline at end of file
+    response_cache.bump(owner_id)
+    return obj
+
+# 非同期版
+
+async def aget(db: AsyncSession, id: int) -> Optional[Idea]:
+    return await db.scalar(select(Idea).where(Idea.id == id))
+
+async def aget_owner_and_version(db: AsyncSession, id: int) -> Optional[Tuple[int, int]]:
+    row = (await db.execute(select(Idea.owner_id, Idea.version).where(Idea.id == id))).first()
+    return tuple(row) if row else None
+
+async def aget_with_details(
+    db: AsyncSession, *, id: int, limit: int, offsets: Dict[str, int]
+) -> Optional[Dict[str, Any]]:
+    idea = await db.scalar(_details_query(id, limit=limit, offsets=offsets))
+    if idea is None:
+        return None
+    return _details(idea, limit=limit)
+
+async def aget_multi_by_owner(
+    db: AsyncSession, *, owner_id: int, skip: int = 0, limit: int = 100,
+    sort: IdeaSort = "created_desc"
+) -> List[Idea]:
+    result = await db.scalars(
+        select(Idea)
+        .where(Idea.owner_id == owner_id)
+        .order_by(*_order_by(sort))
+        .offset(skip)
+        .limit(limit)
+    )
+    return list(result)
+
+def _owner_page_query(query, *, owner_id: int, sort: IdeaSort, cursor: Optional[str]):
+    key = _sort_key(sort)
+    query = query.where(Idea.owner_id == owner_id)
+    if cursor is not None:
+        value, id = decode_cursor(sort, cursor)
+        value = bindparam("cursor_value", value, type_=_CURSOR_DATETIME)
+        # 行値比較だとSQLiteが式インデックスを範囲検索に使わないため、展開した条件にする
+        if sort.endswith("desc"):
+            query = query.where(key <= value, or_(key < value, Idea.id < id))
+        else:
+            query = query.where(key >= value, or_(key > value, Idea.id > id))
+    return query.order_by(*_order_by(sort))
+
+async def aget_page_by_owner(
+    db: AsyncSession, *, owner_id: int, limit: int = 100,
+    sort: IdeaSort = "created_desc", cursor: Optional[str] = None
+) -> Tuple[List[Idea], Optional[str]]:
+    """
+    カーソル（キーセット）方式で一覧を取得し、（アイデア, 次ページのカーソル）を返す
+    どのページもインデックスを範囲検索するだけなので、深いページでも先頭と同じコストになる
+    """
+    query = _owner_page_query(select(Idea), owner_id=owner_id, sort=sort, cursor=cursor)
+    result = await db.scalars(query.limit(limit + 1))
+    ideas = list(result)
+    if len(ideas) <= limit:
+        return ideas, None
+    ideas = ideas[:limit]
+    return ideas, encode_cursor(sort, ideas[-1])
+
+# 一覧のJSONを行から直接作る場合の列（schemas.Ideaのフィールドと同じ順）
+LIST_COLUMNS = (Idea.title, Idea.content, Idea.id, Idea.owner_id, Idea.created_at, Idea.updated_at)
+
+async def _arows_page_by_owner(
+    db: AsyncSession, columns, *, owner_id: int, skip: int, limit: int,
+    sort: IdeaSort, cursor: Optional[str]
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    query = _owner_page_query(select(*columns), owner_id=owner_id, sort=sort, cursor=cursor)
+    if cursor is None and skip:
+        query = query.offset(skip)
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sort, rows[-1])
+    return [dict(row._mapping) for row in rows], next_cursor
+
+async def aget_rows_page_by_owner(
+    db: AsyncSession, *, owner_id: int, skip: int = 0, limit: int = 100,
+    sort: IdeaSort = "created_desc", cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    aget_page_by_ownerと同じ一覧を、ORMのエンティティを作らずに行の辞書で返す
+    （LIST_COLUMNSの順のため、そのままJSONにすればschemas.Ideaと同じ形式になる）
+    """
+    return await _arows_page_by_owner(
+        db, LIST_COLUMNS, owner_id=owner_id, skip=skip, limit=limit, sort=sort, cursor=cursor
+    )
+
+async def aget_summary_page_by_owner(
+    db: AsyncSession, *, owner_id: int, skip: int = 0, limit: int = 100,
+    sort: IdeaSort = "created_desc", cursor: Optional[str] = None,
+    snippet_length: int = 200
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    一覧表示用に必要な列と本文の先頭snippet_length文字だけをSQLで取得する
+    （ORMのエンティティは作らず、行を辞書で返す）
+    """
+    columns = (
+        Idea.id,
+        Idea.title,
+        func.substr(Idea.content, 1, snippet_length).label("snippet"),
+        Idea.owner_id,
+        Idea.created_at,
+        Idea.updated_at,
+    )
+    return await _arows_page_by_owner(
+        db, columns, owner_id=owner_id, skip=skip, limit=limit, sort=sort, cursor=cursor
+    )
+
+async def aget_texts_by_owner(
+    db: AsyncSession, *, owner_id: int
+) -> List[Tuple[int, str, str]]:
+    result = await db.execute(
+        select(Idea.id, Idea.title, Idea.content).where(Idea.owner_id == owner_id)
+    )
+    return [tuple(row) for row in result]
+
+async def aget_titles(
+    db: AsyncSession, *, owner_id: int, ids: List[int]
+) -> Dict[int, str]:
+    result = await db.execute(
+        select(Idea.id, Idea.title).where(Idea.owner_id == owner_id, Idea.id.in_(ids))
+    )
+    return {id: title for id, title in result}
+
+async def acreate_with_owner(
+    db: AsyncSession, *, obj_in: IdeaCreate, owner_id: int
+) -> Idea:
+    db_obj = Idea(
+        **obj_in.model_dump(),
+        owner_id=owner_id
+    )
+    db.add(db_obj)
+    await db.flush()
+    await crud_search.aindex_idea(db, db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
+    await response_cache.abump(owner_id)
+    return db_obj
+
+async def aupdate(
+    db: AsyncSession, *, db_obj: Idea, obj_in: IdeaUpdate
+) -> Idea:
+    update_data = obj_in.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(db_obj, field, value)
+    db.add(db_obj)
+    if "title" in update_data or "content" in update_data:
+        await crud_search.aindex_idea(db, db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
+    await response_cache.abump(db_obj.owner_id)
+    return db_obj
+
+async def aremove(db: AsyncSession, *, id: int) -> Idea:
+    obj = await db.scalar(select(Idea).where(Idea.id == id))
+    requirement_ids = list(
+        await db.scalars(select(Requirement.id).where(Requirement.idea_id == id))
+    )
+    await crud_search.aremove_idea(db, idea_id=id, requirement_ids=requirement_ids)
+    await db.delete(obj)
+    await db.commit()
+    await response_cache.abump(obj.owner_id)
+    return obj
+
+# エクスポート・インポート（NDJSON）
+
+def _export_query(owner_id: int):
+    # 索引（ideasは(owner_id, created_at, id)、requirementsは(idea_id, created_at, id)）の順に読み、並べ替えをしない
+    return (
+        select(
+            Idea.id, Idea.title, Idea.content, Idea.created_at, Idea.updated_at,
+            Requirement.content.label("requirement_content"),
+            Requirement.llm_model,
+            Requirement.created_at.label("requirement_created_at"),
+        )
+        .outerjoin(Requirement, Requirement.idea_id == Idea.id)
+        .where(Idea.owner_id == owner_id)
+        .order_by(Idea.created_at, Idea.id, Requirement.created_at, Requirement.id)
+    )
+
+async def astream_export(
+    db: AsyncSession, *, owner_id: int, batch_size: int = 1000
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    アイデアを要件定義書とまとめて1件ずつ返す（IdeaTransferの形式 + 元のid）
+    yield_perでbatch_size行ずつ読み込むため、件数によらずメモリの使用量は一定
+    """
+    result = await db.stream(_export_query(owner_id).execution_options(yield_per=batch_size))
+    current: Optional[Dict[str, Any]] = None
+    async for rows in result.partitions():
+        for row in rows:
+            if current is None or current["id"] != row.id:
+                if current is not None:
+                    yield current
+                current = {
+                    "id": row.id, "title": row.title, "content": row.content,
+                    "created_at": row.created_at, "updated_at": row.updated_at,
+                    "requirements": [],
+                }
+            if row.requirement_content is not None:
+                current["requirements"].append({
+                    "content": row.requirement_content,
+                    "llm_model": row.llm_model,
+                    "created_at": row.requirement_created_at,
+                })
+    if current is not None:
+        yield current
+
+# ORMの一括INSERTは行ごとの処理が重いため、テーブルに対して実行する
+# 日時は他の行（func.now()）と同じ形式で保存する（カーソルの比較が文字列の比較になるため）
+_IMPORT_IDEAS = insert(Idea.__table__).values(
+    title=bindparam("title"),
+    content=bindparam("content"),
+    owner_id=bindparam("owner_id"),
+    created_at=bindparam("created_at", type_=_CURSOR_DATETIME),
+    updated_at=bindparam("updated_at", type_=_CURSOR_DATETIME),
+)
+
+_IMPORT_REQUIREMENTS = insert(Requirement.__table__).values(
+    idea_id=bindparam("idea_id"),
+    content=bindparam("content"),
+    llm_model=bindparam("llm_model"),
+    content_hash=bindparam("content_hash"),
+    created_at=bindparam("created_at", type_=_CURSOR_DATETIME),
+)
+
+async def _ainsert_many(db: AsyncSession, statement, rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    rowsをexecutemanyで登録し、採番されたIDをrowsの順に返す
+    """
+    return list(await db.scalars(
+        statement.returning(statement.table.c.id, sort_by_parameter_order=True), rows
+    ))
+
+def _utc(value: Optional[datetime], default: Optional[datetime] = None) -> Optional[datetime]:
+    if value is None:
+        return default
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+async def acreate_bulk(
+    db: AsyncSession, *, ideas: Sequence[IdeaTransfer], owner_id: int
+) -> List[int]:
+    """
+    アイデアと要件定義書をまとめて登録し、アイデアのIDを（ideasの順に）返す
+    1回のトランザクションで、INSERTはテーブルごとにまとめて（executemany）実行する
+    """
+    now = datetime.utcnow().replace(microsecond=0)
+    ids = await _ainsert_many(db, _IMPORT_IDEAS, [
+        {
+            "title": idea.title, "content": idea.content, "owner_id": owner_id,
+            "created_at": _utc(idea.created_at, now), "updated_at": _utc(idea.updated_at),
+        }
+        for idea in ideas
+    ])
+    requirements = [
+        {
+            "idea_id": id, "content": requirement.content, "llm_model": requirement.llm_model,
+            "content_hash": content_hash(requirement.content),
+            "created_at": _utc(requirement.created_at, now),
+        }
+        for id, idea in zip(ids, ideas)
+        for requirement in idea.requirements
+    ]
+    requirement_ids = (
+        await _ainsert_many(db, _IMPORT_REQUIREMENTS, requirements) if requirements else []
+    )
+    await crud_search.aindex_new(
+        db, owner_id=owner_id,
+        ideas=[(id, idea.title, idea.content) for id, idea in zip(ids, ideas)],
+        requirements=[
+            (id, row["idea_id"], row["content"]) for id, row in zip(requirement_ids, requirements)
+        ],
+    )
+    await db.commit()
+    await response_cache.abump(owner_id)
+    return ids
+
+# まとめて変更（作成・更新・削除）
+
+# 更新しない列はNULLを渡して元の値のままにする（行ごとに更新する列が違っても1回のexecutemanyで済む）
+# ORMを経由しないため、バージョン（version_id_col）はここで進める
+_BATCH_UPDATE = (
+    sql_update(Idea.__table__)
+    .where(Idea.id == bindparam("b_id"))
+    .values(
+        title=func.coalesce(bindparam("b_title", type_=Idea.title.type), Idea.title),
+        content=func.coalesce(bindparam("b_content", type_=Idea.content.type), Idea.content),
+        version=Idea.version + 1,
+    )
+)
+
+# アイデアを削除するときに一緒に削除する（Ideaのリレーションのcascadeと同じ）
+_DEPENDENTS = (Requirement, Comment, Bookmark, Share)
+
+async def aget_owned_ids(db: AsyncSession, *, owner_id: int, ids: Sequence[int]) -> Set[int]:
+    """
+    idsのうち、owner_idが所有するアイデアのID（1回のクエリ）
+    """
+    if not ids:
+        return set()
+    result = await db.scalars(
+        select(Idea.id).where(Idea.id.in_(set(ids)), Idea.owner_id == owner_id)
+    )
+    return set(result)
+
+async def aapply_batch(
+    db: AsyncSession, *, obj_in: IdeaBatch, owner_id: int
+) -> List[Dict[str, Any]]:
+    """
+    作成・更新・削除を1つのトランザクションで適用し、変更ごとの結果（IdeaBatchItemResult）を返す
+    所有の確認は1回のクエリで行い、各テーブルへの変更はまとめて（executemany / IN）実行する
+    """
+    owned = await aget_owned_ids(
+        db, owner_id=owner_id, ids=[patch.id for patch in obj_in.update] + obj_in.delete
+    )
+    created_ids: List[int] = []
+    if obj_in.create:
+        now = datetime.utcnow().replace(microsecond=0)
+        created_ids = await _ainsert_many(db, _IMPORT_IDEAS, [
+            {
+                "title": idea.title, "content": idea.content, "owner_id": owner_id,
+                "created_at": now, "updated_at": None,
+            }
+            for idea in obj_in.create
+        ])
+    updates = [
+        patch for patch in obj_in.update
+        if patch.id in owned and (patch.title is not None or patch.content is not None)
+    ]
+    if updates:
+        await db.execute(_BATCH_UPDATE, [
+            {"b_id": patch.id, "b_title": patch.title, "b_content": patch.content}
+            for patch in updates
+        ])
+
+    # 結果に含めるアイデアは削除の前に読む（同じバッチで更新してから削除した場合も返す）
+    changed_ids = created_ids + [patch.id for patch in obj_in.update if patch.id in owned]
+    ideas: Dict[int, Dict[str, Any]] = {}
+    if changed_ids:
+        result = await db.execute(select(*LIST_COLUMNS).where(Idea.id.in_(set(changed_ids))))
+        ideas = {row.id: dict(row._mapping) for row in result}
+    await crud_search.aindex_new(
+        db, owner_id=owner_id,
+        ideas=[(id, ideas[id]["title"], ideas[id]["content"]) for id in created_ids],
+    )
+    await crud_search.areindex_ideas(
+        db, owner_id=owner_id,
+        ideas=[
+            (id, ideas[id]["title"], ideas[id]["content"])
+            for id in dict.fromkeys(patch.id for patch in updates)
+        ],
+    )
+
+    deleted_ids = [id for id in dict.fromkeys(obj_in.delete) if id in owned]
+    if deleted_ids:
+        requirement_ids = list(await db.scalars(
+            select(Requirement.id).where(Requirement.idea_id.in_(deleted_ids))
+        ))
+        await crud_search.aremove_ideas(
+            db, idea_ids=deleted_ids, requirement_ids=requirement_ids
+        )
+        for model in _DEPENDENTS:
+            await db.execute(sql_delete(model.__table__).where(model.idea_id.in_(deleted_ids)))
+        await db.execute(sql_delete(Idea.__table__).where(Idea.id.in_(deleted_ids)))
+
+    await db.commit()
+    await response_cache.abump(owner_id)
+
+    results: List[Dict[str, Any]] = [
+        {"op": "create", "index": i, "id": id, "status": "created", "idea": ideas[id]}
+        for i, id in enumerate(created_ids)
+    ]
+    results += [
+        {
+            "op": "update", "index": i, "id": patch.id,
+            "status": "updated" if patch.id in owned else "not_found",
+            "idea": ideas.get(patch.id),
+        }
+        for i, patch in enumerate(obj_in.update)
+    ]
+    results += [
+        {"op": "delete", "index": i, "id": id, "status": "deleted" if id in owned else "not_found"}
+        for i, id in enumerate(obj_in.delete)
+    ]
+    return results
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from ..models import RequirementJob
+
+def get(db: Session, id: int) -> Optional[RequirementJob]:
+    return db.query(RequirementJob).filter(RequirementJob.id == id).first()
+
+def create(
+    db: Session, *, user_id: int, idea_id: int, llm_model: str, force_refresh: bool = False
+) -> RequirementJob:
+    db_obj = RequirementJob(
+        user_id=user_id,
+        idea_id=idea_id,
+        llm_model=llm_model,
+        force_refresh=force_refresh,
+        status="queued",
+        progress=0
+    )
+    db.add(db_obj)
+    db.commit()
+    db.refresh(db_obj)
+    return db_obj
+
+def claim(db: Session, *, id: int) -> bool:
+    """
+    キュー待ちのジョブを実行中にする（他のワーカーが先に取得していればFalse）
+    """
+    count = db.query(RequirementJob).filter(
+        RequirementJob.id == id, RequirementJob.status == "queued"
+    ).update(
+        {RequirementJob.status: "running", RequirementJob.progress: 10},
+        synchronize_session=False,
+    )
+    db.commit()
+    return count == 1
+
+def finish(
+    db: Session, *, id: int, requirement_id: Optional[int] = None, error: Optional[str] = None
+) -> None:
+    db.query(RequirementJob).filter(RequirementJob.id == id).update(
+        {
+            RequirementJob.status: "failed" if error else "succeeded",
+            RequirementJob.progress: 100,
+            RequirementJob.requirement_id: requirement_id,
+            RequirementJob.error: error,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+
+def requeue_pending(db: Session, *, stale_seconds: float) -> List[int]:
+    """
+    再起動時に未完了のジョブを再投入する
+    実行中のジョブは一定時間更新がないもののみキューに戻す
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    db.query(RequirementJob).filter(
+        RequirementJob.status == "running", RequirementJob.updated_at < stale_before
+    ).update(
+        {RequirementJob.status: "queued", RequirementJob.progress: 0},
+        synchronize_session=False,
+    )
+    db.commit()
+    rows = (
+        db.query(RequirementJob.id)
+        .filter(RequirementJob.status == "queued")
+        .order_by(RequirementJob.id)
+        .all()
+    )
+    return [row.id for row in rows]
+
+# 非同期版
+
+async def aget(db: AsyncSession, id: int) -> Optional[RequirementJob]:
+    return await db.scalar(
+        select(RequirementJob)
+        .options(selectinload(RequirementJob.requirement))
+        .where(RequirementJob.id == id)
+        .execution_options(populate_existing=True)
+    )
+
+async def acreate(
+    db: AsyncSession, *, user_id: int, idea_id: int, llm_model: str, force_refresh: bool = False
+) -> RequirementJob:
+    db_obj = RequirementJob(
+        user_id=user_id,
+        idea_id=idea_id,
+        llm_model=llm_model,
+        force_refresh=force_refresh,
+        status="queued",
+        progress=0
+    )
+    db.add(db_obj)
+    await db.commit()
+    await db.refresh(db_obj, attribute_names=["id", "created_at", "updated_at", "requirement"])
+    return db_obj
@@ -1,5 +1,23 @@
+import hashlib
+from typing import Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from ..models import Requirement
+from ..models import Idea, Requirement
+from . import crud_search
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def _owner_and_hash_query(id: int):
+    return (
+        select(Idea.owner_id, Requirement.content_hash)
+        .join(Idea, Idea.id == Requirement.idea_id)
+        .where(Requirement.id == id)
+    )
+
+def get(db: Session, id: int) -> Optional[Requirement]:
+    return db.query(Requirement).filter(Requirement.id == id).first()
 
 def create(
     db: Session, *, idea_id: int, content: str, llm_model: str
@@ -7,9 +25,43 @@ def create(
     db_obj = Requirement(
         idea_id=idea_id,
         content=content,
-        llm_model=llm_model
+        llm_model=llm_model,
+        content_hash=content_hash(content)
     )
     db.add(db_obj)
+    db.flush()
+    crud_search.index_requirement(db, db_obj)
     db.commit()
     db.refresh(db_obj)
-    return db_obj
\ No newline at end of file
+    return db_obj
+
+# 非同期版
+
+async def aget(db: AsyncSession, id: int) -> Optional[Requirement]:
+    return await db.scalar(select(Requirement).where(Requirement.id == id))
+
+async def aget_owner_and_hash(db: AsyncSession, id: int) -> Optional[Tuple[int, Optional[str]]]:
+    row = (await db.execute(_owner_and_hash_query(id))).first()
+    return tuple(row) if row else None
+
+async def acreate(
+    db: AsyncSession, *, idea_id: int, content: str, llm_model: str
+) -> Requirement:
+    db_obj = Requirement(
+        idea_id=idea_id,
+        content=content,
+        llm_model=llm_model,
+        content_hash=content_hash(content)
+    )
+    db.add(db_obj)
+    await db.flush()
+    await crud_search.aindex_requirement(db, db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
+    return db_obj
+
+async def aensure_content_hash(db: AsyncSession, *, db_obj: Requirement) -> str:
+    if db_obj.content_hash is None:
+        db_obj.content_hash = content_hash(db_obj.content)
+        await db.commit()
+    return db_obj.content_hash
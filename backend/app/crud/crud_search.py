@@ -0,0 +1,318 @@
+import logging
+from typing import Any, Dict, List, Sequence, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# アイデアと要件定義書の検索用インデックス
+# SQLite: FTS5（trigramトークナイザー、日本語のように区切りのない文章も部分一致で検索できる）
+# PostgreSQL: tsvector + pg_trgm
+TABLE = "search_documents"
+
+# スニペット中の一致箇所の前後に付ける記号（Markdownの太字）
+HIGHLIGHT = "**"
+
+# trigramは3文字未満の語を索引から検索できないため、短い語は文字列の包含で絞り込む
+MIN_INDEXED_TERM_LENGTH = 3
+
+_SQLITE_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE {TABLE} USING fts5(
+        title, body,
+        kind UNINDEXED, idea_id UNINDEXED, requirement_id UNINDEXED, owner_id UNINDEXED,
+        tokenize='trigram'
+    )
+    """,
+]
+
+_POSTGRES_DDL = [
+    f"""
+    CREATE TABLE {TABLE} (
+        rowid BIGINT PRIMARY KEY,
+        kind VARCHAR(20) NOT NULL,
+        idea_id INTEGER NOT NULL,
+        requirement_id INTEGER,
+        owner_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        body TEXT NOT NULL,
+        tsv tsvector GENERATED ALWAYS AS (to_tsvector('simple', title || ' ' || body)) STORED
+    )
+    """,
+    f"CREATE INDEX ix_{TABLE}_owner ON {TABLE} (owner_id)",
+    f"CREATE INDEX ix_{TABLE}_tsv ON {TABLE} USING GIN (tsv)",
+]
+
+_POSTGRES_TRGM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX ix_{TABLE}_trgm ON {TABLE} USING GIN ((title || ' ' || body) gin_trgm_ops)",
+]
+
+# 既存のアイデア・要件定義書をインデックスに登録する（インデックスを新規作成したとき）
+_BACKFILL = [
+    f"""
+    INSERT INTO {TABLE} (rowid, kind, idea_id, requirement_id, owner_id, title, body)
+    SELECT id * 2, 'idea', id, NULL, owner_id, title, content FROM ideas
+    """,
+    f"""
+    INSERT INTO {TABLE} (rowid, kind, idea_id, requirement_id, owner_id, title, body)
+    SELECT requirements.id * 2 + 1, 'requirement', ideas.id, requirements.id,
+           ideas.owner_id, '', requirements.content
+    FROM requirements JOIN ideas ON ideas.id = requirements.idea_id
+    """,
+]
+
+_dialect = "sqlite"
+# PostgreSQLでpg_trgmのインデックスが使えるか
+_trigram = False
+
+def create_index(engine: Engine) -> None:
+    """
+    検索用のテーブルがなければ作成し、既存のデータを登録する（起動時に呼ぶ）
+    """
+    global _dialect, _trigram
+    _dialect = engine.dialect.name
+    if inspect(engine).has_table(TABLE):
+        _trigram = _dialect == "postgresql" and _has_trgm_index(engine)
+        return
+
+    with engine.begin() as conn:
+        for ddl in _POSTGRES_DDL if _dialect == "postgresql" else _SQLITE_DDL:
+            conn.execute(text(ddl))
+        for statement in _BACKFILL:
+            conn.execute(text(statement))
+
+    if _dialect == "postgresql":
+        _trigram = True
+        # pg_trgmを作成する権限がない場合は全文検索（tsvector）と部分一致のみで動かす
+        try:
+            with engine.begin() as conn:
+                for ddl in _POSTGRES_TRGM_DDL:
+                    conn.execute(text(ddl))
+        except DBAPIError:
+            logger.warning("pg_trgm is not available; search falls back to tsvector and ILIKE")
+            _trigram = False
+
+def _has_trgm_index(engine: Engine) -> bool:
+    return any(
+        index["name"] == f"ix_{TABLE}_trgm" for index in inspect(engine).get_indexes(TABLE)
+    )
+
+# インデックスの更新（アイデア・要件定義書のCRUDと同じトランザクションで実行する）
+
+Statement = Tuple[Any, Dict[str, Any]]
+
+def _delete_rows(rowids: Sequence[int]) -> List[Statement]:
+    return [
+        (text(f"DELETE FROM {TABLE} WHERE rowid = :rowid"), {"rowid": rowid})
+        for rowid in rowids
+    ]
+
+def _index_idea(idea: Any) -> List[Statement]:
+    return _delete_rows([idea.id * 2]) + [(
+        text(
+            f"INSERT INTO {TABLE} (rowid, kind, idea_id, requirement_id, owner_id, title, body) "
+            "VALUES (:rowid, 'idea', :idea_id, NULL, :owner_id, :title, :body)"
+        ),
+        {
+            "rowid": idea.id * 2, "idea_id": idea.id, "owner_id": idea.owner_id,
+            "title": idea.title, "body": idea.content,
+        },
+    )]
+
+def _index_requirement(requirement: Any) -> List[Statement]:
+    return [(
+        text(
+            f"INSERT INTO {TABLE} (rowid, kind, idea_id, requirement_id, owner_id, title, body) "
+            "SELECT :rowid, 'requirement', id, :requirement_id, owner_id, '', :body "
+            "FROM ideas WHERE id = :idea_id"
+        ),
+        {
+            "rowid": requirement.id * 2 + 1, "requirement_id": requirement.id,
+            "idea_id": requirement.idea_id, "body": requirement.content,
+        },
+    )]
+
+def _remove_idea(idea_id: int, requirement_ids: Sequence[int]) -> List[Statement]:
+    return _delete_rows([idea_id * 2] + [id * 2 + 1 for id in requirement_ids])
+
+_INSERT = text(
+    f"INSERT INTO {TABLE} (rowid, kind, idea_id, requirement_id, owner_id, title, body) "
+    "VALUES (:rowid, :kind, :idea_id, :requirement_id, :owner_id, :title, :body)"
+)
+
+_DELETE = text(f"DELETE FROM {TABLE} WHERE rowid = :rowid")
+
+def _removed_rows(idea_ids: Sequence[int], requirement_ids: Sequence[int]) -> List[Dict[str, Any]]:
+    return [{"rowid": id * 2} for id in idea_ids] + [{"rowid": id * 2 + 1} for id in requirement_ids]
+
+def _new_rows(
+    owner_id: int,
+    ideas: Sequence[Tuple[int, str, str]],
+    requirements: Sequence[Tuple[int, int, str]],
+) -> List[Dict[str, Any]]:
+    return [
+        {
+            "rowid": id * 2, "kind": "idea", "idea_id": id, "requirement_id": None,
+            "owner_id": owner_id, "title": title, "body": content,
+        }
+        for id, title, content in ideas
+    ] + [
+        {
+            "rowid": id * 2 + 1, "kind": "requirement", "idea_id": idea_id, "requirement_id": id,
+            "owner_id": owner_id, "title": "", "body": content,
+        }
+        for id, idea_id, content in requirements
+    ]
+
+def index_idea(db: Session, idea: Any) -> None:
+    for statement, params in _index_idea(idea):
+        db.execute(statement, params)
+
+def index_requirement(db: Session, requirement: Any) -> None:
+    for statement, params in _index_requirement(requirement):
+        db.execute(statement, params)
+
+def remove_idea(db: Session, *, idea_id: int, requirement_ids: Sequence[int]) -> None:
+    for statement, params in _remove_idea(idea_id, requirement_ids):
+        db.execute(statement, params)
+
+def index_new(
+    db: Session, *, owner_id: int,
+    ideas: Sequence[Tuple[int, str, str]], requirements: Sequence[Tuple[int, int, str]] = ()
+) -> None:
+    """
+    新しく登録したアイデア（id, title, content）と要件定義書（id, idea_id, content）を
+    まとめて登録する（executemany、インポート用）
+    """
+    rows = _new_rows(owner_id, ideas, requirements)
+    if rows:
+        db.execute(_INSERT, rows)
+
+def remove_ideas(
+    db: Session, *, idea_ids: Sequence[int], requirement_ids: Sequence[int] = ()
+) -> None:
+    rows = _removed_rows(idea_ids, requirement_ids)
+    if rows:
+        db.execute(_DELETE, rows)
+
+# 検索
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _sqlite_search(terms: List[str], owner_id: int, limit: int) -> Statement:
+    indexed = [term for term in terms if len(term) >= MIN_INDEXED_TERM_LENGTH]
+    short = [term for term in terms if len(term) < MIN_INDEXED_TERM_LENGTH]
+    params: Dict[str, Any] = {"owner_id": owner_id, "limit": limit, "mark": HIGHLIGHT}
+    conditions = [f"{TABLE}.owner_id = :owner_id"]
+    for i, term in enumerate(short):
+        params[f"term{i}"] = term
+        conditions.append(f"instr({TABLE}.title || ' ' || {TABLE}.body, :term{i}) > 0")
+
+    if indexed:
+        params["match"] = " AND ".join('"' + term.replace('"', '""') + '"' for term in indexed)
+        conditions.append(f"{TABLE} MATCH :match")
+        snippet = f"snippet({TABLE}, -1, :mark, :mark, '…', 24)"
+        score = f"-bm25({TABLE}, 5.0, 1.0)"
+        order = f"bm25({TABLE}, 5.0, 1.0)"
+    else:
+        # 短い語だけの場合は一致箇所の周辺を切り出して強調する
+        snippet = (
+            f"replace(substr({TABLE}.body, max(instr({TABLE}.body, :term0) - 30, 1), 100), "
+            ":term0, :mark || :term0 || :mark)"
+        )
+        score = "0.0"
+        order = f"{TABLE}.rowid DESC"
+
+    return (
+        text(
+            f"SELECT {TABLE}.kind, {TABLE}.idea_id, {TABLE}.requirement_id, ideas.title, "
+            f"{snippet} AS snippet, {score} AS score "
+            f"FROM {TABLE} JOIN ideas ON ideas.id = {TABLE}.idea_id "
+            f"WHERE {' AND '.join(conditions)} ORDER BY {order} LIMIT :limit"
+        ),
+        params,
+    )
+
+def _postgres_search(terms: List[str], owner_id: int, limit: int) -> Statement:
+    query = " ".join(terms)
+    document = f"{TABLE}.title || ' ' || {TABLE}.body"
+    score = f"ts_rank({TABLE}.tsv, plainto_tsquery('simple', :query))"
+    if _trigram:
+        score += f" + word_similarity(:query, {document})"
+    return (
+        text(
+            f"SELECT {TABLE}.kind, {TABLE}.idea_id, {TABLE}.requirement_id, ideas.title, "
+            f"ts_headline('simple', {TABLE}.body, plainto_tsquery('simple', :query), "
+            f"'StartSel={HIGHLIGHT}, StopSel={HIGHLIGHT}, MaxFragments=1, MaxWords=30, MinWords=10'"
+            f") AS snippet, {score} AS score "
+            f"FROM {TABLE} JOIN ideas ON ideas.id = {TABLE}.idea_id "
+            f"WHERE {TABLE}.owner_id = :owner_id AND ("
+            f"{TABLE}.tsv @@ plainto_tsquery('simple', :query) OR {document} ILIKE :pattern) "
+            "ORDER BY score DESC LIMIT :limit"
+        ),
+        {
+            "query": query, "pattern": f"%{_escape_like(query)}%",
+            "owner_id": owner_id, "limit": limit,
+        },
+    )
+
+def _search(q: str, owner_id: int, limit: int) -> Statement:
+    terms = q.split()
+    if _dialect == "postgresql":
+        return _postgres_search(terms, owner_id, limit)
+    return _sqlite_search(terms, owner_id, limit)
+
+def search(db: Session, *, owner_id: int, q: str, limit: int = 20) -> List[Dict[str, Any]]:
+    if not q.split():
+        return []
+    statement, params = _search(q, owner_id, limit)
+    return [dict(row._mapping) for row in db.execute(statement, params)]
+
+# 非同期版
+
+async def aindex_idea(db: AsyncSession, idea: Any) -> None:
+    for statement, params in _index_idea(idea):
+        await db.execute(statement, params)
+
+async def aindex_requirement(db: AsyncSession, requirement: Any) -> None:
+    for statement, params in _index_requirement(requirement):
+        await db.execute(statement, params)
+
+async def aremove_idea(db: AsyncSession, *, idea_id: int, requirement_ids: Sequence[int]) -> None:
+    for statement, params in _remove_idea(idea_id, requirement_ids):
+        await db.execute(statement, params)
+
+async def aindex_new(
+    db: AsyncSession, *, owner_id: int,
+    ideas: Sequence[Tuple[int, str, str]], requirements: Sequence[Tuple[int, int, str]] = ()
+) -> None:
+    rows = _new_rows(owner_id, ideas, requirements)
+    if rows:
+        await db.execute(_INSERT, rows)
+
+async def areindex_ideas(
+    db: AsyncSession, *, owner_id: int, ideas: Sequence[Tuple[int, str, str]]
+) -> None:
+    if ideas:
+        await db.execute(_DELETE, _removed_rows([id for id, _, _ in ideas], []))
+        await db.execute(_INSERT, _new_rows(owner_id, ideas, []))
+
+async def aremove_ideas(
+    db: AsyncSession, *, idea_ids: Sequence[int], requirement_ids: Sequence[int] = ()
+) -> None:
+    rows = _removed_rows(idea_ids, requirement_ids)
+    if rows:
+        await db.execute(_DELETE, rows)
+
+async def asearch(
+    db: AsyncSession, *, owner_id: int, q: str, limit: int = 20
+) -> List[Dict[str, Any]]:
+    if not q.split():
+        return []
+    statement, params = _search(q, owner_id, limit)
+    return [dict(row._mapping) for row in await db.execute(statement, params)]
@@ -1,6 +1,11 @@
 from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from ..core.security import get_password_hash, verify_password
+from ..core import auth_cache
+from ..core.security import (
+    ahash_password, averify_and_update_password, get_password_hash, verify_password,
+)
 from ..models import User
 from ..schemas import UserCreate, UserUpdate
 
@@ -25,7 +30,8 @@ def create(db: Session, obj_in: UserCreate) -> User:
     return db_obj
 
 def update(db: Session, db_obj: User, obj_in: UserUpdate) -> User:
-    update_data = obj_in.dict(exclude_unset=True)
+    previous_username = db_obj.username
+    update_data = obj_in.model_dump(exclude_unset=True)
     if "password" in update_data:
         hashed_password = get_password_hash(update_data["password"])
         del update_data["password"]
@@ -36,6 +42,19 @@ def update(db: Session, db_obj: User, obj_in: UserUpdate) -> User:
     
     db.add(db_obj)
     db.commit()
+    # コミット後に認証キャッシュを破棄する（コミット前だと古い値が再びキャッシュされうる）
+    auth_cache.invalidate(previous_username)
+    if update_data.get("username", previous_username) != previous_username:
+        auth_cache.invalidate(update_data["username"])
+    db.refresh(db_obj)
+    return db_obj
+
+def deactivate(db: Session, db_obj: User) -> User:
+    username = db_obj.username
+    db_obj.is_active = False
+    db.add(db_obj)
+    db.commit()
+    auth_cache.invalidate(username)
     db.refresh(db_obj)
     return db_obj
 
@@ -45,4 +64,62 @@ def authenticate(db: Session, username: str, password: str) -> Optional[User]:
         return None
     if not verify_password(password, user.hashed_password):
         return None
-    return user
\ No newline at end of file
+    return user
+
+# 非同期版
+
+async def aget(db: AsyncSession, user_id: int) -> Optional[User]:
+    return await db.scalar(select(User).where(User.id == user_id))
+
+async def aget_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    return await db.scalar(select(User).where(User.email == email))
+
+async def aget_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    return await db.scalar(select(User).where(User.username == username))
+
+async def acreate(db: AsyncSession, obj_in: UserCreate) -> User:
+    db_obj = User(
+        email=obj_in.email,
+        username=obj_in.username,
+        hashed_password=await ahash_password(obj_in.password)
+    )
+    db.add(db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
+    return db_obj
+
+async def aupdate(db: AsyncSession, db_obj: User, obj_in: UserUpdate) -> User:
+    previous_username = db_obj.username
+    update_data = obj_in.model_dump(exclude_unset=True)
+    if "password" in update_data:
+        hashed_password = await ahash_password(update_data["password"])
+        del update_data["password"]
+        update_data["hashed_password"] = hashed_password
+    
+    for field, value in update_data.items():
+        setattr(db_obj, field, value)
+    
+    db.add(db_obj)
+    await db.commit()
+    # コミット後に認証キャッシュを破棄する（コミット前だと古い値が再びキャッシュされうる）
+    auth_cache.invalidate(previous_username)
+    if update_data.get("username", previous_username) != previous_username:
+        auth_cache.invalidate(update_data["username"])
+    await db.refresh(db_obj)
+    return db_obj
+
+async def aauthenticate(db: AsyncSession, username: str, password: str) -> Optional[User]:
+    user = await aget_by_username(db, username=username)
+    if not user:
+        return None
+    # ハッシュ計算の順番待ちの間にDB接続を保持しないよう、先にトランザクションを終える
+    await db.commit()
+    verified, new_hash = await averify_and_update_password(password, user.hashed_password)
+    if not verified:
+        return None
+    if new_hash is not None:
+        # bcryptのコスト設定が変わっていれば、ログインに成功したこの機会に再ハッシュする
+        user.hashed_password = new_hash
+        db.add(user)
+        await db.commit()
+    return user
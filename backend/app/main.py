@@ -1,21 +1,36 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
+from .core import security
 from .core.config import settings
-from .core.database import engine, Base
+from .core.database import engine, Base, add_missing_columns, create_indexes
 from .api.v1.api import api_router
+from .crud import crud_home_spatial, crud_search
+from .services import board_sync, job_queue
 
 # .envファイルを読み込む
 load_dotenv()
 
 # データベーステーブルを作成
 Base.metadata.create_all(bind=engine)
+# 既存のテーブルに後から追加した列・索引を作成
+add_missing_columns(engine)
+create_indexes(engine)
+# 検索用インデックスを作成（既存のデータも登録）
+crud_search.create_index(engine)
+# ホームボードの空間インデックスを作成（既存のアイテムも登録）
+crud_home_spatial.create_index(engine)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.PROJECT_VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    # レスポンスのJSONのエンコードはorjsonで行う（標準のjsonより速い）
+    default_response_class=ORJSONResponse,
 )
 
 # CORS設定 - ローカル開発では全て許可
@@ -25,8 +40,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Board-Version", "ETag"],
 )
 
+# 入力の検証エラー（NaN・無限大を含む入力は標準のjsonではエンコードできないため、orjsonでnullにする）
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    return ORJSONResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors())})
+
+# 要件定義書生成ジョブのワーカーを起動・停止
+@app.on_event("startup")
+async def start_job_queue():
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+
+# ホームボード同期のハブを起動・停止（停止時は未保存の変更を書き込む）
+@app.on_event("startup")
+def start_board_sync():
+    board_sync.start()
+
+@app.on_event("shutdown")
+async def stop_board_sync():
+    await board_sync.stop()
+
+# パスワードハッシュ計算用のプロセスプールを起動・停止
+@app.on_event("startup")
+def start_password_pool():
+    security.start_password_pool()
+
+@app.on_event("shutdown")
+def stop_password_pool():
+    security.shutdown_password_pool()
+
 # APIルーターを含める
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
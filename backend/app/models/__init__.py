@@ -1,5 +1,6 @@
 from .user import User
-from .idea import Idea, Requirement, Comment, Bookmark, Share
-from .home import HomeItem
+from .idea import Idea, Requirement, Comment, Bookmark, Share, GenerationLock
+from .home import HomeItem, HomeBoard, HomeItemChange
+from .job import RequirementJob
 
-__all__ = ["User", "Idea", "Requirement", "Comment", "Bookmark", "Share", "HomeItem"]
\ No newline at end of file
+__all__ = ["User", "Idea", "Requirement", "Comment", "Bookmark", "Share", "GenerationLock", "HomeItem", "HomeBoard", "HomeItemChange", "RequirementJob"]
\ No newline at end of file
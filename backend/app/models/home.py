@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, JSON, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -19,4 +19,33 @@ class HomeItem(Base):
     style = Column(JSON)  # その他のスタイル情報
     
     # リレーション
-    user = relationship("User", back_populates="home_items")
\ No newline at end of file
+    user = relationship("User", back_populates="home_items")
+
+    # ユーザーごとの一覧と、R*Treeが使えない場合の表示範囲の検索に使う
+    __table_args__ = (
+        Index("ix_home_items_user_position", "user_id", "position_x", "position_y"),
+    )
+
+class HomeBoard(Base):
+    """
+    ユーザーのホームボードのバージョン（アイテムが変更されるたびに1つ進める）
+    """
+    __tablename__ = "home_boards"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class HomeItemChange(Base):
+    """
+    アイテムを最後に変更したボードのバージョン（削除したアイテムも差分同期のために残す）
+    """
+    __tablename__ = "home_item_changes"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    item_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        Index("ix_home_item_changes_user_version", "user_id", "version"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON, Index, insert_sentinel
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -12,6 +12,10 @@ class Idea(Base):
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # 更新のたびに進める行のバージョン（ETag・楽観的排他制御用）
+    version = Column(Integer, nullable=False, server_default="1")
+    # 一括INSERTのRETURNINGを登録した順に並べるための列（SQLiteでも1行ずつのINSERTにならない）
+    sa_orm_sentinel = insert_sentinel()
     
     # リレーション
     owner = relationship("User", back_populates="ideas")
@@ -19,6 +23,19 @@ class Idea(Base):
     comments = relationship("Comment", back_populates="idea", cascade="all, delete-orphan")
     bookmarks = relationship("Bookmark", back_populates="idea", cascade="all, delete-orphan")
     shares = relationship("Share", back_populates="idea", cascade="all, delete-orphan")
+    
+    # 一覧のカーソルページング用（並び順のキー + idで一意にする）
+    __table_args__ = (
+        Index("ix_ideas_owner_created_id", "owner_id", "created_at", "id"),
+    )
+    # UPDATEはversionが読み込んだ時点の値の場合のみ行い、versionを1つ進める
+    __mapper_args__ = {"version_id_col": version}
+
+# 更新日時順の並び（未更新の場合は作成日時）用の式インデックス
+Index(
+    "ix_ideas_owner_updated_id",
+    Idea.owner_id, func.coalesce(Idea.updated_at, Idea.created_at), Idea.id,
+)
 
 class Requirement(Base):
     __tablename__ = "requirements"
@@ -27,11 +44,18 @@ class Requirement(Base):
     idea_id = Column(Integer, ForeignKey("ideas.id"), nullable=False)
     content = Column(Text, nullable=False)
     llm_model = Column(String(50), nullable=False)  # 使用したLLMモデル
+    content_hash = Column(String(64))  # contentのSHA-256（ETag用）
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sa_orm_sentinel = insert_sentinel()  # 一括INSERTのRETURNINGの順序用（Ideaと同じ）
     
     # リレーション
     idea = relationship("Idea", back_populates="requirements")
 
+    # アイデアごとの新しい順の一覧用
+    __table_args__ = (
+        Index("ix_requirements_idea_created_id", "idea_id", "created_at", "id"),
+    )
+
 class Comment(Base):
     __tablename__ = "comments"
     
@@ -46,6 +70,11 @@ class Comment(Base):
     idea = relationship("Idea", back_populates="comments")
     user = relationship("User", back_populates="comments")
 
+    # アイデアごとの新しい順の一覧用
+    __table_args__ = (
+        Index("ix_comments_idea_created_id", "idea_id", "created_at", "id"),
+    )
+
 class Bookmark(Base):
     __tablename__ = "bookmarks"
     
@@ -60,6 +89,11 @@ class Bookmark(Base):
     idea = relationship("Idea", back_populates="bookmarks")
     user = relationship("User", back_populates="bookmarks")
 
+    # アイデアごとの新しい順の一覧用
+    __table_args__ = (
+        Index("ix_bookmarks_idea_created_id", "idea_id", "created_at", "id"),
+    )
+
 class Share(Base):
     __tablename__ = "shares"
     
@@ -71,4 +105,11 @@ class Share(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # リレーション
-    idea = relationship("Idea", back_populates="shares")
\ No newline at end of file
+    idea = relationship("Idea", back_populates="shares")
+
+class GenerationLock(Base):
+    __tablename__ = "generation_locks"
+    
+    key = Column(String(64), primary_key=True)  # 生成リクエストのキー
+    requirement_id = Column(Integer, ForeignKey("requirements.id"))  # 完了時に生成結果を記録
+    expires_at = Column(DateTime, nullable=False)
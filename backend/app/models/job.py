@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+class RequirementJob(Base):
+    __tablename__ = "requirement_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    idea_id = Column(Integer, ForeignKey("ideas.id"), nullable=False)
+    llm_model = Column(String(50), nullable=False)
+    force_refresh = Column(Boolean, default=False)
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued / running / succeeded / failed
+    progress = Column(Integer, nullable=False, default=0)  # 進捗（0〜100）
+    error = Column(Text)
+    requirement_id = Column(Integer, ForeignKey("requirements.id"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # リレーション
+    requirement = relationship("Requirement")
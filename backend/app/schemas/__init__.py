@@ -1,21 +1,29 @@
 from .user import User, UserCreate, UserUpdate, UserInDB
 from .idea import (
-    Idea, IdeaCreate, IdeaUpdate, IdeaWithDetails,
+    Idea, IdeaCreate, IdeaUpdate, IdeaWithDetails, IdeaSort, IdeaSummary, IdeaSearchResult,
+    IdeaCreated, SimilarIdea, IdeaTransfer, IdeaTransferRequirement, IdeaImportResult,
+    IdeaPatch, IdeaBatch, IdeaBatchItemResult, IdeaBatchResult,
     Comment, CommentCreate,
     Bookmark, BookmarkCreate,
     Share, ShareCreate
 )
-from .requirement import Requirement, RequirementCreate, RequirementGenerate
-from .home import HomeItem, HomeItemCreate, HomeItemUpdate
+from .requirement import Requirement, RequirementCreate, RequirementGenerate, RequirementJob
+from .home import (
+    HomeItem, HomeItemCreate, HomeItemUpdate, HomeItemPatch, HomeItemBatch, HomeBoardChanges,
+    HomeItemMove, HomeBoardMessage,
+)
 from .auth import Token, TokenData, Login
 
 __all__ = [
     "User", "UserCreate", "UserUpdate", "UserInDB",
-    "Idea", "IdeaCreate", "IdeaUpdate", "IdeaWithDetails",
+    "Idea", "IdeaCreate", "IdeaUpdate", "IdeaWithDetails", "IdeaSort", "IdeaSummary", "IdeaSearchResult",
+    "IdeaCreated", "SimilarIdea", "IdeaTransfer", "IdeaTransferRequirement", "IdeaImportResult",
+    "IdeaPatch", "IdeaBatch", "IdeaBatchItemResult", "IdeaBatchResult",
     "Comment", "CommentCreate",
     "Bookmark", "BookmarkCreate",
     "Share", "ShareCreate",
-    "Requirement", "RequirementCreate", "RequirementGenerate",
-    "HomeItem", "HomeItemCreate", "HomeItemUpdate",
+    "Requirement", "RequirementCreate", "RequirementGenerate", "RequirementJob",
+    "HomeItem", "HomeItemCreate", "HomeItemUpdate", "HomeItemPatch", "HomeItemBatch", "HomeBoardChanges",
+    "HomeItemMove", "HomeBoardMessage",
     "Token", "TokenData", "Login"
 ]
\ No newline at end of file
@@ -1,14 +1,18 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field
+from typing import Annotated, Optional, Dict, Any, List, Literal
+
+# 座標とサイズ（空間インデックスに登録できるよう、NaN・無限大と負のサイズは受け付けない）
+Coordinate = Annotated[float, Field(allow_inf_nan=False)]
+Size = Annotated[float, Field(ge=0, allow_inf_nan=False)]
 
 class HomeItemBase(BaseModel):
     title: str
     content: Optional[str] = None
     link: Optional[str] = None
-    position_x: float = 0
-    position_y: float = 0
-    width: float = 200
-    height: float = 150
+    position_x: Coordinate = 0
+    position_y: Coordinate = 0
+    width: Size = 200
+    height: Size = 150
     color: str = "#FFE4B5"
     style: Optional[Dict[str, Any]] = None
 
@@ -19,10 +23,10 @@ class HomeItemUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
     link: Optional[str] = None
-    position_x: Optional[float] = None
-    position_y: Optional[float] = None
-    width: Optional[float] = None
-    height: Optional[float] = None
+    position_x: Optional[Coordinate] = None
+    position_y: Optional[Coordinate] = None
+    width: Optional[Size] = None
+    height: Optional[Size] = None
     color: Optional[str] = None
     style: Optional[Dict[str, Any]] = None
 
@@ -31,4 +35,38 @@ class HomeItem(HomeItemBase):
     user_id: int
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+class HomeItemPatch(HomeItemUpdate):
+    id: int
+
+class HomeItemBatch(BaseModel):
+    """
+    まとめて適用する変更（1つのトランザクションで作成・更新・削除の順に適用する）
+    """
+    create: List[HomeItemCreate] = []
+    update: List[HomeItemPatch] = []
+    delete: List[int] = []
+
+class HomeBoardChanges(BaseModel):
+    """
+    ボードのバージョンと、そのバージョンまでに変更・削除されたアイテム
+    """
+    version: int
+    items: List[HomeItem]
+    deleted: List[int] = []
+
+class HomeItemMove(BaseModel):
+    id: int
+    position_x: Optional[Coordinate] = None
+    position_y: Optional[Coordinate] = None
+    width: Optional[Size] = None
+    height: Optional[Size] = None
+
+class HomeBoardMessage(BaseModel):
+    """
+    WebSocketでクライアントから受け取るメッセージ
+    move: 位置・サイズの変更（まとめて書き込まれる）
+    flush: 受け取り済みの変更をすぐに書き込む（ドラッグ終了時など）
+    """
+    type: Literal["move", "flush"]
+    items: List[HomeItemMove] = []
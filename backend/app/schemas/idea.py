@@ -1,9 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, List, Dict, Any, TYPE_CHECKING
-
-if TYPE_CHECKING:
-    from .requirement import Requirement
+from typing import Optional, List, Dict, Any, Literal
+from .requirement import Requirement
 
 class IdeaBase(BaseModel):
     title: str
@@ -16,6 +14,9 @@ class IdeaUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
 
+# 一覧の並び順（作成日時 / 更新日時、昇順 / 降順）
+IdeaSort = Literal["created_desc", "created_asc", "updated_desc", "updated_asc"]
+
 class IdeaInDBBase(IdeaBase):
     id: int
     owner_id: int
@@ -28,10 +29,93 @@ class IdeaInDBBase(IdeaBase):
 class Idea(IdeaInDBBase):
     pass
 
+class IdeaSummary(BaseModel):
+    """
+    一覧表示用（本文の代わりに先頭部分のsnippetのみ）
+    """
+    id: int
+    title: str
+    snippet: str
+    owner_id: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+class SimilarIdea(BaseModel):
+    id: int
+    title: str
+    score: float
+
+class IdeaCreated(Idea):
+    """
+    作成結果（内容がよく似た既存のアイデアがあればsimilar_ideasに入る）
+    """
+    similar_ideas: List[SimilarIdea] = []
+
+class IdeaSearchResult(BaseModel):
+    """
+    検索結果（アイデア本体または生成された要件定義書への一致）
+    snippetは一致箇所の周辺で、一致した語を**で囲む
+    """
+    kind: Literal["idea", "requirement"]
+    idea_id: int
+    requirement_id: Optional[int] = None
+    title: str
+    snippet: str
+    score: float
+
+class IdeaPatch(IdeaUpdate):
+    id: int
+
+class IdeaBatch(BaseModel):
+    """
+    まとめて適用する変更（1つのトランザクションで作成・更新・削除の順に適用する）
+    """
+    create: List[IdeaCreate] = []
+    update: List[IdeaPatch] = []
+    delete: List[int] = []
+
+class IdeaBatchItemResult(BaseModel):
+    """
+    変更ごとの結果（indexはcreate / update / deleteの各一覧での位置）
+    更新・削除の対象が存在しないか他のユーザーのアイデアの場合はnot_found（他の変更は適用する）
+    """
+    op: Literal["create", "update", "delete"]
+    index: int
+    id: Optional[int] = None
+    status: Literal["created", "updated", "deleted", "not_found"]
+    idea: Optional[Idea] = None
+
+class IdeaBatchResult(BaseModel):
+    results: List[IdeaBatchItemResult]
+
+class IdeaTransferRequirement(BaseModel):
+    content: str
+    llm_model: Literal["openai", "google", "claude"]
+    created_at: Optional[datetime] = None
+
+class IdeaTransfer(IdeaBase):
+    """
+    NDJSONのエクスポート・インポートの1行（アイデアと要件定義書）
+    エクスポートのidは元の環境のIDで、インポートでは無視する（IDは新しく採番する）
+    """
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    requirements: List[IdeaTransferRequirement] = []
+
+class IdeaImportResult(BaseModel):
+    ideas: int
+    requirements: int
+
 class IdeaWithDetails(IdeaInDBBase):
-    requirements: List[Dict[str, Any]] = []
+    """
+    アイデアと関連する一覧（各一覧は新しい順にlimit件まで、続きがあれば*_has_moreがTrue）
+    """
+    requirements: List[Requirement] = []
     comments: List['Comment'] = []
     bookmarks: List['Bookmark'] = []
+    requirements_has_more: bool = False
+    comments_has_more: bool = False
+    bookmarks_has_more: bool = False
 
 # コメント
 class CommentBase(BaseModel):
@@ -82,4 +166,7 @@ class Share(BaseModel):
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# IdeaWithDetailsが前方参照するComment・Bookmarkを解決する
+IdeaWithDetails.model_rebuild()
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Literal
+from typing import Literal, Optional
 
 class RequirementBase(BaseModel):
     content: str
@@ -11,12 +11,28 @@ class RequirementCreate(RequirementBase):
 
 class RequirementGenerate(BaseModel):
     idea_id: int
-    llm_model: Literal["openai", "google", "claude"]
+    # "auto"は応答の速いプロバイダーを自動選択する（保存時は実際のプロバイダー名）
+    llm_model: Literal["openai", "google", "claude", "auto"]
+    force_refresh: bool = False
 
 class Requirement(RequirementBase):
     id: int
     idea_id: int
     created_at: datetime
     
+    class Config:
+        from_attributes = True
+
+class RequirementJob(BaseModel):
+    id: int
+    idea_id: int
+    llm_model: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    progress: int
+    error: Optional[str] = None
+    requirement: Optional[Requirement] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    
     class Config:
         from_attributes = True
\ No newline at end of file
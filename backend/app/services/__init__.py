@@ -1,3 +1,9 @@
-from . import llm_service
+from . import (
+    tokenizer, chunking, llm_scheduler, llm_providers, llm_hedging, llm_service, requirement_cache,
+    requirement_generation, job_queue, similarity, board_sync, idea_transfer,
+)
 
-__all__ = ["llm_service"]
\ No newline at end of file
+__all__ = [
+    "tokenizer", "chunking", "llm_scheduler", "llm_providers", "llm_hedging", "llm_service", "requirement_cache",
+    "requirement_generation", "job_queue", "similarity", "board_sync", "idea_transfer",
+]
\ No newline at end of file
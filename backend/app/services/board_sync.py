@@ -0,0 +1,208 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+from fastapi import WebSocket
+from pydantic import ValidationError
+from sqlalchemy.exc import DataError, IntegrityError
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..crud import crud_home
+from ..schemas import HomeItemBatch, HomeItemMove, HomeItemPatch
+
+logger = logging.getLogger(__name__)
+
+class BoardHub:
+    """
+    ホームボードのWebSocket接続をユーザーごとにまとめるハブ
+    ドラッグ中の位置・サイズの変更はアイテムごとに最新の値だけをメモリに残し、
+    flush_secondsごとに1つのトランザクションで書き込む。変更は同じユーザーの他の接続（タブ）にすぐ送る。
+    接続と未保存の変更はプロセス内にのみ保持する（複数ワーカーの場合、同じワーカーに接続したタブ同士でのみ共有される）
+    """
+    def __init__(self, flush_seconds: float):
+        self.flush_seconds = flush_seconds
+        self._connections: Dict[int, Set[WebSocket]] = {}
+        # ユーザーID -> アイテムID -> 未保存の値
+        self._pending: Dict[int, Dict[int, Dict[str, float]]] = {}
+        self._timers: Dict[int, asyncio.Task] = {}
+        # 同じユーザーの書き込みが前後しないようにする
+        self._write_locks: Dict[int, asyncio.Lock] = {}
+        self._deltas_received = 0
+        self._items_written = 0
+        self._flushes = 0
+        self._flush_errors = 0
+        self._dropped_items = 0
+        # ユーザーID -> 続けて書き込みに失敗した回数
+        self._failures: Dict[int, int] = {}
+
+    async def connect(self, owner_id: int, websocket: WebSocket) -> None:
+        await websocket.accept()
+        self._connections.setdefault(owner_id, set()).add(websocket)
+
+    async def disconnect(self, owner_id: int, websocket: WebSocket) -> None:
+        connections = self._connections.get(owner_id)
+        if connections is not None:
+            connections.discard(websocket)
+            if not connections:
+                del self._connections[owner_id]
+        if owner_id not in self._connections:
+            await self.flush(owner_id)
+
+    async def move(
+        self, owner_id: int, sender: WebSocket, items: List[HomeItemMove]
+    ) -> None:
+        pending = self._pending.setdefault(owner_id, {})
+        changes = []
+        for item in items:
+            fields = item.model_dump(exclude_none=True, exclude={"id"})
+            if not fields:
+                continue
+            pending.setdefault(item.id, {}).update(fields)
+            changes.append({"id": item.id, **fields})
+            self._deltas_received += 1
+        if not changes:
+            return
+        if owner_id not in self._timers:
+            self._timers[owner_id] = asyncio.create_task(self._flush_later(owner_id))
+        await self._broadcast(owner_id, {"type": "move", "items": changes}, exclude=sender)
+
+    async def _flush_later(self, owner_id: int) -> None:
+        await asyncio.sleep(self.flush_seconds)
+        self._timers.pop(owner_id, None)
+        await self.flush(owner_id)
+
+    async def flush(self, owner_id: int) -> None:
+        """
+        未保存の変更を書き込み、保存後のボードのバージョンを全ての接続に送る
+        """
+        timer = self._timers.pop(owner_id, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        lock = self._write_locks.setdefault(owner_id, asyncio.Lock())
+        async with lock:
+            pending = self._pending.pop(owner_id, None)
+            if not pending:
+                return
+            dropped: List[int] = []
+            try:
+                version = await self._write(owner_id, pending)
+            except (ValidationError, IntegrityError, DataError):
+                # 書き込めない値を含むアイテムがある: 1件ずつ書き込み直し、失敗したアイテムの変更は捨てる
+                logger.warning(
+                    "Failed to save home board changes for user %s; retrying per item", owner_id
+                )
+                self._flush_errors += 1
+                version, dropped = await self._write_each(owner_id, pending)
+            except Exception:
+                logger.exception("Failed to save home board changes for user %s", owner_id)
+                self._flush_errors += 1
+                dropped = self._retry_later(owner_id, pending)
+                version = None
+            else:
+                self._failures.pop(owner_id, None)
+        if dropped:
+            await self._broadcast(
+                owner_id, {"type": "error", "detail": "Failed to save changes", "items": dropped}
+            )
+        if version is not None:
+            await self._broadcast(owner_id, {"type": "saved", "version": version})
+
+    async def _write_each(
+        self, owner_id: int, pending: Dict[int, Dict[str, float]]
+    ) -> Tuple[Optional[int], List[int]]:
+        """
+        アイテムごとに書き込み、最後に保存したボードのバージョンと書き込めなかったアイテムのIDを返す
+        """
+        version: Optional[int] = None
+        dropped: List[int] = []
+        for item_id, fields in pending.items():
+            try:
+                version = await self._write(owner_id, {item_id: fields}) or version
+            except Exception:
+                logger.exception(
+                    "Dropped home board changes for item %s of user %s", item_id, owner_id
+                )
+                dropped.append(item_id)
+        self._dropped_items += len(dropped)
+        return version, dropped
+
+    def _retry_later(self, owner_id: int, pending: Dict[int, Dict[str, float]]) -> List[int]:
+        """
+        書き込めなかった値を、その後に受け取った値を優先して次回に持ち越す
+        HOME_BOARD_FLUSH_MAX_RETRIES回続けて失敗した場合は捨て、捨てたアイテムのIDを返す
+        """
+        failures = self._failures.get(owner_id, 0) + 1
+        if failures > settings.HOME_BOARD_FLUSH_MAX_RETRIES:
+            logger.error(
+                "Dropped %d unsaved home board changes for user %s after %d attempts",
+                len(pending), owner_id, failures,
+            )
+            self._failures.pop(owner_id, None)
+            self._dropped_items += len(pending)
+            return list(pending)
+        self._failures[owner_id] = failures
+        newer = self._pending.setdefault(owner_id, {})
+        for item_id, fields in pending.items():
+            newer[item_id] = {**fields, **newer.get(item_id, {})}
+        if owner_id in self._connections and owner_id not in self._timers:
+            self._timers[owner_id] = asyncio.create_task(self._flush_later(owner_id))
+        return []
+
+    async def _write(self, owner_id: int, pending: Dict[int, Dict[str, float]]) -> Optional[int]:
+        async with AsyncSessionLocal() as db:
+            # 削除済み・他のユーザーのアイテムへの変更は捨てる
+            owners = await crud_home.aget_owners(db, ids=list(pending))
+            updates = [
+                HomeItemPatch(id=item_id, **fields)
+                for item_id, fields in pending.items()
+                if owners.get(item_id) == owner_id
+            ]
+            if not updates:
+                return None
+            version, _, _ = await crud_home.aapply_batch(
+                db, obj_in=HomeItemBatch(update=updates), owner_id=owner_id
+            )
+        self._items_written += len(updates)
+        self._flushes += 1
+        return version
+
+    async def _broadcast(
+        self, owner_id: int, message: Dict[str, Any], exclude: Optional[WebSocket] = None
+    ) -> None:
+        targets = [ws for ws in self._connections.get(owner_id, ()) if ws is not exclude]
+        results = await asyncio.gather(
+            *(ws.send_json(message) for ws in targets), return_exceptions=True
+        )
+        for ws, result in zip(targets, results):
+            if isinstance(result, Exception):
+                self._connections.get(owner_id, set()).discard(ws)
+
+    async def stop(self) -> None:
+        for owner_id in list(self._pending):
+            await self.flush(owner_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "boards": len(self._connections),
+            "connections": sum(len(c) for c in self._connections.values()),
+            "pending_items": sum(len(p) for p in self._pending.values()),
+            "deltas_received": self._deltas_received,
+            "items_written": self._items_written,
+            "flushes": self._flushes,
+            "flush_errors": self._flush_errors,
+            "dropped_items": self._dropped_items,
+        }
+
+hub: Optional[BoardHub] = None
+
+def start() -> None:
+    global hub
+    hub = BoardHub(flush_seconds=settings.HOME_BOARD_FLUSH_SECONDS)
+
+async def stop() -> None:
+    if hub is not None:
+        await hub.stop()
+
+def stats() -> Dict[str, Any]:
+    if hub is None:
+        return {"boards": 0, "connections": 0, "pending_items": 0}
+    return hub.stats()
@@ -0,0 +1,46 @@
+import re
+from typing import List
+from .tokenizer import count_tokens
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[。！？!?])|(?<=\.)\s+")
+
+def _hard_split(text: str, max_tokens: int) -> List[str]:
+    # 1文字が1トークンを超えることはないため、max_tokens文字ごとに切れば上限に収まる
+    return [text[i:i + max_tokens] for i in range(0, len(text), max_tokens)]
+
+def _pieces(text: str, max_tokens: int) -> List[str]:
+    pieces = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        if not paragraph.strip():
+            continue
+        if count_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            if not sentence:
+                continue
+            if count_tokens(sentence) <= max_tokens:
+                pieces.append(sentence)
+            else:
+                pieces.extend(_hard_split(sentence, max_tokens))
+    return pieces
+
+def split_text(text: str, max_tokens: int) -> List[str]:
+    """
+    テキストを段落・文の境界でmax_tokens以下のチャンクに分割する
+    段落や文が上限を超える場合のみ途中で切る
+    """
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece in _pieces(text, max_tokens):
+        tokens = count_tokens(piece) + 1  # 区切りの改行分
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
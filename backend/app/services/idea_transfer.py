@@ -0,0 +1,96 @@
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core import serialization
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..crud import crud_idea
+from ..schemas import IdeaTransfer
+from . import similarity
+
+# アイデアのエクスポート・インポート（NDJSON、1行に1アイデア）
+# エクスポートはDBから少しずつ読みながら送り、インポートは受信しながら行ごとに読んで
+# IDEA_TRANSFER_BATCH_SIZE件ずつ1つのトランザクションで登録する（どちらも件数によらずメモリの使用量は一定）
+
+# エクスポートで1回に送るデータの目安のサイズ（バイト）
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+class IdeaImportError(ValueError):
+    """
+    インポートの不正な行（importedはその行より前に登録済みのアイデアの件数）
+    """
+    def __init__(self, line: int, errors: List[Dict[str, Any]], imported: int):
+        super().__init__(f"Invalid line {line}")
+        self.line = line
+        self.errors = errors
+        self.imported = imported
+
+async def export_ndjson(owner_id: int) -> AsyncIterator[bytes]:
+    """
+    レスポンスの送信中に読み込むため、リクエストとは別のセッションを使う
+    """
+    async with AsyncSessionLocal() as db:
+        buffer = bytearray()
+        async for idea in crud_idea.astream_export(
+            db, owner_id=owner_id, batch_size=settings.IDEA_TRANSFER_BATCH_SIZE
+        ):
+            buffer += serialization.dumps(idea)
+            buffer += b"\n"
+            if len(buffer) >= EXPORT_CHUNK_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+
+async def _lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    rest = b""
+    async for chunk in chunks:
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        if len(rest) > settings.IDEA_IMPORT_MAX_LINE_BYTES:
+            raise ValueError("Line is too long")
+        for line in lines:
+            yield line
+    if rest:
+        yield rest
+
+async def import_ndjson(
+    db: AsyncSession, *, owner_id: int, chunks: AsyncIterable[bytes]
+) -> Dict[str, int]:
+    """
+    受信したNDJSONのアイデアを登録し、登録したアイデア・要件定義書の件数を返す
+    不正な行があった場合はIdeaImportError（その行を含むバッチは登録しない）
+    """
+    counts = {"ideas": 0, "requirements": 0}
+    batch: List[IdeaTransfer] = []
+    number = 0
+    try:
+        async for line in _lines(chunks):
+            number += 1
+            if not line.strip():
+                continue
+            try:
+                batch.append(IdeaTransfer.model_validate_json(line))
+            except ValidationError as e:
+                errors = e.errors(include_url=False, include_input=False)
+                raise IdeaImportError(number, errors, counts["ideas"])
+            if len(batch) >= settings.IDEA_TRANSFER_BATCH_SIZE:
+                await _import_batch(db, owner_id, batch, counts)
+                batch = []
+    except IdeaImportError:
+        raise
+    except ValueError as e:
+        raise IdeaImportError(number + 1, [{"msg": str(e)}], counts["ideas"])
+    if batch:
+        await _import_batch(db, owner_id, batch, counts)
+    return counts
+
+async def _import_batch(
+    db: AsyncSession, owner_id: int, batch: List[IdeaTransfer], counts: Dict[str, int]
+) -> None:
+    ids = await crud_idea.acreate_bulk(db, ideas=batch, owner_id=owner_id)
+    await similarity.aappend_ideas(
+        owner_id, [(id, idea.title, idea.content) for id, idea in zip(ids, batch)]
+    )
+    counts["ideas"] += len(ids)
+    counts["requirements"] += sum(len(idea.requirements) for idea in batch)
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..crud import crud_idea, crud_job
+from . import requirement_generation
+from .llm_scheduler import ProviderRateLimitError
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+def _with_session(fn, **kwargs) -> Any:
+    db = SessionLocal()
+    try:
+        return fn(db, **kwargs)
+    finally:
+        db.close()
+
+def _load_idea(db, *, id: int) -> Optional[Dict[str, Any]]:
+    idea = crud_idea.get(db=db, id=id)
+    if idea is None:
+        return None
+    return {"title": idea.title, "content": idea.content}
+
+def _load_job(db, *, id: int) -> Optional[Dict[str, Any]]:
+    job = crud_job.get(db=db, id=id)
+    if job is None:
+        return None
+    return {
+        "idea_id": job.idea_id,
+        "llm_model": job.llm_model,
+        "force_refresh": bool(job.force_refresh),
+    }
+
+class JobQueue:
+    """
+    要件定義書生成ジョブを実行するプロセス内のワーカープール
+    ジョブの状態はDBに保存し、再起動時は未完了のジョブを再投入する
+    """
+    def __init__(self, workers: int, provider_concurrency: Dict[str, int]):
+        self.workers = workers
+        self._queue: "asyncio.Queue[int]" = asyncio.Queue()
+        self._semaphores = {
+            name: asyncio.Semaphore(limit) for name, limit in provider_concurrency.items()
+        }
+        # 上限が設定されていないモデルのジョブも無制限にならないよう、最小の上限で共有する
+        self._default_semaphore = asyncio.Semaphore(min(provider_concurrency.values(), default=1))
+        self._events: Dict[int, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        job_ids = await asyncio.to_thread(
+            _with_session, crud_job.requeue_pending,
+            stale_seconds=settings.REQUIREMENT_JOB_STALE_SECONDS
+        )
+        for job_id in job_ids:
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job_id: int) -> None:
+        self._queue.put_nowait(job_id)
+
+    def watch(self, job_id: int) -> asyncio.Event:
+        """
+        ジョブの次の状態変化で通知されるイベントを返す（ロングポーリング用）
+        登録前の変化は通知されないため、登録してからジョブの状態を読み直すこと
+        """
+        return self._events.setdefault(job_id, asyncio.Event())
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> None:
+        """
+        watchで登録したイベントが通知されるまで最大timeout秒待つ
+        """
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _notify(self, job_id: int) -> None:
+        event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("Requirement job %s crashed", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: int) -> None:
+        claimed = await asyncio.to_thread(_with_session, crud_job.claim, id=job_id)
+        if not claimed:
+            return
+        self._notify(job_id)
+
+        job = await asyncio.to_thread(_with_session, _load_job, id=job_id)
+        idea = await asyncio.to_thread(_with_session, _load_idea, id=job["idea_id"])
+        if idea is None:
+            await asyncio.to_thread(
+                _with_session, crud_job.finish, id=job_id, error="Idea not found"
+            )
+            self._notify(job_id)
+            return
+
+        # "auto"は複数のプロバイダーにヘッジするため、個別のプロバイダーとは別の上限で制限する
+        semaphore = self._semaphores.get(job["llm_model"], self._default_semaphore)
+        requirement_id: Optional[int] = None
+        error: Optional[str] = None
+        try:
+            async with semaphore:
+                requirement_id = await requirement_generation.generate(
+                    idea_id=job["idea_id"],
+                    idea_title=idea["title"],
+                    idea_content=idea["content"],
+                    llm_model=job["llm_model"],
+                    force_refresh=job["force_refresh"]
+                )
+        except asyncio.TimeoutError:
+            error = "LLM provider timed out"
+        except ProviderRateLimitError as e:
+            error = str(e)
+        except Exception as e:
+            error = f"Failed to generate requirement: {str(e)}"
+
+        await asyncio.to_thread(
+            _with_session, crud_job.finish,
+            id=job_id, requirement_id=requirement_id, error=error
+        )
+        self._notify(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize(),
+            "waiters": len(self._events),
+        }
+
+job_queue: Optional[JobQueue] = None
+
+async def start() -> None:
+    global job_queue
+    job_queue = JobQueue(
+        workers=settings.REQUIREMENT_JOB_WORKERS,
+        provider_concurrency=settings.REQUIREMENT_JOB_PROVIDER_CONCURRENCY,
+    )
+    await job_queue.start()
+
+async def stop() -> None:
+    if job_queue is not None:
+        await job_queue.stop()
+
+def stats() -> Dict[str, Any]:
+    if job_queue is None:
+        return {"workers": 0, "queued": 0, "waiters": 0}
+    return job_queue.stats()
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+from ..core.config import settings
+from . import llm_providers
+
+# レイテンシのヒストグラムの区切り（秒）
+LATENCY_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+class LatencyTracker:
+    """
+    プロバイダーごとの最初のトークンまでの時間と完了までの時間を記録する
+    最初のトークンまでの時間の指数移動平均で、現在最も速いプロバイダーを推定する
+    """
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._first_token: Dict[str, float] = {}
+        self._histograms: Dict[str, Dict[str, List[int]]] = {}
+        self._failures: Dict[str, int] = {}
+
+    def _histogram(self, provider: str, kind: str) -> List[int]:
+        histograms = self._histograms.setdefault(provider, {})
+        return histograms.setdefault(kind, [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def observe(self, provider: str, seconds: float) -> None:
+        """
+        最初のトークンまでの時間の推定値だけを更新する（取り消し・失敗時の下限値など）
+        """
+        previous = self._first_token.get(provider)
+        self._first_token[provider] = (
+            seconds if previous is None
+            else previous + self.alpha * (seconds - previous)
+        )
+
+    def record(self, provider: str, kind: str, seconds: float) -> None:
+        self._histogram(provider, kind)[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        if kind == "first_token":
+            self.observe(provider, seconds)
+
+    def record_failure(self, provider: str, penalty_seconds: float) -> None:
+        self._failures[provider] = self._failures.get(provider, 0) + 1
+        self.observe(provider, penalty_seconds)
+
+    def estimate(self, provider: str) -> float:
+        # 未計測のプロバイダーは一度試せるよう最優先にする
+        return self._first_token.get(provider, 0.0)
+
+    def rank(self, providers: List[str]) -> List[str]:
+        return sorted(providers, key=self.estimate)
+
+    def stats(self) -> Dict[str, Any]:
+        labels = [f"le_{bound}" for bound in LATENCY_BUCKETS] + ["le_inf"]
+        return {
+            provider: {
+                "first_token_ewma_seconds": self._first_token.get(provider),
+                "failures": self._failures.get(provider, 0),
+                **{
+                    kind: dict(zip(labels, counts))
+                    for kind, counts in self._histograms.get(provider, {}).items()
+                },
+            }
+            for provider in set(self._histograms) | set(self._failures)
+        }
+
+tracker = LatencyTracker()
+
+def available_providers() -> List[str]:
+    """
+    APIキーが設定されている自動選択対象のプロバイダーを速い順に返す
+    """
+    configured = [
+        name for name in settings.LLM_AUTO_PROVIDERS
+        if llm_providers.get_provider(name).is_configured()
+    ]
+    if not configured:
+        raise llm_providers.ProviderNotConfiguredError("No LLM provider is configured")
+    return tracker.rank(configured)
+
+async def _run(name: str, prompt: str, max_tokens: int, first_token: asyncio.Event) -> str:
+    provider = llm_providers.get_provider(name)
+    started = time.monotonic()
+    chunks = []
+    try:
+        async for chunk in provider.stream(prompt, max_tokens=max_tokens):
+            if not chunks:
+                tracker.record(name, "first_token", time.monotonic() - started)
+                first_token.set()
+            chunks.append(chunk)
+    except asyncio.CancelledError:
+        if not chunks:
+            # 最初のトークンが届く前に取り消された場合は経過時間を下限として反映する
+            tracker.observe(name, time.monotonic() - started)
+        raise
+    except Exception:
+        tracker.record_failure(name, settings.LLM_HEDGE_DELAY_SECONDS * 2)
+        raise
+    tracker.record(name, "total", time.monotonic() - started)
+    return "".join(chunks)
+
+async def generate(prompt: str, *, max_tokens: int = 2000) -> Tuple[str, str]:
+    """
+    最も速いと推定されるプロバイダーで生成を始め、ヘッジ遅延までに最初のトークンが
+    届かなければ次のプロバイダーも並行して呼び出す。先に完了した結果を採用し、もう一方は取り消す。
+    失敗した場合は残りのプロバイダーにフォールバックする。
+    戻り値は（生成テキスト, 実際に応答したプロバイダー名）
+    """
+    candidates = available_providers()
+    first_token = asyncio.Event()
+    pending: Dict[asyncio.Task, str] = {}
+    last_error: Optional[BaseException] = None
+
+    def launch() -> None:
+        name = candidates.pop(0)
+        pending[asyncio.create_task(_run(name, prompt, max_tokens, first_token))] = name
+
+    launch()
+    try:
+        while pending:
+            waiters = set(pending)
+            token_waiter: Optional[asyncio.Task] = None
+            timeout: Optional[float] = None
+            if candidates and len(pending) < 2 and not first_token.is_set():
+                token_waiter = asyncio.create_task(first_token.wait())
+                waiters.add(token_waiter)
+                timeout = settings.LLM_HEDGE_DELAY_SECONDS
+            done, _ = await asyncio.wait(
+                waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                # ヘッジ遅延内に最初のトークンが届かなかったので次のプロバイダーも呼ぶ
+                token_waiter.cancel()
+                launch()
+                continue
+            if token_waiter is not None:
+                token_waiter.cancel()
+                done.discard(token_waiter)
+
+            for task in done:
+                name = pending.pop(task)
+                if task.exception() is None:
+                    return task.result(), name
+                last_error = task.exception()
+            if not pending and candidates:
+                launch()
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    raise last_error
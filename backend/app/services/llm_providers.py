@@ -0,0 +1,294 @@
+import asyncio
+from typing import AsyncIterator, Dict, Optional
+import openai
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+import anthropic
+from ..core.config import settings
+from .llm_scheduler import ProviderRateLimitError, get_scheduler, parse_retry_after
+from .tokenizer import count_tokens
+
+SYSTEM_PROMPT = "あなたは優秀なシステムアナリストです。"
+
+class ProviderNotConfiguredError(ValueError):
+    """
+    プロバイダーのAPIキーが設定されていない（利用できるプロバイダーがない）
+    """
+
+class LLMProvider:
+    """
+    LLMプロバイダーの共通インターフェース
+    各プロバイダーは非同期クライアントで実装し、イベントループをブロックしない
+    """
+    name: str = ""
+    label: str = ""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.scheduler = get_scheduler(self.name)
+
+    def is_configured(self) -> bool:
+        raise NotImplementedError
+
+    def _rate_limit_error(self, error: Exception) -> Optional[ProviderRateLimitError]:
+        """
+        SDK固有のレート制限エラーを共通の例外に変換する（該当しなければNone）
+        """
+        return None
+
+    def _is_timeout(self, error: Exception) -> bool:
+        """
+        SDK固有のタイムアウトエラーかどうか（asyncio.TimeoutErrorと同じく504として扱う）
+        """
+        return False
+
+    def _convert_error(self, error: Exception) -> None:
+        """
+        SDK固有のタイムアウト・レート制限のエラーを共通の例外に変換して送出する
+        """
+        if self._is_timeout(error):
+            raise asyncio.TimeoutError(str(error)) from error
+        rate_limit = self._rate_limit_error(error)
+        if rate_limit is not None:
+            raise rate_limit from error
+
+    def _estimate_tokens(self, prompt: str, system: str, max_tokens: int) -> int:
+        return count_tokens(system) + count_tokens(prompt) + max_tokens
+
+    async def _complete(self, prompt: str, *, system: str, max_tokens: int) -> str:
+        raise NotImplementedError
+
+    async def complete(
+        self, prompt: str, *, system: str = SYSTEM_PROMPT, max_tokens: int = 2000
+    ) -> str:
+        """
+        プロンプトを送信し、生成されたテキストを返す（タイムアウトはプロバイダーごと）
+        同時実行数・レート制限はスケジューラーで制御し、429の場合は再試行する
+        """
+        if not self.is_configured():
+            raise ProviderNotConfiguredError(f"{self.label} API key is not configured")
+
+        async def call() -> str:
+            try:
+                return await asyncio.wait_for(
+                    self._complete(prompt, system=system, max_tokens=max_tokens),
+                    timeout=self.timeout,
+                )
+            except Exception as e:
+                self._convert_error(e)
+                raise
+
+        return await self.scheduler.run(
+            call, tokens=self._estimate_tokens(prompt, system, max_tokens)
+        )
+
+    def _stream(self, prompt: str, *, system: str, max_tokens: int) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def _next_chunk(self, chunks: AsyncIterator[str]) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+        except StopAsyncIteration:
+            return None
+        except Exception as e:
+            self._convert_error(e)
+            raise
+
+    async def stream(
+        self, prompt: str, *, system: str = SYSTEM_PROMPT, max_tokens: int = 2000
+    ) -> AsyncIterator[str]:
+        """
+        生成されたテキストを届いた順にチャンク単位で返す
+        タイムアウトはチャンク間の待ち時間に適用し、途中で閉じられた場合は上流のリクエストも閉じる
+        最初のチャンクより前に429が返された場合のみ再試行する
+        """
+        if not self.is_configured():
+            raise ProviderNotConfiguredError(f"{self.label} API key is not configured")
+        tokens = self._estimate_tokens(prompt, system, max_tokens)
+        attempt = 0
+        while True:
+            async with self.scheduler.slot(tokens):
+                chunks = self._stream(prompt, system=system, max_tokens=max_tokens)
+                try:
+                    try:
+                        chunk = await self._next_chunk(chunks)
+                    except ProviderRateLimitError as e:
+                        rate_limit = e
+                    else:
+                        while chunk is not None:
+                            if chunk:
+                                yield chunk
+                            chunk = await self._next_chunk(chunks)
+                        return
+                finally:
+                    await chunks.aclose()
+            await self.scheduler.wait_before_retry(attempt, rate_limit)
+            attempt += 1
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+    label = "OpenAI"
+    model = "gpt-4"
+
+    def __init__(self, timeout: float):
+        super().__init__(timeout)
+        self.client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            timeout=timeout,
+            max_retries=0,
+        ) if settings.OPENAI_API_KEY else None
+
+    def is_configured(self) -> bool:
+        return self.client is not None
+
+    def _rate_limit_error(self, error: Exception) -> Optional[ProviderRateLimitError]:
+        if isinstance(error, openai.RateLimitError):
+            return ProviderRateLimitError(self.name, parse_retry_after(error.response.headers))
+        return None
+
+    def _is_timeout(self, error: Exception) -> bool:
+        return isinstance(error, openai.APITimeoutError)
+
+    async def _complete(self, prompt: str, *, system: str, max_tokens: int) -> str:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
+
+    async def _stream(self, prompt: str, *, system: str, max_tokens: int) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content or ""
+        finally:
+            await stream.response.aclose()
+
+class GoogleProvider(LLMProvider):
+    name = "google"
+    label = "Google"
+    model = "gemini-pro"
+
+    def __init__(self, timeout: float):
+        super().__init__(timeout)
+        if settings.GOOGLE_API_KEY:
+            genai.configure(api_key=settings.GOOGLE_API_KEY)
+
+    def is_configured(self) -> bool:
+        return bool(settings.GOOGLE_API_KEY)
+
+    def _rate_limit_error(self, error: Exception) -> Optional[ProviderRateLimitError]:
+        if isinstance(error, google_exceptions.ResourceExhausted):
+            return ProviderRateLimitError(self.name)
+        return None
+
+    def _is_timeout(self, error: Exception) -> bool:
+        return isinstance(error, google_exceptions.DeadlineExceeded)
+
+    async def _complete(self, prompt: str, *, system: str, max_tokens: int) -> str:
+        model = genai.GenerativeModel(self.model)
+        response = await model.generate_content_async(
+            f"{system}\n\n{prompt}",
+            generation_config={"max_output_tokens": max_tokens},
+        )
+        return response.text
+
+    async def _stream(self, prompt: str, *, system: str, max_tokens: int) -> AsyncIterator[str]:
+        model = genai.GenerativeModel(self.model)
+        response = await model.generate_content_async(
+            f"{system}\n\n{prompt}",
+            generation_config={"max_output_tokens": max_tokens},
+            stream=True,
+        )
+        async for chunk in response:
+            yield chunk.text
+
+class ClaudeProvider(LLMProvider):
+    name = "claude"
+    label = "Claude"
+    model = "claude-3-opus-20240229"
+
+    def __init__(self, timeout: float):
+        super().__init__(timeout)
+        self.client = anthropic.AsyncAnthropic(
+            api_key=settings.CLAUDE_API_KEY,
+            base_url=settings.CLAUDE_BASE_URL,
+            timeout=timeout,
+            max_retries=0,
+        ) if settings.CLAUDE_API_KEY else None
+
+    def is_configured(self) -> bool:
+        return self.client is not None
+
+    def _rate_limit_error(self, error: Exception) -> Optional[ProviderRateLimitError]:
+        if isinstance(error, anthropic.RateLimitError):
+            return ProviderRateLimitError(self.name, parse_retry_after(error.response.headers))
+        return None
+
+    def _is_timeout(self, error: Exception) -> bool:
+        return isinstance(error, anthropic.APITimeoutError)
+
+    async def _complete(self, prompt: str, *, system: str, max_tokens: int) -> str:
+        response = await self.client.messages.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            temperature=0.7,
+            system=system,
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        )
+        return response.content[0].text
+
+    async def _stream(self, prompt: str, *, system: str, max_tokens: int) -> AsyncIterator[str]:
+        stream = await self.client.messages.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            temperature=0.7,
+            system=system,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            stream=True
+        )
+        try:
+            async for event in stream:
+                if event.type == "content_block_delta":
+                    yield event.delta.text
+        finally:
+            await stream.close()
+
+_providers: Dict[str, LLMProvider] = {}
+
+def get_provider(name: str) -> LLMProvider:
+    """
+    プロバイダー名からインスタンスを取得（初回呼び出し時に生成）
+    """
+    provider: Optional[LLMProvider] = _providers.get(name)
+    if provider is None:
+        if name == "openai":
+            provider = OpenAIProvider(timeout=settings.OPENAI_TIMEOUT_SECONDS)
+        elif name == "google":
+            provider = GoogleProvider(timeout=settings.GOOGLE_TIMEOUT_SECONDS)
+        elif name == "claude":
+            provider = ClaudeProvider(timeout=settings.CLAUDE_TIMEOUT_SECONDS)
+        else:
+            raise ValueError(f"Unsupported LLM model: {name}")
+        _providers[name] = provider
+    return provider
@@ -0,0 +1,174 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Mapping, Optional
+from ..core.config import settings
+
+class ProviderRateLimitError(Exception):
+    """
+    プロバイダーから429（レート制限）が返された
+    """
+    def __init__(self, provider: str, retry_after: Optional[float] = None):
+        super().__init__(f"{provider} rate limit exceeded")
+        self.provider = provider
+        self.retry_after = retry_after
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    Retry-Afterヘッダー（秒数またはHTTP日付）を秒数に変換する
+    """
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+class TokenBucket:
+    """
+    1分あたりの上限をもとに補充されるトークンバケット
+    """
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+class ProviderScheduler:
+    """
+    プロバイダーごとの同時実行数・レート制限・リトライを管理する
+    """
+    def __init__(
+        self, provider: str, *, max_concurrency: int,
+        requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None
+    ):
+        self.provider = provider
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.waiting = 0
+        self.running = 0
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0) -> AsyncIterator[None]:
+        """
+        レート制限と同時実行数の枠を確保してから処理を実行する
+        """
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            if self._requests is not None:
+                await self._requests.acquire(1)
+            if self._tokens is not None and tokens:
+                await self._tokens.acquire(tokens)
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        waited = time.monotonic() - started
+        self.calls += 1
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        リトライまでの待ち時間（Retry-Afterがあれば優先し、なければジッター付き指数バックオフ）
+        """
+        if retry_after is not None:
+            return min(retry_after, settings.LLM_BACKOFF_MAX_SECONDS)
+        ceiling = min(
+            settings.LLM_BACKOFF_MAX_SECONDS,
+            settings.LLM_BACKOFF_BASE_SECONDS * (2 ** attempt),
+        )
+        return random.uniform(0, ceiling)
+
+    async def wait_before_retry(self, attempt: int, error: ProviderRateLimitError) -> None:
+        """
+        429を記録し、リトライ回数が残っていればバックオフする（残っていなければerrorを送出）
+        """
+        self.rate_limited += 1
+        if attempt >= settings.LLM_MAX_RETRIES:
+            raise error
+        self.retries += 1
+        await asyncio.sleep(self.backoff_delay(attempt, error.retry_after))
+
+    async def run(self, fn: Callable[[], Awaitable[Any]], *, tokens: int = 0) -> Any:
+        """
+        枠を確保してfnを実行し、429の場合はバックオフして再試行する
+        """
+        attempt = 0
+        while True:
+            try:
+                async with self.slot(tokens):
+                    return await fn()
+            except ProviderRateLimitError as e:
+                rate_limit = e
+            await self.wait_before_retry(attempt, rate_limit)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "queue_depth": self.waiting,
+            "calls": self.calls,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "avg_wait_seconds": self.total_wait_seconds / self.calls if self.calls else 0.0,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+_schedulers: Dict[str, ProviderScheduler] = {}
+
+def get_scheduler(provider: str) -> ProviderScheduler:
+    scheduler = _schedulers.get(provider)
+    if scheduler is None:
+        scheduler = ProviderScheduler(
+            provider,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY.get(provider, 4),
+            requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE.get(provider),
+            tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE.get(provider),
+        )
+        _schedulers[provider] = scheduler
+    return scheduler
+
+def stats() -> Dict[str, Any]:
+    return {name: scheduler.stats() for name, scheduler in _schedulers.items()}
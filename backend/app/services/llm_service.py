@@ -1,24 +1,23 @@
-from typing import Literal
-import openai
-import google.generativeai as genai
-import anthropic
+import asyncio
+from typing import AsyncIterator, Literal, NamedTuple
 from ..core.config import settings
+from . import chunking, llm_hedging, llm_providers, requirement_cache
+from .tokenizer import count_tokens
 
-# LLMクライアントの初期化
-openai_client = openai.OpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
-anthropic_client = anthropic.Anthropic(api_key=settings.CLAUDE_API_KEY) if settings.CLAUDE_API_KEY else None
-if settings.GOOGLE_API_KEY:
-    genai.configure(api_key=settings.GOOGLE_API_KEY)
+LLMModel = Literal["openai", "google", "claude", "auto"]
 
-async def generate_requirement(
-    idea_content: str,
-    idea_title: str,
-    llm_model: Literal["openai", "google", "claude"]
-) -> str:
+# 要件定義書の生成の最大出力トークン数
+REQUIREMENT_MAX_TOKENS = 2000
+# LLM_CONTEXT_TOKENSにないプロバイダーのコンテキスト長
+DEFAULT_CONTEXT_TOKENS = 8192
+
+_DIGEST_HEADER = "（本文が長いため、各パートの要約を示します）\n\n"
+
+def build_prompt(idea_title: str, idea_content: str) -> str:
     """
-    アイデアから要件定義書を生成する
+    要件定義書生成用のプロンプトを組み立てる
     """
-    prompt = f"""
+    return f"""
 以下のアイデアから、詳細な要件定義書を作成してください。
 
 タイトル: {idea_title}
@@ -41,43 +40,164 @@ async def generate_requirement(
 日本語で、専門的かつ分かりやすく記述してください。
 """
 
-    if llm_model == "openai":
-        if not openai_client:
-            raise ValueError("OpenAI API key is not configured")
-        
-        response = openai_client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "あなたは優秀なシステムアナリストです。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
+def build_chunk_prompt(idea_title: str, chunk: str, index: int, total: int) -> str:
+    """
+    長文アイデアの一部を要約するためのプロンプトを組み立てる
+    """
+    return f"""
+以下はアイデア「{idea_title}」の本文の一部（{index}/{total}）です。
+要件定義書の作成に必要な情報（目的、利用者、機能、制約、懸念点など）を漏らさず、簡潔に要約してください。
+
+{chunk}
+"""
+
+def input_budget(idea_title: str, llm_model: str) -> int:
+    """
+    要件定義書の生成のプロンプトに入れる本文（または要約）の上限トークン数
+    LLM_LONG_INPUT_THRESHOLD_TOKENSを上限に、コンテキスト長からプロンプトの他の部分と出力の分を除いた長さに収める
+    "auto"の場合は候補のプロバイダーのうちコンテキスト長が最も短いものに合わせる
+    """
+    names = settings.LLM_AUTO_PROVIDERS if llm_model == "auto" else [llm_model]
+    context = min(settings.LLM_CONTEXT_TOKENS.get(name, DEFAULT_CONTEXT_TOKENS) for name in names)
+    reserved = (
+        count_tokens(llm_providers.SYSTEM_PROMPT)
+        + count_tokens(build_prompt(idea_title, ""))
+        + REQUIREMENT_MAX_TOKENS
+    )
+    return max(
+        min(settings.LLM_LONG_INPUT_THRESHOLD_TOKENS, context - reserved),
+        settings.LLM_CHUNK_SUMMARY_MIN_TOKENS,
+    )
+
+def is_long_input(idea_title: str, idea_content: str, llm_model: str) -> bool:
+    return count_tokens(idea_content) > input_budget(idea_title, llm_model)
+
+def _part_header(index: int, total: int) -> str:
+    return f"【パート{index}/{total}の要約】\n"
+
+async def _summarize_once(
+    idea_title: str, text: str, provider: llm_providers.LLMProvider, budget: int
+) -> str:
+    chunks = chunking.split_text(text, settings.LLM_CHUNK_TOKENS)
+    total = len(chunks)
+    # 要約を連結して予算に収まるよう1チャンクあたりの長さを抑える（下限で収まらない分は次の段で要約する）
+    share = budget // total - count_tokens(_part_header(total, total))
+    max_tokens = min(
+        settings.LLM_CHUNK_SUMMARY_TOKENS, max(share, settings.LLM_CHUNK_SUMMARY_MIN_TOKENS)
+    )
+    semaphore = asyncio.Semaphore(settings.LLM_CHUNK_CONCURRENCY)
+
+    async def summarize(index: int, chunk: str) -> str:
+        async with semaphore:
+            return await provider.complete(
+                build_chunk_prompt(idea_title, chunk, index, total),
+                max_tokens=max_tokens,
+            )
+
+    tasks = [
+        asyncio.ensure_future(summarize(index, chunk))
+        for index, chunk in enumerate(chunks, start=1)
+    ]
+    try:
+        summaries = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return "\n\n".join(
+        _part_header(index, total) + summary
+        for index, summary in enumerate(summaries, start=1)
+    )
+
+async def summarize_chunks(
+    idea_title: str, idea_content: str, provider: llm_providers.LLMProvider
+) -> str:
+    """
+    長文の本文をトークン数で分割し、各チャンクを並行して要約して連結する
+    連結した要約がinput_budgetを超える場合は、要約をさらに分割して要約する（最大LLM_REDUCE_MAX_ROUNDS段）
+    """
+    budget = input_budget(idea_title, provider.name) - count_tokens(_DIGEST_HEADER)
+    digest = await _summarize_once(idea_title, idea_content, provider, budget)
+    rounds = 1
+    while count_tokens(digest) > budget and rounds < settings.LLM_REDUCE_MAX_ROUNDS:
+        digest = await _summarize_once(idea_title, digest, provider, budget)
+        rounds += 1
+    return _DIGEST_HEADER + digest
+
+class GeneratedRequirement(NamedTuple):
+    content: str
+    llm_model: str  # 実際に応答したプロバイダー
+
+def resolve_model(llm_model: LLMModel) -> str:
+    """
+    "auto"の場合は現在最も速いと推定されるプロバイダー名に置き換える
+    """
+    if llm_model == "auto":
+        return llm_hedging.available_providers()[0]
+    return llm_model
+
+async def generate_requirement(
+    idea_content: str,
+    idea_title: str,
+    llm_model: LLMModel,
+    force_refresh: bool = False
+) -> GeneratedRequirement:
+    """
+    アイデアから要件定義書を生成する
+    同じ入力の生成結果はキャッシュから返す（force_refresh時は再生成）
+    "auto"の場合は複数プロバイダーにヘッジして最初に完了した結果を使う
+    本文が長い場合はチャンクごとの要約を並行して作り、それをもとに最終的な生成を行う
+    """
+    cache_key = requirement_cache.make_key(idea_title, idea_content, llm_model)
+    if not force_refresh:
+        cached = await requirement_cache.lookup(cache_key)
+        if cached is not None:
+            return GeneratedRequirement(*cached)
+
+    if is_long_input(idea_title, idea_content, llm_model):
+        provider_name = resolve_model(llm_model)
+        provider = llm_providers.get_provider(provider_name)
+        digest = await summarize_chunks(idea_title, idea_content, provider)
+        content = await provider.complete(
+            build_prompt(idea_title, digest), max_tokens=REQUIREMENT_MAX_TOKENS
         )
-        return response.choices[0].message.content
-    
-    elif llm_model == "google":
-        if not settings.GOOGLE_API_KEY:
-            raise ValueError("Google API key is not configured")
-        
-        model = genai.GenerativeModel('gemini-pro')
-        response = model.generate_content(prompt)
-        return response.text
-    
-    elif llm_model == "claude":
-        if not anthropic_client:
-            raise ValueError("Claude API key is not configured")
-        
-        response = anthropic_client.messages.create(
-            model="claude-3-opus-20240229",
-            max_tokens=2000,
-            temperature=0.7,
-            system="あなたは優秀なシステムアナリストです。",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+    elif llm_model == "auto":
+        content, provider_name = await llm_hedging.generate(
+            build_prompt(idea_title, idea_content), max_tokens=REQUIREMENT_MAX_TOKENS
         )
-        return response.content[0].text
-    
     else:
-        raise ValueError(f"Unsupported LLM model: {llm_model}")
\ No newline at end of file
+        provider_name = llm_model
+        provider = llm_providers.get_provider(provider_name)
+        content = await provider.complete(
+            build_prompt(idea_title, idea_content), max_tokens=REQUIREMENT_MAX_TOKENS
+        )
+    await requirement_cache.store(cache_key, content, provider_name)
+    return GeneratedRequirement(content, provider_name)
+
+async def stream_requirement(
+    idea_content: str,
+    idea_title: str,
+    llm_model: Literal["openai", "google", "claude"],
+    force_refresh: bool = False
+) -> AsyncIterator[str]:
+    """
+    アイデアから要件定義書を生成し、届いたテキストを順次返す
+    キャッシュにあればそのまま返し、最後まで生成できた結果はキャッシュに保存する
+    本文が長い場合はチャンクごとの要約を作ってから最終的な生成を逐次返す
+    """
+    cache_key = requirement_cache.make_key(idea_title, idea_content, llm_model)
+    if not force_refresh:
+        cached = await requirement_cache.lookup(cache_key)
+        if cached is not None:
+            yield cached[0]
+            return
+
+    provider = llm_providers.get_provider(llm_model)
+    if is_long_input(idea_title, idea_content, llm_model):
+        idea_content = await summarize_chunks(idea_title, idea_content, provider)
+    prompt = build_prompt(idea_title, idea_content)
+    chunks = []
+    async for chunk in provider.stream(prompt, max_tokens=REQUIREMENT_MAX_TOKENS):
+        chunks.append(chunk)
+        yield chunk
+    await requirement_cache.store(cache_key, "".join(chunks), llm_model)
@@ -0,0 +1,71 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Dict, Optional, Tuple, Union
+from ..core.cache import MemoryCache, SQLiteCache
+from ..core.config import settings
+
+# プロンプトの内容を変更したら上げる（古いキャッシュを無効化するため）
+PROMPT_TEMPLATE_VERSION = "1"
+
+_backend: Optional[Union[MemoryCache, SQLiteCache]] = None
+
+def _get_backend() -> Optional[Union[MemoryCache, SQLiteCache]]:
+    global _backend
+    if _backend is None:
+        if settings.REQUIREMENT_CACHE_BACKEND == "memory":
+            _backend = MemoryCache(
+                max_entries=settings.REQUIREMENT_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.REQUIREMENT_CACHE_TTL_SECONDS,
+            )
+        elif settings.REQUIREMENT_CACHE_BACKEND == "sqlite":
+            _backend = SQLiteCache(
+                settings.REQUIREMENT_CACHE_PATH,
+                max_entries=settings.REQUIREMENT_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.REQUIREMENT_CACHE_TTL_SECONDS,
+                table="requirement_cache",
+            )
+    return _backend
+
+def make_key(idea_title: str, idea_content: str, llm_model: str) -> str:
+    """
+    タイトル・内容・モデル・プロンプトのバージョンからキャッシュキーを作る
+    """
+    payload = json.dumps(
+        [PROMPT_TEMPLATE_VERSION, llm_model, idea_title, idea_content],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def lookup(key: str) -> Optional[Tuple[str, str]]:
+    """
+    キャッシュされた（要件定義書, 応答したプロバイダー名）を返す
+    """
+    backend = _get_backend()
+    if backend is None:
+        return None
+    value = await asyncio.to_thread(backend.get, key)
+    if value is None:
+        return None
+    try:
+        entry = json.loads(value)
+        return entry["content"], entry["llm_model"]
+    except (ValueError, TypeError, KeyError):
+        return None
+
+async def store(key: str, content: str, llm_model: str) -> None:
+    backend = _get_backend()
+    if backend is None:
+        return
+    value = json.dumps({"content": content, "llm_model": llm_model}, ensure_ascii=False)
+    await asyncio.to_thread(backend.set, key, value)
+
+def stats() -> Dict[str, Any]:
+    backend = _get_backend()
+    if backend is None:
+        return {"backend": "none"}
+    return {
+        "backend": settings.REQUIREMENT_CACHE_BACKEND,
+        "entries": len(backend),
+        **backend.stats.as_dict(),
+    }
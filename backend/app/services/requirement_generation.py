@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+from typing import Any, Dict, Optional
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..crud import crud_generation_lock, crud_requirement
+from . import llm_service, requirement_cache
+from .singleflight import SingleFlight
+
+_inflight = SingleFlight()
+
+def _make_key(
+    idea_id: int, idea_title: str, idea_content: str, llm_model: str, force_refresh: bool
+) -> str:
+    """
+    force_refreshの生成は通常の生成（キャッシュから返る可能性がある）とは別のキーにする
+    """
+    content_key = requirement_cache.make_key(idea_title, idea_content, llm_model)
+    mode = "refresh" if force_refresh else "normal"
+    return hashlib.sha256(f"{idea_id}:{mode}:{content_key}".encode("utf-8")).hexdigest()
+
+def _save(idea_id: int, content: str, llm_model: str) -> int:
+    db = SessionLocal()
+    try:
+        requirement = crud_requirement.create(
+            db=db, idea_id=idea_id, content=content, llm_model=llm_model
+        )
+        return requirement.id
+    finally:
+        db.close()
+
+def _with_session(fn, **kwargs) -> Any:
+    db = SessionLocal()
+    try:
+        return fn(db, **kwargs)
+    finally:
+        db.close()
+
+async def _wait_for_other_worker(key: str) -> Optional[int]:
+    """
+    他のワーカーが持つロックの完了を待ち、生成された要件定義書のIDを返す
+    ロックが結果なしで解放・失効した場合はNoneを返す
+    """
+    while True:
+        lock = await asyncio.to_thread(_with_session, crud_generation_lock.get, key=key)
+        if lock is None:
+            return None
+        if lock.requirement_id is not None:
+            return lock.requirement_id
+        await asyncio.sleep(settings.GENERATION_LOCK_POLL_SECONDS)
+
+async def _generate_and_save(
+    key: str, idea_id: int, idea_title: str, idea_content: str,
+    llm_model: str, force_refresh: bool
+) -> int:
+    use_lock = settings.GENERATION_LOCK_ENABLED
+    while use_lock:
+        acquired = await asyncio.to_thread(
+            _with_session, crud_generation_lock.acquire,
+            key=key, ttl_seconds=settings.GENERATION_LOCK_TTL_SECONDS
+        )
+        if acquired:
+            break
+        requirement_id = await _wait_for_other_worker(key)
+        if requirement_id is not None:
+            return requirement_id
+
+    try:
+        generated = await llm_service.generate_requirement(
+            idea_content=idea_content,
+            idea_title=idea_title,
+            llm_model=llm_model,
+            force_refresh=force_refresh
+        )
+        requirement_id = await asyncio.to_thread(
+            _save, idea_id, generated.content, generated.llm_model
+        )
+    except BaseException:
+        if use_lock:
+            await asyncio.to_thread(_with_session, crud_generation_lock.release, key=key)
+        raise
+
+    if use_lock:
+        await asyncio.to_thread(
+            _with_session, crud_generation_lock.complete,
+            key=key, requirement_id=requirement_id,
+            ttl_seconds=settings.GENERATION_LOCK_RESULT_TTL_SECONDS
+        )
+    return requirement_id
+
+async def generate(
+    *, idea_id: int, idea_title: str, idea_content: str,
+    llm_model: str, force_refresh: bool = False
+) -> int:
+    """
+    要件定義書を生成して保存し、そのIDを返す
+    同じアイデア・内容・モデルの生成が実行中であれば、その結果を共有する
+    （force_refreshの場合は、同じくforce_refreshの生成とだけ共有する）
+    """
+    key = _make_key(idea_id, idea_title, idea_content, llm_model, force_refresh)
+    return await _inflight.do(
+        key,
+        lambda: _generate_and_save(
+            key, idea_id, idea_title, idea_content, llm_model, force_refresh
+        ),
+    )
+
+def stats() -> Dict[str, Any]:
+    return {"in_flight": _inflight.in_flight()}
@@ -0,0 +1,363 @@
+import asyncio
+import json
+import os
+import threading
+import unicodedata
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..crud import crud_idea
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 文字n-gramのTF-IDFベクトルで似たアイデアを探す（外部APIは使わない）
+# n-gramはハッシュでSIMILARITY_DIMENSIONS次元に割り当て、ユーザーごとにfloat32の
+# 行列ファイルへ保存してメモリマップで読む。IDFは検索時に文書頻度から計算するため、
+# 追加・更新・削除は該当の1行と文書頻度の更新だけで済む。
+
+NGRAM_SIZES = (2, 3)
+
+def vectorize(title: str, content: str) -> np.ndarray:
+    """
+    タイトルと本文を文字n-gramの出現頻度（1 + log tf）のベクトルにする
+    """
+    text = unicodedata.normalize("NFKC", f"{title}\n{content}").lower()
+    text = "".join(text.split())
+    dimensions = settings.SIMILARITY_DIMENSIONS
+    buckets = [
+        zlib.crc32(text[i:i + n].encode("utf-8")) % dimensions
+        for n in NGRAM_SIZES
+        for i in range(len(text) - n + 1)
+    ]
+    counts = np.bincount(np.asarray(buckets, dtype=np.int64), minlength=dimensions)
+    vector = np.zeros(dimensions, dtype=np.float32)
+    present = counts > 0
+    vector[present] = 1.0 + np.log(counts[present])
+    return vector
+
+class UserVectorIndex:
+    """
+    1ユーザー分のベクトルを保存するファイル群
+    {owner_id}.vectors: (capacity, dimensions) float32
+    {owner_id}.ids:     (capacity,) int64（各行のアイデアID）
+    {owner_id}.df:      (dimensions,) float32（各次元を含む文書の数）
+    {owner_id}.json:    件数・容量
+    """
+    def __init__(self, directory: str, owner_id: int, dimensions: int):
+        self.base = os.path.join(directory, str(owner_id))
+        self.dimensions = dimensions
+        self.count = 0
+        self.capacity = 0
+
+    def exists(self) -> bool:
+        """
+        次元数の設定が変わった場合は作り直すため、存在しないものとして扱う
+        """
+        if not os.path.exists(self.base + ".json"):
+            return False
+        with open(self.base + ".json") as f:
+            return json.load(f).get("dimensions") == self.dimensions
+
+    def _load_meta(self) -> None:
+        with open(self.base + ".json") as f:
+            meta = json.load(f)
+        self.count, self.capacity = meta["count"], meta["capacity"]
+
+    def _save_meta(self) -> None:
+        tmp = self.base + ".json.tmp"
+        with open(tmp, "w") as f:
+            json.dump(
+                {"count": self.count, "capacity": self.capacity, "dimensions": self.dimensions}, f
+            )
+        os.replace(tmp, self.base + ".json")
+
+    def _open(self, suffix: str, dtype, shape, mode: str = "r+") -> np.memmap:
+        return np.memmap(self.base + suffix, dtype=dtype, mode=mode, shape=shape)
+
+    def vectors(self, mode: str = "r") -> np.memmap:
+        return self._open(".vectors", np.float32, (self.capacity, self.dimensions), mode)
+
+    def ids(self, mode: str = "r") -> np.memmap:
+        return self._open(".ids", np.int64, (self.capacity,), mode)
+
+    def df(self, mode: str = "r") -> np.memmap:
+        return self._open(".df", np.float32, (self.dimensions,), mode)
+
+    def create(self, capacity: int) -> None:
+        self.count, self.capacity = 0, capacity
+        self._open(".vectors", np.float32, (capacity, self.dimensions), "w+").flush()
+        self._open(".ids", np.int64, (capacity,), "w+").flush()
+        self._open(".df", np.float32, (self.dimensions,), "w+").flush()
+        self._save_meta()
+
+    def load(self, ids: List[int], vectors: np.ndarray) -> None:
+        """
+        空のインデックスにまとめて登録する（初回の構築用）
+        """
+        self.create(capacity=max(64, len(ids)))
+        if not ids:
+            return
+        for stored, values in (
+            (self.vectors("r+")[:len(ids)], vectors),
+            (self.ids("r+")[:len(ids)], ids),
+            (self.df("r+"), (vectors > 0).sum(axis=0)),
+        ):
+            stored[:] = values
+            stored.flush()
+        self.count = len(ids)
+        self._save_meta()
+
+    def _grow(self) -> None:
+        capacity = max(self.capacity * 2, 64)
+        for suffix, itemsize in ((".vectors", 4 * self.dimensions), (".ids", 8)):
+            with open(self.base + suffix, "r+b") as f:
+                f.truncate(capacity * itemsize)
+        self.capacity = capacity
+
+    def _row_of(self, idea_id: int) -> Optional[int]:
+        if self.count == 0:
+            return None
+        rows = np.flatnonzero(self.ids()[:self.count] == idea_id)
+        return int(rows[0]) if len(rows) else None
+
+    def upsert(self, idea_id: int, vector: np.ndarray) -> None:
+        self.upsert_many([idea_id], vector[np.newaxis])
+
+    def upsert_many(self, ids: List[int], vectors: np.ndarray) -> None:
+        """
+        複数のアイデアの行を追加・更新する（ファイルの書き込みは最後に1回だけ行う）
+        """
+        self._load_meta()
+        rows = [self._row_of(idea_id) for idea_id in ids]
+        added = {idea_id for idea_id, row in zip(ids, rows) if row is None}
+        while self.count + len(added) > self.capacity:
+            self._grow()
+        df = self.df("r+")
+        stored = self.vectors("r+")
+        stored_ids = self.ids("r+")
+        new_rows: Dict[int, int] = {}
+        for idea_id, row, vector in zip(ids, rows, vectors):
+            row = new_rows.get(idea_id, row)
+            if row is None:
+                row = new_rows[idea_id] = self.count
+                self.count += 1
+                stored_ids[row] = idea_id
+            else:
+                df -= stored[row] > 0
+            stored[row] = vector
+            df += vector > 0
+        stored.flush()
+        stored_ids.flush()
+        df.flush()
+        self._save_meta()
+
+    def append(self, ids: List[int], vectors: np.ndarray) -> None:
+        """
+        新しいアイデア（インデックスにないID）の行を末尾にまとめて追加する（インポート用）
+        """
+        self._load_meta()
+        while self.count + len(ids) > self.capacity:
+            self._grow()
+        end = self.count + len(ids)
+        for stored, values in (
+            (self.vectors("r+")[self.count:end], vectors),
+            (self.ids("r+")[self.count:end], ids),
+        ):
+            stored[:] = values
+            stored.flush()
+        df = self.df("r+")
+        df += (vectors > 0).sum(axis=0)
+        df.flush()
+        self.count = end
+        self._save_meta()
+
+    def remove(self, idea_id: int) -> None:
+        self.remove_many([idea_id])
+
+    def remove_many(self, idea_ids: Iterable[int]) -> None:
+        self._load_meta()
+        df = self.df("r+")
+        vectors = self.vectors("r+")
+        ids = self.ids("r+")
+        for idea_id in idea_ids:
+            rows = np.flatnonzero(ids[:self.count] == idea_id)
+            if not len(rows):
+                continue
+            row = int(rows[0])
+            df -= vectors[row] > 0
+            # 最後の行を削除した行に移して詰める
+            last = self.count - 1
+            vectors[row] = vectors[last]
+            ids[row] = ids[last]
+            self.count = last
+        vectors.flush()
+        ids.flush()
+        df.flush()
+        self._save_meta()
+
+    def query(
+        self, vector: np.ndarray, *, limit: int, exclude_id: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        コサイン類似度の高い順に（アイデアID, 類似度）を返す
+        """
+        self._load_meta()
+        if self.count == 0:
+            return []
+        idf = (np.log((1.0 + self.count) / (1.0 + self.df())) + 1.0).astype(np.float32)
+        query = vector * idf
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        # 重み付き行列（V * idf）を作らずに、内積と各行のノルムを計算する
+        query = query * idf / norm
+        idf_squared = idf * idf
+
+        vectors = self.vectors()
+        scores = np.empty(self.count, dtype=np.float32)
+        batch = settings.SIMILARITY_BATCH_ROWS
+        for start in range(0, self.count, batch):
+            rows = vectors[start:min(start + batch, self.count)]
+            norms = np.sqrt(np.einsum("ij,ij,j->i", rows, rows, idf_squared))
+            norms[norms == 0] = 1.0
+            scores[start:start + len(rows)] = rows @ query / norms
+
+        ids = np.array(self.ids()[:self.count])
+        if exclude_id is not None:
+            scores[ids == exclude_id] = -1.0
+        limit = min(limit, self.count)
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+_locks: Dict[int, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+@contextmanager
+def _locked(owner_id: int) -> Iterator[UserVectorIndex]:
+    """
+    ユーザーのインデックスを排他的に開く（プロセス内はLock、ワーカー間はflock）
+    """
+    with _locks_guard:
+        lock = _locks.setdefault(owner_id, threading.Lock())
+    os.makedirs(settings.SIMILARITY_INDEX_DIR, exist_ok=True)
+    index = UserVectorIndex(settings.SIMILARITY_INDEX_DIR, owner_id, settings.SIMILARITY_DIMENSIONS)
+    with lock, open(index.base + ".lock", "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield index
+
+def has_index(owner_id: int) -> bool:
+    with _locked(owner_id) as index:
+        return index.exists()
+
+def build_index(owner_id: int, ideas: Iterable[Tuple[int, str, str]]) -> None:
+    """
+    インデックスがない場合に既存のアイデア（id, title, content）から作る
+    """
+    ids: List[int] = []
+    vectors: List[np.ndarray] = []
+    for idea_id, title, content in ideas:
+        ids.append(idea_id)
+        vectors.append(vectorize(title, content))
+    matrix = (
+        np.vstack(vectors) if vectors
+        else np.zeros((0, settings.SIMILARITY_DIMENSIONS), dtype=np.float32)
+    )
+    with _locked(owner_id) as index:
+        if not index.exists():
+            index.load(ids, matrix)
+
+def upsert_idea(owner_id: int, idea_id: int, title: str, content: str) -> None:
+    vector = vectorize(title, content)
+    with _locked(owner_id) as index:
+        if index.exists():
+            index.upsert(idea_id, vector)
+
+def append_ideas(owner_id: int, ideas: Iterable[Tuple[int, str, str]]) -> None:
+    """
+    新しく登録したアイデア（id, title, content）をまとめて追加する
+    """
+    ideas = list(ideas)
+    # インデックスがない場合は、後で作るときにDBから読み込まれる
+    if not ideas or not has_index(owner_id):
+        return
+    matrix = np.vstack([vectorize(title, content) for _, title, content in ideas])
+    with _locked(owner_id) as index:
+        if index.exists():
+            index.append([id for id, _, _ in ideas], matrix)
+
+def remove_idea(owner_id: int, idea_id: int) -> None:
+    with _locked(owner_id) as index:
+        if index.exists():
+            index.remove(idea_id)
+
+def upsert_ideas(owner_id: int, ideas: Iterable[Tuple[int, str, str]]) -> None:
+    """
+    更新したアイデア（id, title, content）をまとめて反映する（ロックは1回だけ取る）
+    """
+    ideas = list(ideas)
+    if not ideas or not has_index(owner_id):
+        return
+    vectors = np.stack([vectorize(title, content) for _, title, content in ideas])
+    with _locked(owner_id) as index:
+        if index.exists():
+            index.upsert_many([id for id, _, _ in ideas], vectors)
+
+def remove_ideas(owner_id: int, idea_ids: Iterable[int]) -> None:
+    idea_ids = list(idea_ids)
+    if not idea_ids:
+        return
+    with _locked(owner_id) as index:
+        if index.exists():
+            index.remove_many(idea_ids)
+
+def find_similar(
+    owner_id: int, title: str, content: str, *,
+    limit: int, exclude_id: Optional[int] = None
+) -> List[Tuple[int, float]]:
+    vector = vectorize(title, content)
+    with _locked(owner_id) as index:
+        if not index.exists():
+            return []
+        return index.query(vector, limit=limit, exclude_id=exclude_id)
+
+# 非同期版（ベクトル計算とファイル操作はスレッドで実行する）
+
+async def aupsert_idea(owner_id: int, idea_id: int, title: str, content: str) -> None:
+    await asyncio.to_thread(upsert_idea, owner_id, idea_id, title, content)
+
+async def aappend_ideas(owner_id: int, ideas: Iterable[Tuple[int, str, str]]) -> None:
+    await asyncio.to_thread(append_ideas, owner_id, ideas)
+
+async def aremove_idea(owner_id: int, idea_id: int) -> None:
+    await asyncio.to_thread(remove_idea, owner_id, idea_id)
+
+async def aupsert_ideas(owner_id: int, ideas: Iterable[Tuple[int, str, str]]) -> None:
+    await asyncio.to_thread(upsert_ideas, owner_id, ideas)
+
+async def aremove_ideas(owner_id: int, idea_ids: Iterable[int]) -> None:
+    await asyncio.to_thread(remove_ideas, owner_id, idea_ids)
+
+async def afind_similar(
+    owner_id: int, title: str, content: str, *,
+    limit: int, exclude_id: Optional[int] = None
+) -> List[Tuple[int, float]]:
+    return await asyncio.to_thread(
+        find_similar, owner_id, title, content, limit=limit, exclude_id=exclude_id
+    )
+
+async def aensure_index(db: AsyncSession, owner_id: int) -> None:
+    """
+    ユーザーのインデックスがなければ既存のアイデアから作る（以降は差分更新のみ）
+    """
+    if await asyncio.to_thread(has_index, owner_id):
+        return
+    ideas = await crud_idea.aget_texts_by_owner(db, owner_id=owner_id)
+    await asyncio.to_thread(build_index, owner_id, ideas)
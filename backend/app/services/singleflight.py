@@ -0,0 +1,28 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+class SingleFlight:
+    """
+    同じキーの処理が実行中であれば、新たに実行せずその結果を共有する
+    呼び出し元がキャンセルされても共有中の処理は止めない
+    """
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # 待機者がいなくなった場合でも例外を未取得のまま残さない
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
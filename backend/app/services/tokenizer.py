@@ -0,0 +1,14 @@
+import re
+
+# 日本語（かな・漢字）や全角文字はおおむね1文字1トークン、それ以外は約4文字で1トークンとして見積もる
+_WIDE_CHAR = re.compile(r"[　-ヿ㐀-䶿一-鿿豈-﫿＀-￯]")
+
+def count_tokens(text: str) -> int:
+    """
+    外部ライブラリを使わずにテキストのトークン数を概算する
+    """
+    if not text:
+        return 0
+    wide = len(_WIDE_CHAR.findall(text))
+    narrow = len(text) - wide
+    return wide + (narrow + 3) // 4
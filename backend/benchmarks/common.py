@@ -0,0 +1,170 @@
+"""
+ベンチマーク共通の処理
+
+一時ディレクトリのDBを使うuvicornを別プロセスで起動し、HTTP経由で計測する。
+--app-dirに別のチェックアウトのbackendディレクトリを指定すると、同じスクリプトで変更前と比較できる。
+    git worktree add /tmp/before <変更前のコミット>
+    python -m benchmarks.ideas_list --app-dir /tmp/before/backend
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API = "/api/v1"
+
+def parse_args(description: str, **defaults) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--url", help="起動済みのサーバーのURL（指定しない場合は一時的に起動する）")
+    parser.add_argument("--app-dir", default=BACKEND_DIR, help="起動するbackendディレクトリ")
+    parser.add_argument("--concurrency", type=int, default=defaults.pop("concurrency", 32))
+    parser.add_argument("--requests", type=int, default=defaults.pop("requests", 2000))
+    parser.add_argument("--bcrypt-rounds", type=int, default=defaults.pop("bcrypt_rounds", 4))
+    parser.add_argument(
+        "--response-cache", default=defaults.pop("response_cache", "none"),
+        help="RESPONSE_CACHE_BACKEND（既定ではキャッシュなしでDBからの読み込みを計測する）",
+    )
+    for name, value in defaults.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    return parser.parse_args()
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def server(args: argparse.Namespace, env: Optional[Dict[str, str]] = None) -> Iterator[str]:
+    """
+    --urlが指定されていればそのまま使い、なければ一時DBでサーバーを起動してURLを返す
+    """
+    if args.url:
+        yield args.url.rstrip("/")
+        return
+    tmp_dir = tempfile.mkdtemp(prefix="idea-management-bench-")
+    port = _free_port()
+    process_env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_dir}/bench.db",
+        "SIMILARITY_INDEX_DIR": os.path.join(tmp_dir, "similarity_index"),
+        "RESPONSE_CACHE_PATH": os.path.join(tmp_dir, "response_cache.db"),
+        "REQUIREMENT_CACHE_PATH": os.path.join(tmp_dir, "requirement_cache.db"),
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "RESPONSE_CACHE_BACKEND": args.response_cache,
+        **(env or {}),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=args.app_dir, env=process_env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                httpx.get(f"{url}/docs", timeout=1)
+                break
+            except httpx.TransportError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("server did not start")
+                time.sleep(0.2)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+async def register(client: httpx.AsyncClient) -> Dict[str, str]:
+    """
+    新しいユーザーを登録してログインし、認証ヘッダーを返す
+    """
+    name = f"bench{uuid.uuid4().hex[:12]}"
+    password = "password123"
+    response = await client.post(
+        f"{API}/auth/register",
+        json={"email": f"{name}@example.com", "username": name, "password": password},
+    )
+    response.raise_for_status()
+    response = await client.post(f"{API}/auth/login", data={"username": name, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def create_ideas(
+    client: httpx.AsyncClient, headers: Dict[str, str], count: int, concurrency: int = 4
+) -> List[int]:
+    """
+    POST /ideas/で1件ずつアイデアを作成する（変更前のコードでも使える方法）
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def create(i: int) -> int:
+        async with semaphore:
+            response = await client.post(
+                f"{API}/ideas/", headers=headers,
+                json={"title": f"アイデア{i}", "content": f"ベンチマーク用のアイデア{i}の本文です。" * 5},
+            )
+            response.raise_for_status()
+            return response.json()["id"]
+
+    return list(await asyncio.gather(*(create(i) for i in range(count))))
+
+async def run_load(
+    client: httpx.AsyncClient, method: str, path: str, *, total: int, concurrency: int,
+    headers: Optional[Dict[str, str]] = None, **kwargs
+) -> Tuple[float, List[float], int]:
+    """
+    同時にconcurrency件ずつ合計total件のリクエストを送る
+    戻り値: (1秒あたりのリクエスト数, 成功したリクエストのレイテンシ, 失敗したリクエスト数)
+    """
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, headers=headers, **kwargs)
+            except httpx.TransportError:
+                errors += 1
+                continue
+            if response.is_success:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return len(latencies) / (time.perf_counter() - started), latencies, errors
+
+def percentile(values: Sequence[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def report(
+    label: str, latencies: Sequence[float], rps: Optional[float] = None, errors: int = 0
+) -> None:
+    line = (
+        f"{label}: p50={percentile(latencies, 50) * 1000:.1f}ms "
+        f"p99={percentile(latencies, 99) * 1000:.1f}ms"
+    )
+    if rps is not None:
+        line += f" rps={rps:.0f}"
+    if errors:
+        line += f" errors={errors}"
+    print(line)
+
+def client(url: str, concurrency: int) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+    return httpx.AsyncClient(base_url=url, limits=limits, timeout=120)
@@ -0,0 +1,82 @@
+"""
+アイデアの作成・更新・削除を1件ずつ送る場合と、POST /ideas/batchでまとめて送る場合の比較
+
+1回（ラウンド）の変更は、--items件の作成と、既存のアイデアの--items/2件の更新・--items/2件の削除。
+1件ずつの場合は--concurrency件ずつ同時に送り、ラウンドごとの所要時間を計測する。
+
+    python -m benchmarks.ideas_batch [--items 100] [--rounds 10] [--concurrency 8]
+"""
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+
+from .common import API, client, parse_args, register, report, server
+
+def _operations(round: int, items: int, existing: List[int]) -> Dict[str, list]:
+    half = items // 2
+    return {
+        "create": [
+            {"title": f"アイデア{round}-{i}", "content": f"ラウンド{round}の{i}件目の本文です。" * 5}
+            for i in range(items)
+        ],
+        "update": [{"id": id, "title": f"更新{round}-{id}"} for id in existing[:half]],
+        "delete": existing[half:half * 2],
+    }
+
+async def _prepare(http: httpx.AsyncClient, headers: Dict[str, str], round: int, items: int) -> List[int]:
+    """
+    更新・削除の対象のアイデアを作成する（計測しない）
+    """
+    response = await http.post(f"{API}/ideas/batch", headers=headers, json=_operations(-round - 1, items, []))
+    response.raise_for_status()
+    return [result["id"] for result in response.json()["results"]]
+
+async def _per_item(
+    http: httpx.AsyncClient, headers: Dict[str, str], operations: Dict[str, list], concurrency: int
+) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def send(method: str, path: str, **kwargs) -> None:
+        nonlocal errors
+        async with semaphore:
+            response = await http.request(method, f"{API}{path}", headers=headers, **kwargs)
+            if not response.is_success:
+                errors += 1
+
+    await asyncio.gather(
+        *(send("POST", "/ideas/", json=idea) for idea in operations["create"]),
+        *(send("PUT", f"/ideas/{patch['id']}", json={"title": patch["title"]}) for patch in operations["update"]),
+        *(send("DELETE", f"/ideas/{id}") for id in operations["delete"]),
+    )
+    return errors
+
+async def _batch(http: httpx.AsyncClient, headers: Dict[str, str], operations: Dict[str, list]) -> int:
+    response = await http.post(f"{API}/ideas/batch", headers=headers, json=operations)
+    return 0 if response.is_success else 1
+
+async def main() -> None:
+    args = parse_args(__doc__, concurrency=8, items=100, rounds=10)
+    operations_per_round = args.items + (args.items // 2) * 2
+    with server(args) as url:
+        async with client(url, args.concurrency) as http:
+            headers = await register(http)
+            for label, run in [
+                ("per-item requests", lambda ops: _per_item(http, headers, ops, args.concurrency)),
+                ("POST /ideas/batch", lambda ops: _batch(http, headers, ops)),
+            ]:
+                latencies: List[float] = []
+                errors = 0
+                for round in range(args.rounds):
+                    existing = await _prepare(http, headers, round, args.items)
+                    operations = _operations(round, args.items, existing)
+                    started = time.perf_counter()
+                    errors += await run(operations)
+                    latencies.append(time.perf_counter() - started)
+                report(f"{label} ({operations_per_round} operations per round)", latencies, errors=errors)
+                print(f"  {operations_per_round * args.rounds / sum(latencies):.0f} operations/s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
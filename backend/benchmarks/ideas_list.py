@@ -0,0 +1,25 @@
+"""
+GET /ideas/ の同時実行時の1秒あたりのリクエスト数
+
+    python -m benchmarks.ideas_list [--app-dir <変更前のbackend>] [--concurrency 32]
+"""
+import asyncio
+
+from .common import API, client, create_ideas, parse_args, register, report, run_load, server
+
+async def main() -> None:
+    args = parse_args(__doc__, ideas=100)
+    with server(args) as url:
+        async with client(url, args.concurrency) as http:
+            headers = await register(http)
+            await create_ideas(http, headers, args.ideas)
+            # ウォームアップ
+            await run_load(http, "GET", f"{API}/ideas/", total=100, concurrency=4, headers=headers)
+            rps, latencies, errors = await run_load(
+                http, "GET", f"{API}/ideas/", total=args.requests,
+                concurrency=args.concurrency, headers=headers, params={"limit": args.ideas},
+            )
+            report(f"GET /ideas/?limit={args.ideas} x{args.concurrency}", latencies, rps, errors)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+一覧APIの本文を作る処理のマイクロベンチマーク（--rows件、既定1000件）
+
+GET /ideas/とGET /home/itemsについて、ORMのエンティティをレスポンスモデル（TypeAdapter）でシリアライズする場合と、
+行の値からorjsonで直接作る場合（現在の実装）を同じプロセスで比較する。HTTPとキャッシュは含まない。
+
+    python -m benchmarks.list_serialization [--rows 1000] [--repeat 200]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, List
+
+from .common import report
+
+def _configure() -> None:
+    # アプリの設定はインポート時に読み込まれるため、一時ディレクトリのDBを先に環境変数で指定する
+    tmp_dir = tempfile.mkdtemp(prefix="idea-management-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_dir}/bench.db"
+    os.environ["SIMILARITY_INDEX_DIR"] = os.path.join(tmp_dir, "similarity_index")
+    os.environ["REQUIREMENT_CACHE_PATH"] = os.path.join(tmp_dir, "requirement_cache.db")
+    os.environ["RESPONSE_CACHE_BACKEND"] = "none"
+
+def _seed(rows: int) -> int:
+    from app import models
+    from app.core.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        user = models.User(email="bench@example.com", username="bench", hashed_password="-")
+        db.add(user)
+        db.flush()
+        db.add_all(
+            models.Idea(title=f"アイデア{i}", content=f"{i}番目のアイデアの説明。" * 20, owner_id=user.id)
+            for i in range(rows)
+        )
+        db.add_all(
+            models.HomeItem(
+                title=f"付箋{i}", content="メモ", position_x=i * 1.5, position_y=-i * 0.25,
+                width=200, height=150, style={"fontSize": 14, "bold": i % 2 == 0}, user_id=user.id,
+            )
+            for i in range(rows)
+        )
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+async def _measure(label: str, repeat: int, make_body: Callable[..., Awaitable[bytes]]) -> None:
+    from app.core.database import AsyncSessionLocal
+
+    latencies: List[float] = []
+    size = 0
+    for _ in range(repeat):
+        # セッションごとにエンティティを作り直す（identity mapに残ったエンティティを再利用しない）
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            size = len(await make_body(db))
+            latencies.append(time.perf_counter() - started)
+    report(f"{label} ({size} bytes)", latencies)
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    _configure()
+
+    from pydantic import TypeAdapter
+
+    import app.main  # noqa: F401  テーブルとインデックスを作成する
+    from app.core import serialization
+    from app.crud import crud_home, crud_idea
+    from app.schemas import HomeItem, Idea
+
+    owner_id = _seed(args.rows)
+    ideas = TypeAdapter(List[Idea])
+    items = TypeAdapter(List[HomeItem])
+
+    async def ideas_model(db) -> bytes:
+        rows = await crud_idea.aget_multi_by_owner(db=db, owner_id=owner_id, limit=args.rows)
+        return ideas.dump_json(ideas.validate_python(rows, from_attributes=True))
+
+    async def ideas_rows(db) -> bytes:
+        rows, _ = await crud_idea.aget_rows_page_by_owner(db=db, owner_id=owner_id, limit=args.rows)
+        return serialization.dumps(rows)
+
+    async def items_model(db) -> bytes:
+        rows = await crud_home.aget_multi_by_owner(db=db, owner_id=owner_id)
+        return items.dump_json(items.validate_python(rows, from_attributes=True))
+
+    async def items_rows(db) -> bytes:
+        return serialization.dumps(await crud_home.aget_rows_by_owner(db=db, owner_id=owner_id))
+
+    await _measure("ideas: ORM + TypeAdapter", args.repeat, ideas_model)
+    await _measure("ideas: rows + orjson", args.repeat, ideas_rows)
+    await _measure("home items: ORM + TypeAdapter", args.repeat, items_model)
+    await _measure("home items: rows + orjson", args.repeat, items_rows)
+
+if __name__ == "__main__":
+    asyncio.run(main())
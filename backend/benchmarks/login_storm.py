@@ -0,0 +1,54 @@
+"""
+ログインが集中している間のGET /ideas/のレイテンシ
+
+ログインなしで計測した後、--storm件のログインを繰り返し送りながら同じ負荷で計測し、p99を比較する。
+bcryptのコストは本番と同じ12を既定にしている。
+
+    python -m benchmarks.login_storm [--app-dir <変更前のbackend>] [--storm 16]
+"""
+import asyncio
+import uuid
+
+from .common import API, client, create_ideas, parse_args, register, report, run_load, server
+
+async def main() -> None:
+    args = parse_args(__doc__, concurrency=8, requests=1000, bcrypt_rounds=12, storm=16, ideas=20)
+    with server(args) as url:
+        async with client(url, args.concurrency + args.storm) as http:
+            headers = await register(http)
+            await create_ideas(http, headers, args.ideas)
+            name = f"storm{uuid.uuid4().hex[:12]}"
+            response = await http.post(
+                f"{API}/auth/register",
+                json={"email": f"{name}@example.com", "username": name, "password": "password123"},
+            )
+            response.raise_for_status()
+
+            async def measure(label: str) -> None:
+                rps, latencies, errors = await run_load(
+                    http, "GET", f"{API}/ideas/", total=args.requests,
+                    concurrency=args.concurrency, headers=headers,
+                )
+                report(label, latencies, rps, errors)
+
+            await measure("GET /ideas/ (no logins)")
+
+            stop = asyncio.Event()
+            logins = 0
+
+            async def storm() -> None:
+                nonlocal logins
+                while not stop.is_set():
+                    await http.post(
+                        f"{API}/auth/login", data={"username": name, "password": "password123"}
+                    )
+                    logins += 1
+
+            storms = [asyncio.create_task(storm()) for _ in range(args.storm)]
+            await measure(f"GET /ideas/ (during {args.storm} concurrent logins)")
+            stop.set()
+            await asyncio.gather(*storms)
+            print(f"logins completed during the run: {logins}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
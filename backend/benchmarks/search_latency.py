@@ -0,0 +1,55 @@
+"""
+GET /ideas/search のレイテンシ（--rows件のアイデアを登録した状態）
+
+アイデアはPOST /ideas/importでまとめて登録する。
+
+    python -m benchmarks.search_latency [--rows 100000]
+"""
+import asyncio
+import json
+import random
+import time
+
+from .common import API, client, parse_args, register, report, run_load, server
+
+WORDS = [
+    "会計", "在庫", "勤怠", "予約", "家計簿", "学習", "旅行", "健康", "配送", "採用",
+    "顧客", "請求", "分析", "通知", "共有", "記録", "管理", "自動化", "推薦", "翻訳",
+]
+
+QUERIES = ["在庫管理", "家計簿 自動化", "顧客", "通知の共有", "存在しない語句"]
+
+def _ndjson(rows: int):
+    rng = random.Random(0)
+    for i in range(rows):
+        words = rng.sample(WORDS, 4)
+        line = {
+            "title": f"{words[0]}{words[1]}アプリ{i}",
+            "content": f"{words[0]}と{words[1]}の{words[2]}を{words[3]}するサービスの案{i}。" * 3,
+        }
+        yield (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+
+async def main() -> None:
+    args = parse_args(__doc__, concurrency=4, requests=200, rows=100000)
+    with server(args) as url:
+        async with client(url, args.concurrency) as http:
+            headers = await register(http)
+
+            async def body():
+                for line in _ndjson(args.rows):
+                    yield line
+
+            started = time.perf_counter()
+            response = await http.post(f"{API}/ideas/import", headers=headers, content=body())
+            response.raise_for_status()
+            print(f"imported {response.json()['ideas']} ideas in {time.perf_counter() - started:.1f}s")
+
+            for q in QUERIES:
+                rps, latencies, errors = await run_load(
+                    http, "GET", f"{API}/ideas/search", total=args.requests,
+                    concurrency=args.concurrency, headers=headers, params={"q": q, "limit": 20},
+                )
+                report(f"q={q!r}", latencies, rps, errors)
+
+if __name__ == "__main__":
+    asyncio.run(main())
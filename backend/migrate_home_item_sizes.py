@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+ホームアイテムのサイズ修正スクリプト
+サイズを検証する前に負の幅・高さで登録されたアイテムを、同じ範囲を表す正のサイズに直します。
+（起動時の処理ではデータを変更せず、該当するアイテムを表示範囲の検索の索引に登録しません）
+"""
+
+import sys
+from pathlib import Path
+
+# プロジェクトルートをPythonパスに追加
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from app.core.database import engine
+from app.crud import crud_home_spatial
+
+def main():
+    """メイン処理"""
+    print("🚀 ホームアイテムのサイズを確認しています...")
+
+    try:
+        count = crud_home_spatial.normalize_sizes(engine)
+    except Exception as e:
+        print(f"❌ エラーが発生しました: {e}")
+        sys.exit(1)
+
+    if count:
+        print(f"✅ {count}件のアイテムのサイズを修正しました")
+    else:
+        print("ℹ️  修正が必要なアイテムはありません")
+
+if __name__ == "__main__":
+    main()
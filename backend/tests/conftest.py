@@ -0,0 +1,61 @@
+import os
+import tempfile
+import uuid
+
+# アプリの設定はインポート時に読み込まれるため、テスト用の一時ディレクトリを先に環境変数で指定する
+_TMP_DIR = tempfile.mkdtemp(prefix="idea-management-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DIR}/test.db"
+os.environ["SIMILARITY_INDEX_DIR"] = os.path.join(_TMP_DIR, "similarity_index")
+os.environ["RESPONSE_CACHE_PATH"] = os.path.join(_TMP_DIR, "response_cache.db")
+os.environ["REQUIREMENT_CACHE_PATH"] = os.path.join(_TMP_DIR, "requirement_cache.db")
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+def register(client) -> dict:
+    """
+    新しいユーザーを登録し、そのユーザーの認証ヘッダーを返す
+    """
+    name = f"user{uuid.uuid4().hex[:12]}"
+    password = "password123"
+    response = client.post(
+        "/api/v1/auth/register",
+        json={"email": f"{name}@example.com", "username": name, "password": password},
+    )
+    assert response.status_code == 200, response.text
+    response = client.post("/api/v1/auth/login", data={"username": name, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def auth_headers(client):
+    """
+    テストごとに新しいユーザーを登録し、そのユーザーの認証ヘッダーを返す
+    """
+    return register(client)
+
+@pytest.fixture
+def other_auth_headers(client):
+    """
+    auth_headersとは別のユーザー（他のユーザーのデータが見えないことの確認用）
+    """
+    return register(client)
+
+@pytest.fixture
+def create_idea(client, auth_headers):
+    def create(title: str = "アイデア", content: str = "内容") -> int:
+        response = client.post(
+            "/api/v1/ideas/", headers=auth_headers, json={"title": title, "content": content}
+        )
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+    return create
@@ -0,0 +1,59 @@
+from sqlalchemy import update
+
+from app.core import auth_cache
+from app.core.database import SessionLocal
+from app.crud import crud_user
+from app.models import User
+
+def _me(client, headers):
+    return client.get("/api/v1/users/me", headers=headers)
+
+def test_cached_principal_is_served_until_invalidated(client, auth_headers):
+    username = _me(client, auth_headers).json()["username"]
+    assert auth_cache.get_principal(username) is not None
+
+    # キャッシュを破棄せずにDBだけ変更した場合は、キャッシュの値が使われる
+    db = SessionLocal()
+    try:
+        db.execute(update(User).where(User.username == username).values(is_active=False))
+        db.commit()
+    finally:
+        db.close()
+    assert _me(client, auth_headers).status_code == 200
+
+    auth_cache.invalidate(username)
+    assert _me(client, auth_headers).status_code == 400
+
+def test_deactivated_user_stops_authenticating(client, auth_headers):
+    username = _me(client, auth_headers).json()["username"]
+    assert auth_cache.get_principal(username) is not None
+
+    db = SessionLocal()
+    try:
+        crud_user.deactivate(db, db_obj=crud_user.get_by_username(db, username=username))
+    finally:
+        db.close()
+
+    assert auth_cache.get_principal(username) is None
+    response = _me(client, auth_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
+
+def test_renamed_user_stops_authenticating_with_old_name(client, auth_headers):
+    old_name = _me(client, auth_headers).json()["username"]
+    new_name = f"{old_name}new"
+
+    response = client.put("/api/v1/users/me", headers=auth_headers, json={"username": new_name})
+    assert response.status_code == 200
+    assert response.json()["username"] == new_name
+
+    # 古いユーザー名のトークンはキャッシュから復元されず、DBにもないため401になる
+    assert auth_cache.get_principal(old_name) is None
+    assert _me(client, auth_headers).status_code == 401
+
+    response = client.post(
+        "/api/v1/auth/login", data={"username": new_name, "password": "password123"}
+    )
+    assert response.status_code == 200
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert _me(client, headers).json()["username"] == new_name
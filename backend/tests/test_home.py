@@ -0,0 +1,255 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.core.database import Base
+from app.crud import crud_home, crud_home_spatial
+from app.models import HomeItem
+from app.schemas import HomeItemMove
+from app.services import board_sync
+
+def _create_item(client, headers, **fields):
+    return client.post("/api/v1/home/items", headers=headers, json={"title": "付箋", **fields})
+
+def test_negative_or_non_finite_size_is_rejected(client, auth_headers):
+    assert _create_item(client, auth_headers, width=-10).status_code == 422
+    item_id = _create_item(client, auth_headers).json()["id"]
+
+    response = client.put(f"/api/v1/home/items/{item_id}", headers=auth_headers, json={"height": -5})
+    assert response.status_code == 422
+    response = client.patch(
+        "/api/v1/home/items", headers=auth_headers,
+        json={"update": [{"id": item_id, "width": -1}]},
+    )
+    assert response.status_code == 422
+    response = client.post(
+        "/api/v1/home/items", headers={**auth_headers, "Content-Type": "application/json"},
+        content='{"title": "付箋", "position_x": NaN}',
+    )
+    assert response.status_code == 422
+
+def test_viewport_returns_overlapping_items(client, auth_headers):
+    inside = _create_item(client, auth_headers, position_x=0, position_y=0, width=100, height=100)
+    edge = _create_item(client, auth_headers, position_x=-50, position_y=-50, width=60, height=60)
+    _create_item(client, auth_headers, position_x=500, position_y=500, width=10, height=10)
+
+    response = client.get(
+        "/api/v1/home/items", headers=auth_headers, params={"viewport": "5,5,200,200"}
+    )
+
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [inside.json()["id"], edge.json()["id"]]
+
+def _hub_flush_twice(client, owner_id, moves):
+    async def run():
+        hub = board_sync.hub
+        await hub.move(owner_id, None, moves)
+        await hub.flush(owner_id)
+        await hub.flush(owner_id)
+        return hub.stats(), hub._pending.get(owner_id)
+    return client.portal.call(run)
+
+def test_board_flush_drops_unwritable_item_and_saves_others(client, auth_headers):
+    first = _create_item(client, auth_headers).json()
+    second = _create_item(client, auth_headers).json()
+    owner_id = first["user_id"]
+    dropped_before = board_sync.hub.stats()["dropped_items"]
+    # 検証を通さずに、書き込めない値（負の幅）を送る
+    moves = [
+        HomeItemMove.model_construct(id=first["id"], width=-50),
+        HomeItemMove(id=second["id"], position_x=500),
+    ]
+
+    stats, pending = _hub_flush_twice(client, owner_id, moves)
+
+    assert stats["dropped_items"] == dropped_before + 1
+    assert not pending
+    items = {item["id"]: item for item in client.get("/api/v1/home/items", headers=auth_headers).json()}
+    assert items[second["id"]]["position_x"] == 500
+    assert items[first["id"]]["width"] == first["width"]
+
+def test_board_flush_gives_up_after_max_retries(client, auth_headers, monkeypatch):
+    item = _create_item(client, auth_headers).json()
+    owner_id = item["user_id"]
+
+    async def fail(owner_id, pending):
+        raise OperationalError("UPDATE home_items", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(board_sync.hub, "_write", fail)
+    monkeypatch.setattr(settings, "HOME_BOARD_FLUSH_MAX_RETRIES", 1)
+
+    _, pending = _hub_flush_twice(client, owner_id, [HomeItemMove(id=item["id"], position_x=10)])
+
+    assert not pending
+
+def _board(client, headers, since=None):
+    params = {} if since is None else {"since": since}
+    response = client.get("/api/v1/home/items", headers=headers, params=params)
+    assert response.status_code == 200, response.text
+    return response
+
+def _changes(client, headers, since):
+    body = _board(client, headers, since).json()
+    return body["version"], sorted(item["id"] for item in body["items"]), body["deleted"]
+
+def test_concurrent_first_writes_share_one_board_version(client, auth_headers):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(
+            lambda i: _create_item(client, auth_headers, title=f"付箋{i}"), range(8)
+        ))
+
+    assert [response.status_code for response in responses] == [200] * 8
+    assert _board(client, auth_headers).headers["X-Board-Version"] == "8"
+
+def test_batch_patch_applies_create_update_delete(client, auth_headers):
+    kept = _create_item(client, auth_headers, title="残す").json()
+    removed = _create_item(client, auth_headers, title="消す").json()
+
+    response = client.patch("/api/v1/home/items", headers=auth_headers, json={
+        "create": [{"title": "新規1"}, {"title": "新規2", "position_x": 10}],
+        "update": [{"id": kept["id"], "title": "更新済み", "width": 300}],
+        "delete": [removed["id"]],
+    })
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["version"] == 3
+    assert [item["title"] for item in body["items"]] == ["新規1", "新規2", "更新済み"]
+    assert body["items"][2]["width"] == 300
+    assert body["deleted"] == [removed["id"]]
+    board = {item["id"]: item["title"] for item in _board(client, auth_headers).json()}
+    assert sorted(board.values()) == ["新規1", "新規2", "更新済み"]
+
+def test_batch_patch_rejects_unknown_or_foreign_items_without_changes(
+    client, auth_headers, other_auth_headers
+):
+    own = _create_item(client, auth_headers).json()
+    foreign = _create_item(client, other_auth_headers).json()
+
+    missing = client.patch("/api/v1/home/items", headers=auth_headers, json={
+        "create": [{"title": "作られない"}], "delete": [own["id"], 10 ** 9],
+    })
+    forbidden = client.patch("/api/v1/home/items", headers=auth_headers, json={
+        "update": [{"id": foreign["id"], "title": "乗っ取り"}],
+    })
+
+    assert missing.status_code == 404
+    assert forbidden.status_code == 403
+    board = _board(client, auth_headers)
+    assert board.headers["X-Board-Version"] == "1"
+    assert [item["id"] for item in board.json()] == [own["id"]]
+
+def test_board_version_increases_by_one_per_write(client, auth_headers):
+    versions = [int(_board(client, auth_headers).headers["X-Board-Version"])]
+    item_id = _create_item(client, auth_headers).json()["id"]
+    versions.append(int(_board(client, auth_headers).headers["X-Board-Version"]))
+    client.put(f"/api/v1/home/items/{item_id}", headers=auth_headers, json={"title": "変更"})
+    versions.append(int(_board(client, auth_headers).headers["X-Board-Version"]))
+    client.patch("/api/v1/home/items", headers=auth_headers, json={"create": [{"title": "a"}] * 3})
+    versions.append(int(_board(client, auth_headers).headers["X-Board-Version"]))
+    client.delete(f"/api/v1/home/items/{item_id}", headers=auth_headers)
+    versions.append(int(_board(client, auth_headers).headers["X-Board-Version"]))
+
+    assert versions == [0, 1, 2, 3, 4]
+
+def test_since_returns_only_changes_and_deletion_tombstones(client, auth_headers):
+    a = _create_item(client, auth_headers, title="A").json()["id"]
+    b = _create_item(client, auth_headers, title="B").json()["id"]
+    c = _create_item(client, auth_headers, title="C").json()["id"]
+    version, _, _ = _changes(client, auth_headers, 0)
+
+    client.put(f"/api/v1/home/items/{a}", headers=auth_headers, json={"title": "A2"})
+    client.delete(f"/api/v1/home/items/{b}", headers=auth_headers)
+    d = _create_item(client, auth_headers, title="D").json()["id"]
+
+    assert _changes(client, auth_headers, version) == (version + 3, sorted([a, d]), [b])
+    # 最新のバージョンからの差分は空
+    assert _changes(client, auth_headers, version + 3) == (version + 3, [], [])
+    # 古いsinceでも、各アイテムの最後の変更（削除を含む）から差分が作られる
+    assert _changes(client, auth_headers, 1) == (version + 3, sorted([a, c, d]), [b])
+    assert _changes(client, auth_headers, 0) == (version + 3, sorted([a, c, d]), [])
+
+def test_since_ahead_of_board_returns_full_snapshot(client, auth_headers):
+    a = _create_item(client, auth_headers).json()["id"]
+    b = _create_item(client, auth_headers).json()["id"]
+
+    # 別の環境のバージョンなど、ボードより新しいsinceは差分を作れないため全件を返す
+    assert _changes(client, auth_headers, 100) == (2, sorted([a, b]), [])
+
+@pytest.mark.parametrize("dialect", [sqlite.dialect(), postgresql.dialect()])
+def test_board_version_bump_is_a_single_upsert(dialect):
+    statement = crud_home._bump_version_statement(dialect.name, owner_id=1)
+
+    sql = str(statement.compile(dialect=dialect))
+
+    assert "ON CONFLICT (user_id) DO UPDATE SET version = (home_boards.version + " in sql
+    assert "RETURNING" in sql
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    """
+    サイズを検証する前に負のサイズで登録されたアイテムを含むDB
+    """
+    engine = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(HomeItem.__table__.insert(), [
+            {"id": 1, "user_id": 1, "title": "正常", "position_x": 0, "position_y": 0,
+             "width": 100, "height": 50},
+            {"id": 2, "user_id": 1, "title": "負の幅", "position_x": 100, "position_y": 0,
+             "width": -40, "height": 50},
+            {"id": 3, "user_id": 1, "title": "負の高さ", "position_x": 0, "position_y": 100,
+             "width": 10, "height": -30},
+        ])
+    yield engine
+    engine.dispose()
+
+def _rows(engine, query):
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(text(query))]
+
+def test_spatial_index_startup_skips_invalid_items_without_changing_them(legacy_engine, caplog):
+    before = _rows(legacy_engine, "SELECT * FROM home_items ORDER BY id")
+
+    with caplog.at_level(logging.WARNING):
+        crud_home_spatial.create_index(legacy_engine)
+
+    assert _rows(legacy_engine, "SELECT * FROM home_items ORDER BY id") == before
+    assert _rows(legacy_engine, f"SELECT id FROM {crud_home_spatial.TABLE}") == [(1,)]
+    assert "2 home items with a negative size" in caplog.text
+
+def test_size_migration_fixes_and_indexes_invalid_items(legacy_engine):
+    crud_home_spatial.create_index(legacy_engine)
+
+    assert crud_home_spatial.normalize_sizes(legacy_engine) == 2
+
+    assert _rows(
+        legacy_engine, "SELECT id, position_x, position_y, width, height FROM home_items ORDER BY id"
+    ) == [(1, 0, 0, 100, 50), (2, 60, 0, 40, 50), (3, 0, 70, 10, 30)]
+    assert _rows(
+        legacy_engine, f"SELECT id, min_x, max_x, min_y, max_y FROM {crud_home_spatial.TABLE} ORDER BY id"
+    ) == [(1, 0, 100, 0, 50), (2, 60, 100, 0, 50), (3, 0, 10, 70, 100)]
+    assert crud_home_spatial.normalize_sizes(legacy_engine) == 0
+
+def test_item_etag_is_checked_after_existence_and_owner(client, auth_headers, other_auth_headers):
+    item = _create_item(client, auth_headers).json()
+    url = f"/api/v1/home/items/{item['id']}"
+    etag = client.get(url, headers=auth_headers).headers["ETag"]
+
+    assert client.get(url, headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={**other_auth_headers, "If-None-Match": "*"}).status_code == 403
+
+    client.put(url, headers=auth_headers, json={"title": "変更"})
+    response = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+
+    # 削除後も変更履歴にバージョンが残るが、どのETagを送っても304ではなく404を返す
+    assert client.delete(url, headers=auth_headers).status_code == 200
+    assert client.get(url, headers={**auth_headers, "If-None-Match": "*"}).status_code == 404
+    missing = f"/api/v1/home/items/{item['id'] + 1000000}"
+    assert client.get(missing, headers={**auth_headers, "If-None-Match": "*"}).status_code == 404
@@ -0,0 +1,92 @@
+from app.core.config import settings
+
+def _batch(client, headers, **operations):
+    return client.post("/api/v1/ideas/batch", headers=headers, json=operations)
+
+def _get(client, headers, idea_id):
+    return client.get(f"/api/v1/ideas/{idea_id}", headers=headers)
+
+def test_mixed_batch_applies_create_update_and_delete(client, auth_headers, create_idea):
+    renamed = create_idea("元のタイトル", "元の本文")
+    rewritten = create_idea("本文を変更", "元の本文")
+    removed = create_idea("削除", "削除する")
+    updated_then_removed = create_idea("更新して削除", "本文")
+    titles = [f"新規{i}" for i in range(20)]
+
+    response = _batch(
+        client, auth_headers,
+        create=[{"title": title, "content": f"{title}の本文"} for title in titles],
+        update=[
+            {"id": renamed, "title": "新しいタイトル"},
+            {"id": rewritten, "content": "新しい本文"},
+            {"id": updated_then_removed, "title": "更新済み"},
+        ],
+        delete=[removed, updated_then_removed],
+    )
+
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [(r["op"], r["index"], r["status"]) for r in results] == (
+        [("create", i, "created") for i in range(len(titles))]
+        + [("update", i, "updated") for i in range(3)]
+        + [("delete", i, "deleted") for i in range(2)]
+    )
+    # 採番されたIDが作成の順に対応している
+    created = results[:len(titles)]
+    for title, result in zip(titles, created):
+        assert result["idea"]["title"] == title
+        assert _get(client, auth_headers, result["id"]).json()["title"] == title
+    assert [r["id"] for r in created] == sorted(r["id"] for r in created)
+
+    idea = _get(client, auth_headers, renamed).json()
+    assert (idea["title"], idea["content"]) == ("新しいタイトル", "元の本文")
+    idea = _get(client, auth_headers, rewritten).json()
+    assert (idea["title"], idea["content"]) == ("本文を変更", "新しい本文")
+    assert results[len(titles) + 2]["idea"]["title"] == "更新済み"
+    assert _get(client, auth_headers, removed).status_code == 404
+    assert _get(client, auth_headers, updated_then_removed).status_code == 404
+
+def test_missing_and_foreign_ids_are_reported_per_item(
+    client, auth_headers, other_auth_headers, create_idea
+):
+    own = create_idea("自分の", "本文")
+    own_removed = create_idea("自分の削除", "本文")
+    foreign = client.post(
+        "/api/v1/ideas/", headers=other_auth_headers, json={"title": "他人の", "content": "本文"}
+    ).json()["id"]
+    missing = foreign + 1000000
+
+    response = _batch(
+        client, auth_headers,
+        update=[{"id": foreign, "title": "乗っ取り"}, {"id": own, "title": "更新"}, {"id": missing, "title": "x"}],
+        delete=[missing, foreign, own_removed],
+    )
+
+    assert response.status_code == 200, response.text
+    assert [(r["op"], r["id"], r["status"]) for r in response.json()["results"]] == [
+        ("update", foreign, "not_found"),
+        ("update", own, "updated"),
+        ("update", missing, "not_found"),
+        ("delete", missing, "not_found"),
+        ("delete", foreign, "not_found"),
+        ("delete", own_removed, "deleted"),
+    ]
+    assert response.json()["results"][0]["idea"] is None
+    assert _get(client, other_auth_headers, foreign).json()["title"] == "他人の"
+    assert _get(client, auth_headers, own).json()["title"] == "更新"
+    assert _get(client, auth_headers, own_removed).status_code == 404
+
+def test_too_many_operations_returns_413_without_changes(client, auth_headers, create_idea, monkeypatch):
+    monkeypatch.setattr(settings, "IDEA_BATCH_MAX_ITEMS", 3)
+    idea_id = create_idea()
+
+    response = _batch(
+        client, auth_headers,
+        create=[{"title": "a", "content": "b"}] * 2, update=[{"id": idea_id, "title": "c"}], delete=[idea_id],
+    )
+
+    assert response.status_code == 413
+    assert [idea["id"] for idea in client.get("/api/v1/ideas/", headers=auth_headers).json()] == [idea_id]
+    assert _batch(
+        client, auth_headers, create=[{"title": "a", "content": "b"}] * 2, delete=[idea_id]
+    ).status_code == 200
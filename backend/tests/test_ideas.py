@@ -0,0 +1,168 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, func, update
+
+from app.core.config import settings
+from app.core.database import SessionLocal, async_engine
+from app.crud import crud_idea
+from app.models import Bookmark, Comment, Idea, Requirement
+
+@contextmanager
+def _count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+def _add_children(idea_id: int, user_id: int, count: int) -> None:
+    db = SessionLocal()
+    try:
+        for i in range(count):
+            db.add(Requirement(idea_id=idea_id, content=f"要件定義書{i}", llm_model="openai"))
+            db.add(Comment(idea_id=idea_id, user_id=user_id, content=f"コメント{i}"))
+            db.add(Bookmark(idea_id=idea_id, user_id=user_id, position={"x": i, "y": i}, note=f"メモ{i}"))
+        db.commit()
+    finally:
+        db.close()
+
+def test_idea_details_use_constant_number_of_statements(client, auth_headers, create_idea):
+    user_id = client.get("/api/v1/users/me", headers=auth_headers).json()["id"]
+    small, large = create_idea("少ない", "子が1件"), create_idea("多い", "子が50件")
+    _add_children(small, user_id, 1)
+    _add_children(large, user_id, 50)
+    params = {"limit": 100}
+    # 認証済みユーザーのキャッシュ等を温めてから数える
+    client.get(f"/api/v1/ideas/{small}/details", headers=auth_headers, params=params)
+
+    counts = {}
+    for idea_id, children in ((small, 1), (large, 50)):
+        with _count_statements() as statements:
+            response = client.get(
+                f"/api/v1/ideas/{idea_id}/details", headers=auth_headers, params=params
+            )
+        assert response.status_code == 200
+        body = response.json()
+        for name in ("requirements", "comments", "bookmarks"):
+            assert len(body[name]) == children
+        counts[children] = len(statements)
+
+    assert counts[1] == counts[50], counts
+
+def _update_concurrently(monkeypatch, times: int):
+    """
+    最初のtimes回のaupdateの直前に、他のリクエストが同じアイデアを更新したことにする
+    """
+    aupdate = crud_idea.aupdate
+    calls = {"count": 0}
+
+    async def racing_aupdate(db, *, db_obj, obj_in):
+        calls["count"] += 1
+        if calls["count"] <= times:
+            other = SessionLocal()
+            try:
+                other.execute(
+                    update(Idea).where(Idea.id == db_obj.id).values(version=Idea.version + 1)
+                )
+                other.commit()
+            finally:
+                other.close()
+        return await aupdate(db, db_obj=db_obj, obj_in=obj_in)
+
+    monkeypatch.setattr(crud_idea, "aupdate", racing_aupdate)
+
+def test_concurrent_update_without_if_match_is_retried(
+    client, auth_headers, create_idea, monkeypatch
+):
+    idea_id = create_idea()
+    _update_concurrently(monkeypatch, times=1)
+
+    response = client.put(f"/api/v1/ideas/{idea_id}", headers=auth_headers, json={"title": "更新"})
+
+    assert response.status_code == 200
+    assert response.json()["title"] == "更新"
+
+def test_concurrent_update_conflicts(client, auth_headers, create_idea, monkeypatch):
+    idea_id = create_idea()
+    etag = client.get(f"/api/v1/ideas/{idea_id}", headers=auth_headers).headers["ETag"]
+    _update_concurrently(monkeypatch, times=3)
+
+    response = client.put(
+        f"/api/v1/ideas/{idea_id}",
+        headers={**auth_headers, "If-Match": etag},
+        json={"title": "更新"},
+    )
+    assert response.status_code == 412
+    response = client.put(f"/api/v1/ideas/{idea_id}", headers=auth_headers, json={"title": "更新"})
+    assert response.status_code == 409
+
+def _set_timestamps(timestamps):
+    # アプリと同じくCURRENT_TIMESTAMPの形式（秒単位の文字列）で保存する
+    def stored(value):
+        return None if value is None else func.datetime(value.isoformat(" "))
+
+    db = SessionLocal()
+    try:
+        for idea_id, (created_at, updated_at) in timestamps.items():
+            db.execute(
+                update(Idea).where(Idea.id == idea_id)
+                .values(created_at=stored(created_at), updated_at=stored(updated_at))
+            )
+        db.commit()
+    finally:
+        db.close()
+
+def _read_all_pages(client, headers, sort, limit):
+    ids, cursor = [], None
+    for _ in range(100):
+        params = {"sort": sort, "limit": limit}
+        if cursor is not None:
+            params["cursor"] = cursor
+        response = client.get("/api/v1/ideas/", headers=headers, params=params)
+        assert response.status_code == 200
+        ids += [idea["id"] for idea in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+    raise AssertionError(f"pagination did not finish: {ids[:20]}")
+
+@pytest.mark.parametrize("sort", ["created_desc", "created_asc", "updated_desc", "updated_asc"])
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_cursor_pages_with_tied_sort_keys_neither_skip_nor_repeat(
+    client, auth_headers, create_idea, sort, limit
+):
+    ids = [create_idea(f"同時刻{i}", f"同時刻のアイデア{i}") for i in range(7)]
+    first, second = datetime(2024, 1, 1, 12), datetime(2024, 1, 2, 12)
+    # 作成日時は3件・4件が同じ値、更新日時は未設定（作成日時で並ぶ）と設定済みが混在する
+    timestamps = {
+        id: (first if i < 3 else second, None if i % 2 else second)
+        for i, id in enumerate(ids)
+    }
+    _set_timestamps(timestamps)
+
+    pages = _read_all_pages(client, auth_headers, sort, limit)
+
+    def key(id):
+        created_at, updated_at = timestamps[id]
+        return (updated_at or created_at if sort.startswith("updated") else created_at, id)
+
+    assert pages == sorted(ids, key=key, reverse=sort.endswith("desc"))
+
+def test_summary_view_omits_content(client, auth_headers, create_idea):
+    content = "要約表示のテスト。" * 100
+    idea_id = create_idea("要約", content)
+
+    response = client.get("/api/v1/ideas/", headers=auth_headers, params={"view": "summary"})
+
+    assert response.status_code == 200
+    [summary] = [idea for idea in response.json() if idea["id"] == idea_id]
+    assert set(summary) == {"id", "title", "snippet", "owner_id", "created_at", "updated_at"}
+    assert content.startswith(summary["snippet"])
+    assert len(summary["snippet"]) == settings.IDEA_SNIPPET_LENGTH
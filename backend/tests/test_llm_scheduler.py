@@ -0,0 +1,183 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from app.core.config import settings
+from app.services import llm_providers, llm_scheduler
+from app.services.llm_scheduler import (
+    ProviderRateLimitError, ProviderScheduler, TokenBucket, parse_retry_after
+)
+
+class _FakeRateLimit(Exception):
+    """
+    SDKのレート制限エラーを模した例外（レスポンスヘッダーを持つ）
+    """
+    def __init__(self, headers):
+        super().__init__("429 Too Many Requests")
+        self.headers = headers
+
+class _FakeProvider(llm_providers.LLMProvider):
+    """
+    最初のrate_limited回は429を返し、それ以降はdelay秒後に応答するプロバイダー
+    """
+    name = "fake"
+    label = "Fake"
+
+    def __init__(self, *, rate_limited=0, retry_after=None, delay=0.0, timeout=5.0,
+                 max_concurrency=4, requests_per_minute=None, tokens_per_minute=None):
+        super().__init__(timeout)
+        # 共有のスケジューラーは使わず、テストごとに作り直す
+        llm_scheduler._schedulers.pop(self.name, None)
+        self.scheduler = ProviderScheduler(
+            self.name, max_concurrency=max_concurrency,
+            requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute,
+        )
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+        self.delay = delay
+        self.attempts = 0
+        self.running = 0
+        self.peak = 0
+
+    def is_configured(self):
+        return True
+
+    def _rate_limit_error(self, error):
+        if isinstance(error, _FakeRateLimit):
+            return ProviderRateLimitError(self.name, parse_retry_after(error.headers))
+        return None
+
+    def _estimate_tokens(self, prompt, system, max_tokens):
+        return 1
+
+    async def _complete(self, prompt, *, system, max_tokens):
+        self.attempts += 1
+        if self.attempts <= self.rate_limited:
+            headers = {} if self.retry_after is None else {"retry-after": self.retry_after}
+            raise _FakeRateLimit(headers)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        return "ok"
+
+def _timed(coro):
+    started = time.monotonic()
+    result = asyncio.run(coro)
+    return result, time.monotonic() - started
+
+def test_429_is_retried_after_retry_after_seconds():
+    provider = _FakeProvider(rate_limited=2, retry_after="0.2")
+
+    result, elapsed = _timed(provider.complete("prompt"))
+
+    assert result == "ok"
+    assert provider.attempts == 3
+    assert provider.scheduler.retries == 2
+    assert provider.scheduler.rate_limited == 2
+    assert elapsed >= 0.4
+
+def test_429_without_retry_after_uses_exponential_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BACKOFF_BASE_SECONDS", 0.01)
+    delays = []
+    monkeypatch.setattr(llm_scheduler.random, "uniform", lambda low, high: delays.append(high) or 0)
+    provider = _FakeProvider(rate_limited=3)
+
+    result, _ = _timed(provider.complete("prompt"))
+
+    assert result == "ok"
+    assert delays == [0.01, 0.02, 0.04]
+
+def test_429_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 2)
+    provider = _FakeProvider(rate_limited=10, retry_after="0")
+
+    with pytest.raises(ProviderRateLimitError) as error:
+        asyncio.run(provider.complete("prompt"))
+
+    assert error.value.retry_after == 0
+    assert provider.attempts == 3
+    assert provider.scheduler.retries == 2
+
+def test_429_before_first_chunk_is_retried_for_streams():
+    class _StreamingProvider(_FakeProvider):
+        async def _stream(self, prompt, *, system, max_tokens):
+            yield await self._complete(prompt, system=system, max_tokens=max_tokens)
+
+    provider = _StreamingProvider(rate_limited=1, retry_after="0")
+
+    async def collect():
+        return [chunk async for chunk in provider.stream("prompt")]
+
+    assert asyncio.run(collect()) == ["ok"]
+    assert provider.attempts == 2
+
+@pytest.mark.parametrize("value, expected", [
+    ("3", 3.0),
+    ("-1", 0.0),
+    ("soon", None),
+])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after({"retry-after": value}) == expected
+
+def test_parse_retry_after_http_date_and_cap():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=120)
+    seconds = parse_retry_after({"Retry-After": format_datetime(retry_at, usegmt=True)})
+    assert 115 <= seconds <= 120
+
+    scheduler = ProviderScheduler("fake", max_concurrency=1)
+    assert scheduler.backoff_delay(0, seconds) == settings.LLM_BACKOFF_MAX_SECONDS
+
+def test_slow_responses_are_limited_to_max_concurrency():
+    provider = _FakeProvider(delay=0.1, max_concurrency=2)
+
+    async def run_many():
+        return await asyncio.gather(*(provider.complete(f"prompt{i}") for i in range(6)))
+
+    results, elapsed = _timed(run_many())
+
+    assert results == ["ok"] * 6
+    assert provider.peak == 2
+    # 2件ずつ3回に分けて実行される
+    assert 0.3 <= elapsed < 0.6
+
+def test_slow_response_times_out_without_retry():
+    provider = _FakeProvider(delay=1.0, timeout=0.1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(provider.complete("prompt"))
+
+    assert provider.attempts == 1
+    assert provider.scheduler.retries == 0
+
+def test_token_bucket_waits_for_refill():
+    # 1秒あたり20トークン補充される
+    bucket = TokenBucket(per_minute=1200)
+
+    async def drain_then_acquire():
+        await bucket.acquire(1200)
+        started = time.monotonic()
+        await bucket.acquire(4)
+        return time.monotonic() - started
+
+    waited = asyncio.run(drain_then_acquire())
+
+    assert 0.15 <= waited < 0.5
+
+def test_requests_per_minute_throttles_calls():
+    # 1秒あたり10リクエストまで（最初のバケット分は即座に使える）
+    provider = _FakeProvider(requests_per_minute=600)
+    provider.scheduler._requests.tokens = 1
+
+    async def run_many():
+        return await asyncio.gather(*(provider.complete(f"prompt{i}") for i in range(4)))
+
+    _, elapsed = _timed(run_many())
+
+    assert provider.attempts == 4
+    assert 0.25 <= elapsed < 0.6
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from app.services import llm_providers, llm_service
+from app.services.tokenizer import count_tokens
+
+class _FakeProvider:
+    """
+    指定された最大トークン数ちょうどの要約を返すプロバイダー
+    """
+    name = "openai"
+
+    def __init__(self):
+        self.calls = []
+
+    async def complete(self, prompt, *, system=llm_providers.SYSTEM_PROMPT, max_tokens=2000):
+        self.calls.append(count_tokens(system) + count_tokens(prompt) + max_tokens)
+        return "要" * max_tokens
+
+@pytest.mark.parametrize("paragraphs", [10, 40, 140, 540])
+def test_long_input_digest_fits_provider_context(paragraphs):
+    title = "長文のアイデア"
+    content = ("これは長いアイデアの本文です。" * 50 + "\n\n") * paragraphs
+    assert llm_service.is_long_input(title, content, "openai")
+    provider = _FakeProvider()
+
+    digest = asyncio.run(llm_service.summarize_chunks(title, content, provider))
+
+    context = llm_service.settings.LLM_CONTEXT_TOKENS["openai"]
+    final = (
+        count_tokens(llm_providers.SYSTEM_PROMPT)
+        + count_tokens(llm_service.build_prompt(title, digest))
+        + llm_service.REQUIREMENT_MAX_TOKENS
+    )
+    assert final <= context
+    assert max(provider.calls) <= context
@@ -0,0 +1,11 @@
+from app.core.config import settings
+
+def test_metrics_requires_allowed_user(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ALLOWED_USERS", [])
+    assert client.get("/api/v1/metrics/", headers=auth_headers).status_code == 403
+
+    username = client.get("/api/v1/users/me", headers=auth_headers).json()["username"]
+    monkeypatch.setattr(settings, "METRICS_ALLOWED_USERS", [username])
+    response = client.get("/api/v1/metrics/", headers=auth_headers)
+    assert response.status_code == 200
+    assert "requirement_cache" in response.json()
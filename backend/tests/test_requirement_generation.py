@@ -0,0 +1,223 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.core import etag as etags
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.crud import crud_requirement
+from app.services import llm_providers
+
+# OpenAI互換のスタブサーバーの応答までの時間（秒）
+STUB_DELAY_SECONDS = 0.5
+
+class _StubHandler(BaseHTTPRequestHandler):
+    delay = STUB_DELAY_SECONDS
+    requests = 0
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with _StubHandler._lock:
+            _StubHandler.requests += 1
+        time.sleep(self.delay)
+        body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-4",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "# 要件定義書\nスタブの応答"},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode("utf-8")
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # タイムアウトでクライアントが切断した場合
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def openai_stub(monkeypatch):
+    """
+    OpenAIのAPIをスレッドで動かすスタブサーバーに向ける
+    """
+    _StubHandler.requests = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    # プロバイダーは設定を読んで初回に生成されるため、スタブ用に作り直させる
+    monkeypatch.setattr(llm_providers, "_providers", {})
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _generate(client, headers, idea_id, force_refresh=False):
+    return client.post(
+        "/api/v1/requirements/generate",
+        headers=headers,
+        json={"idea_id": idea_id, "llm_model": "openai", "force_refresh": force_refresh},
+    )
+
+def test_concurrent_generations_finish_in_about_one_call(client, auth_headers, create_idea, openai_stub):
+    concurrency = settings.LLM_MAX_CONCURRENCY["openai"]
+    # 内容が異なるアイデアにして、キャッシュ・同一リクエストのまとめ込みの対象外にする
+    idea_ids = [create_idea(f"アイデア{i}", f"並行生成のテスト{i}") for i in range(concurrency)]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        started = time.monotonic()
+        responses = list(executor.map(lambda id: _generate(client, auth_headers, id), idea_ids))
+        elapsed = time.monotonic() - started
+
+    assert [r.status_code for r in responses] == [200] * concurrency
+    assert sorted(r.json()["idea_id"] for r in responses) == sorted(idea_ids)
+    # 逐次に処理されるとconcurrency倍かかる
+    assert elapsed < STUB_DELAY_SECONDS * 2
+
+def test_force_refresh_is_not_coalesced_with_running_generation(
+    client, auth_headers, create_idea, openai_stub
+):
+    idea_id = create_idea("再生成", "再生成のテスト")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        normal = executor.submit(_generate, client, auth_headers, idea_id)
+        time.sleep(STUB_DELAY_SECONDS / 5)
+        forced = executor.submit(_generate, client, auth_headers, idea_id, True)
+        responses = [normal.result(), forced.result()]
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[0].json()["id"] != responses[1].json()["id"]
+    assert _StubHandler.requests == 2
+
+def test_sdk_timeout_returns_504(client, auth_headers, create_idea, openai_stub, monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_TIMEOUT_SECONDS", STUB_DELAY_SECONDS / 5)
+    # SDKのクライアントのタイムアウトがasyncio.wait_forより先に発生する場合
+    llm_providers.get_provider("openai").timeout = STUB_DELAY_SECONDS * 10
+    idea_id = create_idea("タイムアウト", "タイムアウトのテスト")
+
+    response = _generate(client, auth_headers, idea_id)
+
+    assert response.status_code == 504
+
+def test_job_long_poll_returns_when_job_finishes(client, auth_headers, create_idea, openai_stub):
+    idea_id = create_idea("ジョブ", "ジョブのテスト")
+    response = client.post(
+        "/api/v1/requirements/jobs",
+        headers=auth_headers,
+        json={"idea_id": idea_id, "llm_model": "openai"},
+    )
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    started = time.monotonic()
+    status = response.json()["status"]
+    while status not in ("succeeded", "failed") and time.monotonic() - started < 10:
+        job = client.get(
+            f"/api/v1/requirements/jobs/{job_id}", headers=auth_headers, params={"wait": 10}
+        ).json()
+        status = job["status"]
+
+    assert status == "succeeded"
+    assert job["requirement"]["idea_id"] == idea_id
+    # 状態の変化が通知され、wait秒を待たずに返る
+    assert time.monotonic() - started < STUB_DELAY_SECONDS * 4
+
+@pytest.mark.parametrize(
+    "path", ["/api/v1/requirements/generate", "/api/v1/requirements/generate/stream"]
+)
+@pytest.mark.parametrize("llm_model", ["openai", "auto"])
+def test_unconfigured_provider_returns_503(
+    client, auth_headers, create_idea, monkeypatch, path, llm_model
+):
+    for name in ("OPENAI_API_KEY", "GOOGLE_API_KEY", "CLAUDE_API_KEY"):
+        monkeypatch.setattr(settings, name, None)
+    monkeypatch.setattr(llm_providers, "_providers", {})
+    idea_id = create_idea("未設定", f"プロバイダー未設定のテスト{path}{llm_model}")
+
+    response = client.post(
+        path, headers=auth_headers, json={"idea_id": idea_id, "llm_model": llm_model}
+    )
+
+    assert response.status_code == 503
+
+def test_jobs_without_a_configured_limit_are_still_bounded(
+    client, auth_headers, create_idea, monkeypatch
+):
+    from app.core.database import SessionLocal
+    from app.crud import crud_job
+    from app.services import job_queue, requirement_generation
+
+    user_id = client.get("/api/v1/users/me", headers=auth_headers).json()["id"]
+    idea_id = create_idea("自動", "autoのジョブの並行数のテスト")
+    db = SessionLocal()
+    try:
+        job_ids = [
+            crud_job.create(db=db, user_id=user_id, idea_id=idea_id, llm_model="auto").id
+            for _ in range(4)
+        ]
+    finally:
+        db.close()
+
+    running = peak = 0
+
+    async def fake_generate(**kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return None
+
+    monkeypatch.setattr(requirement_generation, "generate", fake_generate)
+
+    async def run_jobs():
+        # "auto"の上限を設定していない場合も、無制限に並行実行しない
+        queue = job_queue.JobQueue(
+            workers=4, provider_concurrency={"openai": 1, "google": 1, "claude": 1}
+        )
+        await queue.start()
+        for job_id in job_ids:
+            queue.submit(job_id)
+        await queue._queue.join()
+        await queue.stop()
+
+    client.portal.call(run_jobs)
+
+    assert peak == 1
+
+def test_requirement_etag_follows_content(client, auth_headers, create_idea):
+    db = SessionLocal()
+    try:
+        requirement = crud_requirement.create(
+            db, idea_id=create_idea(), content="# 要件定義書", llm_model="openai"
+        )
+        url = f"/api/v1/requirements/{requirement.id}"
+        response = client.get(url, headers=auth_headers)
+        etag = response.headers["ETag"]
+        assert etag == etags.make_etag("requirement", requirement.content_hash)
+        assert client.get(url, headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+
+        other = crud_requirement.create(
+            db, idea_id=create_idea(), content="# 要件定義書\n追記", llm_model="openai"
+        )
+        response = client.get(
+            f"/api/v1/requirements/{other.id}", headers={**auth_headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 200 and response.headers["ETag"] != etag
+    finally:
+        db.close()
@@ -0,0 +1,103 @@
+import pytest
+
+from app.core import response_cache
+from app.core.config import settings
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache_backend(request, monkeypatch, tmp_path):
+    """
+    テストごとに空のレスポンスキャッシュを使う（既定のmemoryと、ワーカー間で共有するsqlite）
+    """
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_BACKEND", request.param)
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_PATH", str(tmp_path / "response_cache.db"))
+    monkeypatch.setattr(response_cache, "_backend", None)
+    monkeypatch.setattr(response_cache, "_versions", None)
+    return request.param
+
+def _get(client, headers, url, **kwargs):
+    """
+    レスポンスと、そのリクエストがキャッシュから返されたかどうかを返す
+    """
+    hits = response_cache.stats()["hits"]
+    response = client.get(url, headers=headers, **kwargs)
+    assert response.status_code in (200, 304, 403), response.text
+    return response, response_cache.stats()["hits"] > hits
+
+def _version(client, headers):
+    user_id = client.get("/api/v1/users/me", headers=headers).json()["id"]
+    return response_cache._get_backend()[1].get(user_id)
+
+def test_cached_responses_are_never_served_to_another_user(
+    client, auth_headers, other_auth_headers, cache_backend
+):
+    # 同じ回数だけ変更し、キーがユーザーのデータのバージョンまで一致する状態にする
+    idea_ids = []
+    for headers, prefix in [(auth_headers, "非公開の"), (other_auth_headers, "別のユーザーの")]:
+        response = client.post(
+            "/api/v1/ideas/", headers=headers, json={"title": f"{prefix}案", "content": "内容"}
+        )
+        idea_ids.append(response.json()["id"])
+        assert client.post(
+            "/api/v1/home/items", headers=headers, json={"title": f"{prefix}付箋"}
+        ).status_code == 200
+    assert _version(client, auth_headers) == _version(client, other_auth_headers)
+
+    for url in ["/api/v1/ideas/", "/api/v1/ideas/?view=summary", "/api/v1/home/items",
+                f"/api/v1/ideas/{idea_ids[0]}"]:
+        own, _ = _get(client, auth_headers, url)
+        again, hit = _get(client, auth_headers, url)
+        assert hit and again.content == own.content
+
+        # 同じルート・パラメーターでも、別のユーザーにはキャッシュを返さない（ETagを送っても304にならない）
+        other, hit = _get(client, {**other_auth_headers, "If-None-Match": own.headers["ETag"]}, url)
+        assert not hit
+        assert other.status_code in (200, 403)
+        assert other.content != own.content
+        assert "非公開" not in other.text
+
+def test_write_bumps_version_and_invalidates_cached_list(
+    client, auth_headers, other_auth_headers, cache_backend
+):
+    def ideas():
+        response, hit = _get(client, auth_headers, "/api/v1/ideas/")
+        return [idea["title"] for idea in response.json()], hit
+
+    assert ideas() == ([], False)
+    assert ideas() == ([], True)
+
+    version = _version(client, auth_headers)
+    idea = client.post(
+        "/api/v1/ideas/", headers=auth_headers, json={"title": "作成", "content": "内容"}
+    ).json()
+    assert _version(client, auth_headers) == version + 1
+    assert ideas() == (["作成"], False)
+
+    client.put(f"/api/v1/ideas/{idea['id']}", headers=auth_headers, json={"title": "更新"})
+    assert _version(client, auth_headers) == version + 2
+    assert ideas() == (["更新"], False)
+
+    # 他のユーザーの変更では無効にならない
+    client.post("/api/v1/ideas/", headers=other_auth_headers, json={"title": "他人", "content": "内容"})
+    assert _version(client, auth_headers) == version + 2
+    assert ideas() == (["更新"], True)
+
+    client.delete(f"/api/v1/ideas/{idea['id']}", headers=auth_headers)
+    assert _version(client, auth_headers) == version + 3
+    assert ideas() == ([], False)
+
+def test_home_item_writes_invalidate_cached_board(client, auth_headers, cache_backend):
+    def items():
+        response, hit = _get(client, auth_headers, "/api/v1/home/items")
+        return [item["title"] for item in response.json()], hit
+
+    assert items() == ([], False)
+    assert items() == ([], True)
+
+    item = client.post("/api/v1/home/items", headers=auth_headers, json={"title": "作成"}).json()
+    assert items() == (["作成"], False)
+
+    client.put(f"/api/v1/home/items/{item['id']}", headers=auth_headers, json={"title": "更新"})
+    assert items() == (["更新"], False)
+
+    client.patch("/api/v1/home/items", headers=auth_headers, json={"delete": [item["id"]]})
+    assert items() == ([], False)
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from app.core.database import SessionLocal
+from app.crud import crud_requirement
+
+def _search(client, headers, q):
+    response = client.get("/api/v1/ideas/search", headers=headers, params={"q": q})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def _idea_ids(results, kind="idea"):
+    return {result["idea_id"] for result in results if result["kind"] == kind}
+
+@pytest.mark.parametrize("q", ["会計サービス", "会計", "クラウド 月次"])
+def test_search_matches_ideas(client, auth_headers, create_idea, q):
+    idea_id = create_idea("クラウド会計", "中小企業向けのクラウド会計サービス。月次の締めを自動化する。")
+    other_id = create_idea("家庭菜園", "家庭菜園の成長記録アプリ")
+
+    results = _search(client, auth_headers, q)
+
+    assert _idea_ids(results) == {idea_id}
+    assert other_id not in _idea_ids(results)
+    [result] = results
+    assert result["title"] == "クラウド会計"
+    assert "**" in result["snippet"]
+
+def test_search_ranks_title_matches_first(client, auth_headers, create_idea):
+    in_body = create_idea("記録アプリ", "旅行の計画を立てるための記録アプリ")
+    in_title = create_idea("旅行の計画", "行き先と予算をまとめる")
+
+    results = _search(client, auth_headers, "旅行の計画")
+
+    assert [result["idea_id"] for result in results] == [in_title, in_body]
+
+def test_search_is_scoped_to_owner(client, auth_headers, other_auth_headers, create_idea):
+    idea_id = create_idea("共有しない", "他のユーザーには見えない検索対象の本文")
+
+    assert _idea_ids(_search(client, auth_headers, "検索対象")) == {idea_id}
+    assert _search(client, other_auth_headers, "検索対象") == []
+
+def test_index_follows_update_and_delete(client, auth_headers, create_idea):
+    idea_id = create_idea("更新前", "古い説明文")
+    assert _idea_ids(_search(client, auth_headers, "古い説明")) == {idea_id}
+
+    response = client.put(
+        f"/api/v1/ideas/{idea_id}", headers=auth_headers, json={"content": "新しい説明文"}
+    )
+    assert response.status_code == 200
+    assert _search(client, auth_headers, "古い説明") == []
+    assert _idea_ids(_search(client, auth_headers, "新しい説明")) == {idea_id}
+
+    assert client.delete(f"/api/v1/ideas/{idea_id}", headers=auth_headers).status_code == 200
+    assert _search(client, auth_headers, "新しい説明") == []
+
+def test_requirements_are_indexed_and_removed_with_idea(client, auth_headers, create_idea):
+    idea_id = create_idea("要件あり", "要件定義書を持つアイデア")
+    db = SessionLocal()
+    try:
+        requirement = crud_requirement.create(
+            db, idea_id=idea_id, content="# 要件定義書\n認証基盤の要件", llm_model="openai"
+        )
+    finally:
+        db.close()
+
+    [result] = _search(client, auth_headers, "認証基盤")
+    assert result["kind"] == "requirement"
+    assert result["requirement_id"] == requirement.id
+    assert result["title"] == "要件あり"
+
+    assert client.delete(f"/api/v1/ideas/{idea_id}", headers=auth_headers).status_code == 200
+    assert _search(client, auth_headers, "認証基盤") == []
+
+def test_imported_ideas_and_requirements_are_indexed(client, auth_headers):
+    lines = [
+        {"title": "取り込み1", "content": "取り込んだ在庫管理の案", "requirements": [
+            {"content": "在庫引当の要件", "llm_model": "claude"},
+        ]},
+        {"title": "取り込み2", "content": "取り込んだ勤怠管理の案"},
+    ]
+    body = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+    response = client.post(
+        "/api/v1/ideas/import", headers=auth_headers, content=body.encode("utf-8")
+    )
+    assert response.status_code == 200, response.text
+
+    assert [r["title"] for r in _search(client, auth_headers, "在庫管理")] == ["取り込み1"]
+    assert [r["kind"] for r in _search(client, auth_headers, "在庫引当")] == ["requirement"]
+    assert len(_search(client, auth_headers, "取り込んだ")) == 2
+
+def test_batch_changes_are_indexed(client, auth_headers, create_idea):
+    updated_id = create_idea("一括更新", "一括で変更する前の本文")
+    deleted_id = create_idea("一括削除", "一括で削除される本文")
+
+    response = client.post("/api/v1/ideas/batch", headers=auth_headers, json={
+        "create": [{"title": "一括作成", "content": "一括で作成された本文"}],
+        "update": [{"id": updated_id, "content": "一括で変更した後の本文"}],
+        "delete": [deleted_id],
+    })
+    assert response.status_code == 200, response.text
+    created_id = response.json()["results"][0]["id"]
+
+    assert _idea_ids(_search(client, auth_headers, "作成された")) == {created_id}
+    assert _search(client, auth_headers, "変更する前") == []
+    assert _idea_ids(_search(client, auth_headers, "変更した後")) == {updated_id}
+    assert _search(client, auth_headers, "削除される") == []
@@ -0,0 +1,48 @@
+from passlib.context import CryptContext
+
+from app.core import security
+from app.core.database import SessionLocal
+from app.crud import crud_user
+
+def _stored_hash(username):
+    db = SessionLocal()
+    try:
+        return crud_user.get_by_username(db, username=username).hashed_password
+    finally:
+        db.close()
+
+def _set_hash(username, hashed_password):
+    db = SessionLocal()
+    try:
+        user = crud_user.get_by_username(db, username=username)
+        user.hashed_password = hashed_password
+        db.commit()
+    finally:
+        db.close()
+
+def _login(client, username, password):
+    return client.post("/api/v1/auth/login", data={"username": username, "password": password})
+
+def test_outdated_cost_is_rehashed_on_login(client, auth_headers):
+    username = client.get("/api/v1/users/me", headers=auth_headers).json()["username"]
+    # 以前のコスト設定でハッシュしたパスワードに置き換える
+    outdated = CryptContext(schemes=["bcrypt"], bcrypt__rounds=security.settings.BCRYPT_ROUNDS + 1)
+    _set_hash(username, outdated.hash("password123"))
+
+    # 誤ったパスワードでは再ハッシュしない
+    assert _login(client, username, "wrong-password").status_code == 401
+    assert security.pwd_context.needs_update(_stored_hash(username))
+
+    assert _login(client, username, "password123").status_code == 200
+    rehashed = _stored_hash(username)
+    assert not security.pwd_context.needs_update(rehashed)
+    assert security.verify_password("password123", rehashed)
+    assert _login(client, username, "password123").status_code == 200
+
+def test_current_cost_is_not_rehashed(client, auth_headers):
+    username = client.get("/api/v1/users/me", headers=auth_headers).json()["username"]
+    before = _stored_hash(username)
+
+    assert _login(client, username, "password123").status_code == 200
+
+    assert _stored_hash(username) == before
@@ -0,0 +1,116 @@
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+from app import models
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.schemas import HomeBoardChanges, HomeItem, Idea, IdeaSummary
+
+# 一覧APIは行の値からorjsonで直接JSONを作るため、レスポンスモデルでシリアライズした場合と同じ本文になることを確認する
+TEXTS = [
+    ("引用符\"とバックスラッシュ\\", "改行\nタブ\t制御文字\u0001"),
+    ("絵文字😀と結合文字が゙", "😀" * (settings.IDEA_SNIPPET_LENGTH + 5)),
+    ("<script>&amp;</script>", "HTMLの特殊文字 < > & ' \""),
+    ("空白のみ", " "),
+]
+
+ITEMS = [
+    {"title": "既定値"},
+    {"title": "小数", "position_x": 0.1, "position_y": -1e-7, "width": 123.456, "height": 1e21,
+     "content": "本文", "link": "https://example.com/?q=\"検索\"",
+     "style": {"fontSize": 12, "nested": {"list": [1, 2.5, None, True, "日本語"]}, "空": {}}},
+    {"title": "整数", "position_x": -300, "position_y": 40, "width": 0, "height": 0, "color": "#000"},
+]
+
+def _dump(schema, value) -> bytes:
+    adapter = TypeAdapter(schema)
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+def _ideas_in_response_order(response) -> List[models.Idea]:
+    db = SessionLocal()
+    try:
+        return [db.get(models.Idea, idea["id"]) for idea in response.json()]
+    finally:
+        db.close()
+
+def _items(ids) -> List[models.HomeItem]:
+    db = SessionLocal()
+    try:
+        return [db.get(models.HomeItem, id) for id in ids]
+    finally:
+        db.close()
+
+@pytest.fixture
+def ideas(client, auth_headers):
+    ids = []
+    for title, content in TEXTS:
+        response = client.post("/api/v1/ideas/", headers=auth_headers, json={"title": title, "content": content})
+        assert response.status_code == 200, response.text
+        ids.append(response.json()["id"])
+    # updated_atがある行とない行の両方を含める
+    client.put(f"/api/v1/ideas/{ids[0]}", headers=auth_headers, json={"title": TEXTS[0][0] + "（更新）"})
+    return ids
+
+@pytest.fixture
+def items(client, auth_headers):
+    ids = []
+    for fields in ITEMS:
+        response = client.post("/api/v1/home/items", headers=auth_headers, json=fields)
+        assert response.status_code == 200, response.text
+        ids.append(response.json()["id"])
+    return ids
+
+@pytest.mark.parametrize("sort", ["created_desc", "updated_asc"])
+def test_idea_list_matches_response_model(client, auth_headers, ideas, sort):
+    response = client.get("/api/v1/ideas/", headers=auth_headers, params={"sort": sort})
+    assert response.status_code == 200, response.text
+    expected = _ideas_in_response_order(response)
+    assert sorted(idea.id for idea in expected) == sorted(ideas)
+
+    assert response.content == _dump(List[Idea], expected)
+
+def test_idea_summary_matches_response_model(client, auth_headers, ideas):
+    response = client.get("/api/v1/ideas/", headers=auth_headers, params={"view": "summary"})
+    assert response.status_code == 200, response.text
+    expected = [
+        IdeaSummary(
+            id=idea.id, title=idea.title, snippet=idea.content[:settings.IDEA_SNIPPET_LENGTH],
+            owner_id=idea.owner_id, created_at=idea.created_at, updated_at=idea.updated_at,
+        )
+        for idea in _ideas_in_response_order(response)
+    ]
+
+    assert response.content == _dump(List[IdeaSummary], expected)
+
+def test_home_items_match_response_model(client, auth_headers, items):
+    response = client.get("/api/v1/home/items", headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert sorted(item["id"] for item in response.json()) == sorted(items)
+
+    expected = _items(item["id"] for item in response.json())
+    assert response.content == _dump(List[HomeItem], expected)
+
+def test_home_viewport_matches_response_model(client, auth_headers, items):
+    response = client.get("/api/v1/home/items", headers=auth_headers, params={"viewport": "-1000,-1000,1000,1000"})
+    assert response.status_code == 200, response.text
+    assert response.json()
+
+    expected = _items(item["id"] for item in response.json())
+    assert response.content == _dump(List[HomeItem], expected)
+
+@pytest.mark.parametrize("since", [0, 1])
+def test_home_changes_match_response_model(client, auth_headers, items, since):
+    client.delete(f"/api/v1/home/items/{items[0]}", headers=auth_headers)
+    response = client.get("/api/v1/home/items", headers=auth_headers, params={"since": since})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["items"]
+
+    expected = {
+        "version": body["version"],
+        "items": _items(item["id"] for item in body["items"]),
+        "deleted": body["deleted"],
+    }
+    assert response.content == _dump(HomeBoardChanges, expected)
@@ -0,0 +1,98 @@
+import pytest
+
+from app.core.config import settings
+from app.services import similarity
+
+HOUSEHOLD = ("家計簿アプリ", "レシートを撮影して支出を自動で記録し、月ごとの家計簿を作る")
+HOUSEHOLD_DUPLICATE = ("家計簿アプリ", "レシートを撮影して支出を自動で記録し、月ごとに家計簿を作成する")
+GARDEN = ("家庭菜園の記録", "野菜の水やりと収穫の記録を写真付きで残すサービス")
+
+def _create(client, headers, title, content):
+    response = client.post("/api/v1/ideas/", headers=headers, json={"title": title, "content": content})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def _similar(client, headers, idea_id):
+    response = client.get(f"/api/v1/ideas/{idea_id}/similar", headers=headers)
+    assert response.status_code == 200, response.text
+    return {idea["id"]: idea["score"] for idea in response.json()}
+
+def _indexed_ids(owner_id, title, content):
+    """
+    インデックス上の候補（APIはDBにないIDを除くため、インデックスから直接確認する）
+    """
+    return {id for id, _ in similarity.find_similar(owner_id, title, content, limit=100)}
+
+def test_near_duplicate_is_reported_on_create(client, auth_headers):
+    original = _create(client, auth_headers, *HOUSEHOLD)
+    garden = _create(client, auth_headers, *GARDEN)
+    assert garden["similar_ideas"] == []
+
+    duplicate = _create(client, auth_headers, *HOUSEHOLD_DUPLICATE)
+
+    [warning] = duplicate["similar_ideas"]
+    assert warning["id"] == original["id"]
+    assert warning["title"] == HOUSEHOLD[0]
+    assert warning["score"] >= settings.SIMILARITY_WARNING_THRESHOLD
+
+def test_identical_text_scores_one_and_ranks_first(client, auth_headers):
+    original = _create(client, auth_headers, *HOUSEHOLD)
+    near = _create(client, auth_headers, *HOUSEHOLD_DUPLICATE)
+    garden = _create(client, auth_headers, *GARDEN)
+
+    identical = _create(client, auth_headers, *HOUSEHOLD)
+
+    scores = _similar(client, auth_headers, identical["id"])
+    assert scores[original["id"]] == pytest.approx(1.0, abs=1e-5)
+    assert scores[original["id"]] > scores[near["id"]] > scores.get(garden["id"], 0.0)
+
+@pytest.mark.parametrize("threshold, expected", [(1.01, False), (0.0, True)])
+def test_warning_threshold(client, auth_headers, monkeypatch, threshold, expected):
+    monkeypatch.setattr(settings, "SIMILARITY_WARNING_THRESHOLD", threshold)
+    original = _create(client, auth_headers, *HOUSEHOLD)
+
+    duplicate = _create(client, auth_headers, *HOUSEHOLD)
+
+    assert ([idea["id"] for idea in duplicate["similar_ideas"]] == [original["id"]]) is expected
+
+def test_similar_ideas_are_scoped_to_owner(client, auth_headers, other_auth_headers):
+    _create(client, other_auth_headers, *HOUSEHOLD)
+
+    assert _create(client, auth_headers, *HOUSEHOLD)["similar_ideas"] == []
+
+def test_index_follows_batch_create_update_and_delete(client, auth_headers):
+    # 作成時に既存のインデックスができるため、以降はバッチの差分更新だけが反映される
+    anchor = _create(client, auth_headers, *HOUSEHOLD)
+    owner_id = anchor["owner_id"]
+    assert similarity.has_index(owner_id)
+
+    response = client.post("/api/v1/ideas/batch", headers=auth_headers, json={
+        "create": [
+            {"title": HOUSEHOLD_DUPLICATE[0], "content": HOUSEHOLD_DUPLICATE[1]},
+            {"title": GARDEN[0], "content": GARDEN[1]},
+        ],
+    })
+    assert response.status_code == 200, response.text
+    duplicate_id, garden_id = [result["id"] for result in response.json()["results"]]
+    scores = _similar(client, auth_headers, anchor["id"])
+    assert duplicate_id in scores
+    assert scores[duplicate_id] > scores.get(garden_id, 0.0)
+
+    # 本文を変更したアイデアはベクトルを作り直し、削除したアイデアは候補から外す
+    response = client.post("/api/v1/ideas/batch", headers=auth_headers, json={
+        "update": [{"id": garden_id, "title": HOUSEHOLD[0], "content": HOUSEHOLD[1]}],
+        "delete": [duplicate_id],
+    })
+    assert response.status_code == 200, response.text
+    scores = _similar(client, auth_headers, anchor["id"])
+    assert scores[garden_id] == pytest.approx(1.0, abs=1e-5)
+    assert duplicate_id not in _indexed_ids(owner_id, *HOUSEHOLD)
+
+def test_deleted_idea_is_removed_from_index(client, auth_headers):
+    original = _create(client, auth_headers, *HOUSEHOLD)
+    duplicate = _create(client, auth_headers, *HOUSEHOLD_DUPLICATE)
+
+    assert client.delete(f"/api/v1/ideas/{original['id']}", headers=auth_headers).status_code == 200
+
+    assert original["id"] not in _indexed_ids(original["owner_id"], *HOUSEHOLD)
+    assert _create(client, auth_headers, *HOUSEHOLD)["similar_ideas"][0]["id"] == duplicate["id"]